@@ -6,15 +6,18 @@ from typing import Dict, List, Optional
 from services.ml_service import MLService
 from models.ml_models import (
     MLEnhancedWeatherData, WeatherPrediction, WeatherPattern,
-    WeatherAnomaly, PersonalizedRecommendation, WeatherInsights
+    WeatherAnomaly, PersonalizedRecommendation, WeatherInsights, PredictionGrid
 )
 
 
 class MLController:
     """Controller for machine learning features in the weather dashboard"""
     
-    def __init__(self, log_file="data/weather_log.csv"):
-        self.ml_service = MLService(log_file)
+    def __init__(self, log_file="data/weather_log.csv", repository=None, history_store=None,
+                 condition_index=None, running_stats=None, regime_model=None):
+        self.ml_service = MLService(log_file, repository=repository, history_store=history_store,
+                                    condition_index=condition_index, running_stats=running_stats,
+                                    regime_model=regime_model)
     
     def get_ml_enhanced_weather(self, weather_data: Dict) -> MLEnhancedWeatherData:
         """Get ML-enhanced weather data with predictions and insights"""
@@ -58,6 +61,48 @@ class MLController:
                 prediction_horizon_hours=hours_ahead
             )
     
+    def get_analog_prediction(self, city: str, hours_ahead: int = 24) -> WeatherPrediction:
+        """Get a temperature prediction from the city's most similar past hours"""
+        try:
+            return self.ml_service.predict_temperature_analog(city, hours_ahead)
+        except Exception as e:
+            print(f"Error predicting temperature from analogs: {e}")
+            return self.get_temperature_prediction(city, hours_ahead)
+    
+    def get_similar_conditions(self, city: str, k: int = 5, hours_ahead: int = 6) -> List[Dict]:
+        """Get the past hours most like a city's current conditions and what followed"""
+        try:
+            return self.ml_service.find_similar_conditions(city, k, hours_ahead)
+        except Exception as e:
+            print(f"Error finding similar conditions: {e}")
+            return []
+    
+    def predict_many(self, cities: List[str], horizons: List[int] = (6, 12, 24, 48)) -> Optional[PredictionGrid]:
+        """Get a city x horizon temperature prediction grid in one batch"""
+        try:
+            return self.ml_service.predict_many(cities, horizons)
+        except Exception as e:
+            print(f"Error predicting temperatures: {e}")
+            return None
+    
+    def get_fleet_anomalies(self, recent: int = 1, limit: Optional[int] = 20) -> List[WeatherAnomaly]:
+        """Get the most severe anomalies across every recorded city right now"""
+        try:
+            return self.ml_service.detect_fleet_anomalies(recent=recent, limit=limit)
+        except Exception as e:
+            print(f"Error detecting fleet anomalies: {e}")
+            return []
+    
+    def get_watchlist_cities(self, favorites: Optional[List[str]] = None) -> List[str]:
+        """Favorite cities followed by every other city with recorded history"""
+        cities = list(dict.fromkeys(favorites or []))
+        known = {city.lower() for city in cities}
+        try:
+            cities += [city for city in self.ml_service.dataset().cities() if city.lower() not in known]
+        except Exception as e:
+            print(f"Error listing recorded cities: {e}")
+        return cities
+    
     def get_weather_patterns(self, city: str) -> List[WeatherPattern]:
         """Get detected weather patterns for a city"""
         try:
@@ -66,6 +111,17 @@ class MLController:
             print(f"Error detecting patterns: {e}")
             return []
     
+    def get_regime_summary(self, city: str) -> Optional[Dict]:
+        """Get a city's current weather regime and how often each regime occurs there"""
+        try:
+            current = self.ml_service.current_regime(city)
+            if current is None:
+                return None
+            return {"current": current, "regimes": self.ml_service.regime_frequency(city)}
+        except Exception as e:
+            print(f"Error getting weather regimes: {e}")
+            return None
+    
     def get_weather_anomalies(self, city: str) -> List[WeatherAnomaly]:
         """Get detected weather anomalies for a city"""
         try:
@@ -112,6 +168,56 @@ class MLController:
                 f"📊 Confidence: {confidence_pct}%\n"
                 f"📈 Trend: {prediction.trend_direction}")
     
+    def format_prediction_grid_for_display(self, grid: Optional[PredictionGrid]) -> str:
+        """Format a prediction grid as a city x horizon table"""
+        if grid is None or not grid.cities:
+            return "🔮 No predictions available"
+        
+        width = max(12, max(len(city) for city in grid.cities) + 2)
+        header = "City".ljust(width) + "".join(f"+{hours}h".rjust(9) for hours in grid.horizons) + "   Conf."
+        lines = [header, "-" * len(header)]
+        for row, city in enumerate(grid.cities):
+            cells = "".join(f"{temp:8.1f}°" for temp in grid.temperatures[row])
+            source = "" if grid.model_based[row] else " *"
+            lines.append(f"{city.ljust(width)}{cells}   {int(grid.confidence[row].mean() * 100)}%{source}")
+        if not all(grid.model_based):
+            lines.append("\n* trend estimate (not enough history for a trained model yet)")
+        return "\n".join(lines)
+    
+    def format_similar_conditions_for_display(self, matches: List[Dict], hours_ahead: int = 6) -> str:
+        """Format similar past hours (and what followed them) for UI display"""
+        if not matches:
+            return "🔁 Not enough history to find similar conditions yet"
+        
+        lines = []
+        for match in matches:
+            when = datetime.fromtimestamp(match["timestamp"]).strftime("%Y-%m-%d %H:%M")
+            line = f"🕒 {when}  {match['temperature']:.1f}°C"
+            if "change" in match:
+                line += f"  →  {match['later_temperature']:.1f}°C after {hours_ahead}h ({match['change']:+.1f}°C)"
+            lines.append(line)
+        if all("change" in match for match in matches):
+            mean_change = sum(match["change"] for match in matches) / len(matches)
+            lines.append(f"\n📈 Average change after similar conditions: {mean_change:+.1f}°C")
+        return "\n".join(lines)
+    
+    def format_regime_summary_for_display(self, summary: Optional[Dict]) -> str:
+        """Format a city's current regime and regime frequencies for UI display"""
+        if not summary:
+            return "🌀 Weather regimes are not available yet (more history needed)"
+        
+        current = summary["current"]
+        since = datetime.fromtimestamp(current["since"]).strftime("%b %d %H:%M")
+        lines = [f"🌀 Current regime: {current['name']} (since {since})",
+                 f"   ~{current['temperature']:.0f}°C, {current['humidity']}% humidity, "
+                 f"{current['wind_speed']:.0f} m/s wind, {current['pressure']} hPa",
+                 "", "📊 How often each regime occurs here:"]
+        for regime in summary["regimes"]:
+            if regime["share"]:
+                marker = "▶" if regime["regime"] == current["regime"] else " "
+                lines.append(f" {marker} {regime['share']:5.0%}  {regime['name']}")
+        return "\n".join(lines)
+    
     def format_patterns_for_display(self, patterns: List[WeatherPattern]) -> str:
         """Format weather patterns for UI display"""
         if not patterns:
@@ -134,7 +240,7 @@ class MLController:
         formatted_anomalies = []
         for anomaly in anomalies[:3]:  # Show top 3 anomalies
             severity_pct = int(anomaly.severity_score * 100)
-            icon = "🔥" if "hot" in anomaly.anomaly_type else "🥶"
+            icon = self._anomaly_icon(anomaly)
             formatted_anomalies.append(
                 f"{icon} {anomaly.anomaly_type.replace('_', ' ').title()}\n"
                 f"   {anomaly.description}\n"
@@ -143,6 +249,24 @@ class MLController:
         
         return "\n\n".join(formatted_anomalies)
     
+    def format_fleet_anomalies_for_display(self, anomalies: List[WeatherAnomaly]) -> str:
+        """Format fleet-wide anomalies as a ranked list"""
+        if not anomalies:
+            return "✅ Nothing unusual right now across recorded cities"
+        
+        lines = []
+        for rank, anomaly in enumerate(anomalies, 1):
+            lines.append(f"{rank:>2}. {self._anomaly_icon(anomaly)} {anomaly.city} "
+                         f"({anomaly.datetime.strftime('%m-%d %H:%M')}) - "
+                         f"severity {int(anomaly.severity_score * 100)}%\n"
+                         f"    {anomaly.description}")
+        return "\n".join(lines)
+    
+    @staticmethod
+    def _anomaly_icon(anomaly: WeatherAnomaly) -> str:
+        icons = {"hot": "🔥", "cold": "🥶", "humidity": "💧", "wind": "💨", "pressure": "📉"}
+        return next((icon for key, icon in icons.items() if key in anomaly.anomaly_type), "⚠️")
+    
     def format_recommendations_for_display(self, recommendations: List[PersonalizedRecommendation]) -> str:
         """Format personalized recommendations for UI display"""
         if not recommendations:
@@ -2,21 +2,33 @@
 Main Weather Dashboard Controller
 Coordinates between UI components and services
 """
+import os
 import matplotlib.pyplot as plt
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
 
 from models.weather_models import WeatherData
 from models.ml_models import MLEnhancedWeatherData
-from services.weather_service import WeatherService
+from services.weather_service import LOG_ARCHIVE_DIR, LOG_RETENTION_DAYS, WeatherService
 from services.forecast_service import ForecastService
 from services.comparison_service import ComparisonService
 from services.journal_service import JournalService
 from services.activity_service import ActivityService
 from services.poetry_service import PoetryService
+from services.regime_model import RegimeModel
 from controllers.ml_controller import MLController
+from core.columnar_store import ColumnarHistoryStore
+from core.condition_index import ConditionIndex
+from core.dedup import DuplicateFilter
+from core.export import ExportJob
+from core.observation_store import ObservationStore
+from core.series_archive import SeriesArchive
+from core.running_stats import RunningStats
+from core.repository import ColumnarBackend, ConditionIndexBackend, ObservationRepository, SQLiteBackend
 from ui.constants import COLOR_PALETTE, TEMPERATURE_UNITS
 
+EXPORT_DIR = "data/exports"
+
 
 class WeatherController:
     """Main controller for weather dashboard functionality"""
@@ -32,8 +44,33 @@ class WeatherController:
         self.auto_refresh_enabled = False
         self.auto_refresh_interval = 300000  # 5 minutes in milliseconds
         
+        # Repeated readings are dropped for the legacy import and live writes alike
+        self.duplicate_filter = DuplicateFilter()
+        # Compressed block files for observations past the retention window
+        self.series_archive = SeriesArchive(os.path.join(LOG_ARCHIVE_DIR, "series"))
+        self._archiver = None  # background archive_old_history run, if any
+        # Observation history lives in SQLite; the legacy CSV log is imported once
+        self.observation_store = self._create_observation_store()
+        # Stored plus archived observations; the derived stores below are built from it
+        self.history_source = SQLiteBackend(self.observation_store, self.series_archive)
+        # Numeric columns mirrored into memory-mapped arrays for analytics scans
+        self.history_store = self._create_history_store()
+        # Bitmap indexes on city, condition class and hour for predicate queries
+        self.condition_index = self._create_condition_index()
+        # Every history reader and writer shares this repository and its read cache
+        self.repository = ObservationRepository(self.history_source,
+                                                mirrors=[ColumnarBackend(self.history_store),
+                                                         ConditionIndexBackend(self.condition_index)],
+                                                duplicate_filter=self.duplicate_filter)
+        # Per-city running moments, updated (and anomalies flagged) as observations land
+        self.running_stats = self._create_running_stats()
+        self.repository.add_listener(self.running_stats.on_written)
+        # Weather-regime clustering with a stored regime per observation
+        self.regime_model = self._create_regime_model()
+        self.repository.add_listener(self.regime_model.on_written)
+        
         # Initialize services
-        self.weather_service = WeatherService(api_key)
+        self.weather_service = WeatherService(api_key, repository=self.repository)
         self.forecast_service = ForecastService(api_key)
         self.comparison_service = ComparisonService(self.weather_service)
         self.journal_service = JournalService()
@@ -44,7 +81,11 @@ class WeatherController:
         self.radar_service = self._create_radar_service()
         
         # Initialize ML controller
-        self.ml_controller = MLController()
+        self.ml_controller = MLController(repository=self.repository,
+                                          history_store=self.history_store,
+                                          condition_index=self.condition_index,
+                                          running_stats=self.running_stats,
+                                          regime_model=self.regime_model)
         
         # Graph components (will be set by main window)
         self.fig = None
@@ -69,6 +110,177 @@ class WeatherController:
         self.ax = None
         self.canvas = None
         
+    def _create_observation_store(self, legacy_log="data/weather_log.csv"):
+        """Open the observation store, seeding it from the legacy CSV log"""
+        store = ObservationStore()
+        # Seed only a brand-new database; a cleared one keeps its city table
+        if not store.cities():
+            imported = store.import_csv(legacy_log, duplicate_filter=self.duplicate_filter)
+            if imported:
+                print(f"Imported {imported} observations from {legacy_log}")
+        return store
+        
+    def start_history_archiving(self, days=LOG_RETENTION_DAYS):
+        """Run archive_old_history on a background thread unless a run is still going"""
+        import threading
+        if self._archiver is not None and self._archiver.is_alive():
+            return self._archiver
+        self._archiver = threading.Thread(target=self.archive_old_history, args=(days,),
+                                          name="history-archiver", daemon=True)
+        self._archiver.start()
+        return self._archiver
+        
+    def archive_old_history(self, days=LOG_RETENTION_DAYS):
+        """Move raw observations older than `days` into the compressed series archive.
+        
+        The main window runs this (via start_history_archiving) shortly after
+        startup and then daily. Rollups keep their statistics and reads still
+        cover the archived rows. Returns how many rows left the observation store.
+        """
+        from datetime import datetime, timedelta
+        cutoff = datetime.now() - timedelta(days=days)
+        try:
+            pruned = self.repository.prune(cutoff)
+        except Exception as e:
+            print(f"Error archiving old observations: {e}")
+            return 0
+        if pruned:
+            print(f"Archived {pruned} observations older than {days} days to {self.series_archive.root}")
+        return pruned
+        
+    def _create_history_store(self):
+        """Open the columnar history, backfilling it from stored and archived observations"""
+        history = ColumnarHistoryStore()
+        if self.observation_store.migrated_from is not None:
+            # Rows were rewritten (e.g. converted to metric); the copy is rebuilt from them
+            history.clear()
+        if not history.cities():
+            backfilled = history.append_many(self.history_source.range())
+            if backfilled:
+                print(f"Backfilled {backfilled} observations into columnar history")
+        return history
+        
+    def _create_condition_index(self):
+        """Build the in-memory condition index from stored and archived observations"""
+        index = ConditionIndex()
+        for chunk in self.history_source.iter_chunks():
+            index.add_many(chunk)
+        return index
+        
+    def _create_running_stats(self):
+        """Load persisted running statistics, rebuilding them if they miss observations or the store migrated"""
+        stats = RunningStats()
+        if (not stats.loaded or stats.observations != self.history_source.count()
+                or self.observation_store.migrated_from is not None):
+            stats.clear()
+            for chunk in self.history_source.iter_chunks():
+                stats.update_many(chunk)
+            stats.save()
+        return stats
+        
+    def _create_regime_model(self):
+        """Load persisted weather regimes, rebuilding them if they miss observations or the store migrated"""
+        model = RegimeModel()
+        if (not model.loaded or model.observations != self.history_source.count()
+                or self.observation_store.migrated_from is not None):
+            model.clear()
+            for chunk in self.history_source.iter_chunks():
+                model.update_many(chunk)
+            model.save()
+        return model
+        
+    def query_observations(self, group_by=None, column="temperature", **filters):
+        """Filter/aggregate stored observations through the condition index.
+        
+        Filters: city, condition, hour (one value or a collection), start/end,
+        and numeric ranges such as temperature=(25, None). Returns aggregate
+        stats, or per-group stats when group_by is "city", "condition" or "hour".
+        """
+        self.repository.flush()
+        if group_by:
+            return self.condition_index.group_by(group_by, column, **filters)
+        return self.condition_index.aggregate(column, **filters)
+        
+    def start_replay(self, when):
+        """Replay the dashboard as of a past moment from stored observations only.
+        
+        While replaying, current weather and history views read the latest
+        stored observation at or before `when`; nothing is fetched or logged.
+        """
+        from datetime import datetime
+        if isinstance(when, str):
+            when = datetime.strptime(when.strip(), "%Y-%m-%d %H:%M:%S")
+        self.repository.flush()
+        self.weather_service.replay_time = when
+        self.update_graph()
+        return self.get_dashboard_snapshot(when)
+        
+    def stop_replay(self):
+        """Return to live data"""
+        self.weather_service.replay_time = None
+        self.update_graph()
+        
+    @property
+    def replay_time(self):
+        return self.weather_service.replay_time
+        
+    def get_dashboard_snapshot(self, when=None):
+        """Summarize the last stored observation of every city as of `when` (default: replay time or now)"""
+        from datetime import datetime
+        when = when or self.replay_time or datetime.now()
+        snapshot = f"⏪ DASHBOARD AS OF {when:%Y-%m-%d %H:%M:%S}\n"
+        snapshot += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
+        found = 0
+        for city in self.repository.cities():
+            window = self.repository.as_of(city, when, before=1)
+            row = window["observation"]
+            if row is None:
+                continue
+            found += 1
+            snapshot += f"📍 {city}: {row['Temperature']}° {row.get('Description') or ''} (recorded {row['DateTime']})"
+            if window["previous"]:
+                change = float(row["Temperature"]) - float(window["previous"][0]["Temperature"])
+                snapshot += f", {change:+.1f}° since {window['previous'][0]['DateTime']}"
+            snapshot += "\n"
+        if not found:
+            snapshot += "No observations had been recorded by then.\n"
+        return snapshot
+        
+    def get_storage_metrics(self):
+        """Get writer queue/flush metrics and the history read cache hit rate"""
+        report = "💾 STORAGE WRITERS:\n"
+        for label, writer in (("Weather log", self.weather_service.writer),
+                              ("Journal", self.journal_service.writer)):
+            stats = writer.stats()
+            report += (f"• {label}: queue {stats['queue_depth']} (max {stats['max_queue_depth']}), "
+                       f"{stats['records_written']} written in {stats['batches']} batches, "
+                       f"flush avg {stats['avg_flush_ms']:.1f} ms / max {stats['max_flush_ms']:.1f} ms")
+            if stats["errors"]:
+                report += f", {stats['errors']} failed batches"
+            report += "\n"
+        cache = self.repository.cache_stats()
+        report += (f"• History read cache: {cache['entries']} entries, "
+                   f"{cache['hits']} hits / {cache['misses']} misses ({cache['hit_rate']:.0%})\n")
+        archive = self.series_archive.stats()
+        if archive["rows"]:
+            report += (f"• Cold archive: {archive['rows']} observations in {archive['blocks']} blocks, "
+                       f"{archive['bytes'] / 1024:.1f} KB ({archive['bytes'] / archive['rows']:.1f} bytes/row)\n")
+        dedup = self.repository.duplicate_filter.stats()
+        report += (f"• Duplicate readings dropped: {dedup['duplicates']} "
+                   f"of {dedup['accepted'] + dedup['duplicates']} ({dedup['tracked']} recent keys)\n")
+        return report
+
+    def shutdown(self):
+        """Flush queued writes durably before the application exits"""
+        if self._archiver is not None:
+            # Let a running archive pass finish before its store is closed
+            self._archiver.join(timeout=30)
+        self.repository.close()
+        # Statistics and regimes are saved periodically as batches land; keep the rest too
+        self.running_stats.save()
+        self.regime_model.save()
+        self.journal_service.writer.close()
+        
     def _create_radar_service(self):
         """Create and configure the radar service"""
         from services.live_weather_service import WeatherRadarService
@@ -308,6 +520,12 @@ class WeatherController:
         unit = self.temp_unit_value
         return TEMPERATURE_UNITS[unit]["label"]
 
+    def _to_display_unit(self, celsius, difference=False):
+        """Convert a stored (°C) temperature, or a temperature difference, to the selected unit"""
+        if celsius is None or self.temp_unit_value != "imperial":
+            return celsius
+        return celsius * 9 / 5 + (0 if difference else 32)
+
     def get_unit_name(self):
         """Get current temperature unit name"""
         unit = self.temp_unit_value
@@ -525,38 +743,69 @@ class WeatherController:
     def get_weather_statistics(self, city):
         """Get weather statistics for a city"""
         try:
-            dates, temps = self.weather_service.load_weather_history()
-            
-            if not dates or not temps:
-                return "No weather data available for statistics."
-            
-            # Calculate statistics
-            avg_temp = sum(temps) / len(temps)
-            max_temp = max(temps)
-            min_temp = min(temps)
+            summary = self.repository.rollup_summary(city)
+            if summary:
+                # Answered from daily rollups: constant work per day, not per observation
+                temps = [day["mean"] for day in self.repository.rollups(city, "day")]
+                dates = [summary["first"], summary["last"]]
+                record_count = summary["count"]
+                avg_temp, max_temp, min_temp = summary["mean"], summary["max"], summary["min"]
+                sample = "days"
+            else:
+                dates, temps = self.weather_service.load_weather_history()
+                if not dates or not temps:
+                    return "No weather data available for statistics."
+                record_count = len(dates)
+                avg_temp = sum(temps) / len(temps)
+                max_temp = max(temps)
+                min_temp = min(temps)
+                sample = "readings"
+            
+            # Calculate statistics (history is stored in °C; shown in the selected unit)
             temp_range = max_temp - min_temp
             unit_label = self.get_unit_label()
+            display = self._to_display_unit
             
             stats = f"📊 WEATHER STATISTICS:\n"
             stats += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
             stats += f"📋 Data Period: {dates[0]} to {dates[-1]}\n"
-            stats += f"📋 Total Records: {len(dates)}\n\n"
+            stats += f"📋 Total Records: {record_count} observations"
+            stats += f" on {len(temps)} days\n\n" if summary else "\n\n"
             
             stats += f"🌡️ TEMPERATURE ANALYSIS:\n"
-            stats += f"• Average Temperature: {avg_temp:.1f}{unit_label}\n"
-            stats += f"• Maximum Temperature: {max_temp:.1f}{unit_label}\n"
-            stats += f"• Minimum Temperature: {min_temp:.1f}{unit_label}\n"
-            stats += f"• Temperature Range: {temp_range:.1f}°\n\n"
-            
-            # Temperature distribution
-            hot_days = sum(1 for t in temps if t > 25)  # Assuming Celsius for now
+            stats += f"• Average Temperature: {display(avg_temp):.1f}{unit_label}\n"
+            stats += f"• Maximum Temperature: {display(max_temp):.1f}{unit_label}\n"
+            stats += f"• Minimum Temperature: {display(min_temp):.1f}{unit_label}\n"
+            stats += f"• Temperature Range: {display(temp_range, difference=True):.1f}°\n"
+            running = self.running_stats.summary(city)
+            if running:
+                # Maintained per observation at ingest, no history scan
+                flagged = self.running_stats.anomalies(city, "temperature")
+                stats += f"• Standard Deviation: {display(running['std'], difference=True):.1f}°\n"
+                stats += (f"• Recent Average: {display(running['recent_mean']):.1f}{unit_label} "
+                          f"(±{display(running['recent_std'], difference=True):.1f}°)\n")
+                stats += f"• Readings Flagged Unusual: {len(flagged)}\n"
+            stats += "\n"
+            
+            # Temperature distribution over daily means (or single readings without rollups), in °C
+            hot_days = sum(1 for t in temps if t > 25)
             cold_days = sum(1 for t in temps if t < 10)
             moderate_days = len(temps) - hot_days - cold_days
             
-            stats += f"🔍 TEMPERATURE PATTERNS:\n"
-            stats += f"• Hot days (>25°): {hot_days} ({hot_days/len(temps)*100:.1f}%)\n"
-            stats += f"• Cold days (<10°): {cold_days} ({cold_days/len(temps)*100:.1f}%)\n"
-            stats += f"• Moderate days: {moderate_days} ({moderate_days/len(temps)*100:.1f}%)\n\n"
+            stats += f"🔍 TEMPERATURE PATTERNS (of {len(temps)} {sample}):\n"
+            stats += f"• Hot {sample} (>{display(25):.0f}{unit_label}): {hot_days} ({hot_days/len(temps)*100:.1f}%)\n"
+            stats += f"• Cold {sample} (<{display(10):.0f}{unit_label}): {cold_days} ({cold_days/len(temps)*100:.1f}%)\n"
+            stats += f"• Moderate {sample}: {moderate_days} ({moderate_days/len(temps)*100:.1f}%)\n\n"
+            
+            # Condition mix straight from the condition bitmaps
+            conditions = self.query_observations(group_by="condition", city=city)
+            readings = sum(group["count"] for group in conditions.values())
+            if readings:
+                stats += f"🌦️ CONDITIONS RECORDED:\n"
+                for name, group in sorted(conditions.items(), key=lambda item: -item[1]["count"]):
+                    stats += (f"• {name.title()}: {group['count']} readings ({group['count']/readings*100:.1f}%), "
+                              f"avg {display(group['mean']):.1f}{unit_label}\n")
+                stats += "\n"
             
             # Recent trend
             if len(temps) > 7:
@@ -589,10 +838,19 @@ class WeatherController:
     def get_weather_trends(self, city):
         """Get weather trends analysis for a city"""
         try:
-            dates, temps = self.weather_service.load_weather_history(30)  # Get more data for trends
+            from datetime import datetime, timedelta
+            days = self.repository.rollups(city, "day", start=datetime.now() - timedelta(days=30))
+            if len(days) >= 5:
+                # One mean per recorded day, read from the daily rollups
+                temps = [day["mean"] for day in days]
+            else:
+                dates, temps = self.weather_service.load_weather_history(30)  # Get more data for trends
             
             if len(temps) < 5:
                 return "Need at least 5 data points for trend analysis."
+            # Stored in °C; analysed in the selected unit
+            temps = [self._to_display_unit(t) for t in temps]
+            stable, variable = self._to_display_unit(3, difference=True), self._to_display_unit(6, difference=True)
             
             trends = f"📈 WEATHER TREND ANALYSIS:\n"
             trends += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
@@ -624,11 +882,11 @@ class WeatherController:
             std_dev = statistics.stdev(temps) if len(temps) > 1 else 0
             trends += f"📊 VARIABILITY ANALYSIS:\n"
             trends += f"• Standard Deviation: {std_dev:.1f}°\n"
-            trends += f"• Weather Stability: {'Stable' if std_dev < 3 else 'Variable' if std_dev < 6 else 'Highly Variable'}\n\n"
+            trends += f"• Weather Stability: {'Stable' if std_dev < stable else 'Variable' if std_dev < variable else 'Highly Variable'}\n\n"
             
             # Forecast insight
             trends += f"🔮 INSIGHTS:\n"
-            if std_dev < 3:
+            if std_dev < stable:
                 trends += "• Weather patterns are quite stable\n"
             elif recent_trend > earlier_trend:
                 trends += "• Temperatures are trending warmer\n"
@@ -640,32 +898,36 @@ class WeatherController:
         except Exception as e:
             return f"❌ Error analyzing trends: {str(e)}"
 
-    def export_weather_data(self, city):
-        """Export weather data for a city"""
+    def start_weather_export(self, path, city=None, start=None, end=None, columns=None, fmt=None):
+        """Start a background export of stored observations; returns the ExportJob"""
+        total = self.repository.count(city, start, end)
+        chunks = self.repository.iter_chunks(city, start, end)
+        return ExportJob(chunks, path, fmt=fmt, columns=columns, total=total).start()
+
+    def export_weather_data(self, city, fmt="csv"):
+        """Export stored observations for a city to data/exports/ and summarize the result"""
         try:
-            dates, temps = self.weather_service.load_weather_history()
-            
-            if not dates:
+            from datetime import datetime
+            stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            slug = "_".join(city.split()).lower() if city else "all"
+            path = os.path.join(EXPORT_DIR, f"weather_{slug}_{stamp}.{fmt}")
+            
+            job = self.start_weather_export(path, city=city or None, fmt=fmt)
+            job.wait()
+            if job.error:
+                raise job.error
+            if not job.rows_written:
                 return "No weather data available for export."
             
-            # Create export summary
             export_summary = f"📤 WEATHER DATA EXPORT COMPLETE\n"
             export_summary += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
             export_summary += f"📊 Export Summary:\n"
-            export_summary += f"• Total Records: {len(dates)}\n"
-            export_summary += f"• Date Range: {dates[0]} to {dates[-1]}\n"
-            export_summary += f"• Average Temperature: {sum(temps)/len(temps):.1f}°{self.get_unit_label()}\n"
-            export_summary += f"• Temperature Range: {min(temps):.1f}° to {max(temps):.1f}°\n\n"
-            
-            export_summary += f"💾 Data Format: CSV\n"
-            export_summary += f"📁 Location: data/weather_log.csv\n\n"
-            
-            export_summary += f"📋 Sample Data (last 5 entries):\n"
-            for i, (date, temp) in enumerate(zip(dates[-5:], temps[-5:])):
-                export_summary += f"{i+1}. {date}: {temp}°{self.get_unit_label()}\n"
-            
+            export_summary += f"• Total Records: {job.rows_written}\n"
+            export_summary += f"• City: {city or 'All cities'}\n"
+            export_summary += f"• Export Time: {job.elapsed:.2f}s\n\n"
+            export_summary += f"💾 Data Format: {job.fmt.upper()}\n"
+            export_summary += f"📁 Location: {path}\n"
             export_summary += f"\n✅ Export completed successfully!"
-            export_summary += f"\n💡 You can find the complete data in the CSV file."
             
             return export_summary
             
@@ -673,20 +935,23 @@ class WeatherController:
             return f"❌ Error exporting data: {str(e)}"
 
     def clear_weather_history(self):
-        """Clear weather history"""
+        """Clear weather history, archiving it to a compressed CSV first"""
         try:
-            # Instead of actually clearing the file, provide information about how to clear it
-            clear_info = f"🗑️ WEATHER HISTORY CLEARING\n"
+            from datetime import datetime
+            archive = os.path.join(LOG_ARCHIVE_DIR,
+                                   f"weather_history_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv.gz")
+            # Stored and archived rows go to the CSV first; queued writes land before it
+            removed = self.repository.clear(archive)
+            self.history_store.clear()
+            self.condition_index.clear()
+            self.running_stats.clear()
+            self.regime_model.clear()
+            
+            clear_info = f"🗑️ WEATHER HISTORY CLEARED\n"
             clear_info += f"━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            clear_info += f"⚠️ IMPORTANT NOTICE:\n"
-            clear_info += f"Weather history clearing is currently disabled to preserve data.\n\n"
-            clear_info += f"📂 History Location: data/weather_log.csv\n"
-            clear_info += f"💾 Current Records: Available in file\n\n"
-            clear_info += f"🛠️ To manually clear history:\n"
-            clear_info += f"1. Navigate to the 'data' folder\n"
-            clear_info += f"2. Rename or delete 'weather_log.csv'\n"
-            clear_info += f"3. Restart the application\n\n"
-            clear_info += f"💡 This preserves your weather history for future analysis!"
+            clear_info += f"📋 Records Removed: {removed}\n"
+            clear_info += f"📂 Archive: {archive} ({removed} records)\n\n"
+            clear_info += f"💡 Hourly/daily summaries restart from the next observation."
             
             return clear_info
             
@@ -1875,13 +2140,25 @@ class WeatherController:
             climate += f"🌡️ Temperature Profile:\n"
             climate += f"• Current Reading: {weather_data.formatted_temperature}\n"
             climate += f"• Apparent Temperature: {weather_data.feels_like or 'N/A'}°{self.get_unit_label()}\n"
-            climate += f"• Daily Range: Varies seasonally\n"
-            climate += f"• Annual Range: Significant variation\n\n"
+            # Recorded ranges come from the daily rollups of the past year
+            from datetime import datetime as _datetime, timedelta
+            recorded = self.repository.rollup_summary(city, start=_datetime.now() - timedelta(days=365))
+            if recorded:
+                display = self._to_display_unit
+                climate += f"• Daily Range: {display(recorded['mean_daily_range'], difference=True):.1f}° average over {recorded['days']} recorded days\n"
+                climate += (f"• Annual Range: {display(recorded['min']):.1f} to {display(recorded['max']):.1f}{self.get_unit_label()} "
+                            f"(mean {display(recorded['mean']):.1f}, σ {display(recorded['std'], difference=True):.1f})\n\n")
+            else:
+                climate += f"• Daily Range: Varies seasonally\n"
+                climate += f"• Annual Range: Significant variation\n\n"
             
             climate += f"💧 Moisture Profile:\n"
             climate += f"• Relative Humidity: {weather_data.humidity}%\n"
             climate += f"• Moisture Regime: {'High' if humidity > 70 else 'Moderate' if humidity > 40 else 'Low'}\n"
-            climate += f"• Precipitation Pattern: Seasonal variation\n\n"
+            if recorded:
+                climate += f"• Recorded Precipitation: {recorded['precipitation']:.1f} mm over {recorded['days']} days\n\n"
+            else:
+                climate += f"• Precipitation Pattern: Seasonal variation\n\n"
             
             climate += f"💨 Atmospheric Dynamics:\n"
             climate += f"• Wind Patterns: {weather_data.formatted_wind}\n"
@@ -0,0 +1,295 @@
+# core/columnar_store.py
+"""Columnar, memory-mapped per-city history store for analytics"""
+
+import json
+import shutil
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+import numpy as np
+
+from .ingest import TIMESTAMP_FORMAT, canonical_city, city_slug, legacy_city_slug
+from .observation_store import OBSERVATION_COLUMNS
+
+# Accept rows keyed by CSV headers ("City", "Temperature") as well as field names
+_FIELD_NAMES = {header: column for column, header in OBSERVATION_COLUMNS}
+
+# Column name -> dtype. Timestamps are epoch seconds.
+COLUMNS = {
+    "timestamp": np.int64,
+    "temperature": np.float32,
+    "humidity": np.float32,
+    "wind_speed": np.float32,
+    "pressure": np.float32,
+}
+
+DEFAULT_SEGMENT_SIZE = 65536
+
+
+def to_epoch(value: Union[str, datetime, int, float, None]) -> int:
+    """Convert a store timestamp (string, datetime or number) to epoch seconds"""
+    if value is None:
+        return int(datetime.now().timestamp())
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return int(value)
+    return int(datetime.strptime(str(value).strip(), TIMESTAMP_FORMAT).timestamp())
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def _read_only(array: np.ndarray) -> np.ndarray:
+    """A non-writeable view, so callers cannot modify the memory map through a read"""
+    view = array.view()
+    view.flags.writeable = False
+    return view
+
+
+class _CitySeries:
+    """Segment files and manifest for one city"""
+
+    def __init__(self, directory: Path, city: str, segment_size: int):
+        self.directory = directory
+        self.manifest_path = directory / "manifest.json"
+        if self.manifest_path.exists():
+            with open(self.manifest_path, "r") as f:
+                self.manifest = json.load(f)
+        else:
+            directory.mkdir(parents=True, exist_ok=True)
+            self.manifest = {"city": city, "segment_size": segment_size, "segments": []}
+        self._maps: Dict[tuple, np.memmap] = {}
+
+    @property
+    def segments(self) -> List[Dict]:
+        return self.manifest["segments"]
+
+    @property
+    def segment_size(self) -> int:
+        return self.manifest["segment_size"]
+
+    def row_count(self) -> int:
+        return sum(segment["rows"] for segment in self.segments)
+
+    def column(self, segment_id: int, name: str, writable: bool = False) -> np.ndarray:
+        """Return the memory-mapped array backing one column of a segment"""
+        key = (segment_id, name)
+        array = self._maps.get(key)
+        if array is None or (writable and not array.flags.writeable):
+            path = self.directory / f"seg{segment_id:05d}.{name}.npy"
+            if writable and not path.exists():
+                array = np.lib.format.open_memmap(
+                    path, mode="w+", dtype=COLUMNS[name], shape=(self.segment_size,))
+            else:
+                array = np.load(path, mmap_mode="r+" if writable else "r")
+            self._maps[key] = array
+        return array
+
+    def save_manifest(self) -> None:
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f)
+        temp_path.replace(self.manifest_path)
+
+
+class ColumnarHistoryStore:
+    """Per-city numpy column segments stored as memory-mapped .npy files.
+
+    Each city has fixed-capacity segments (one .npy file per column) plus a
+    manifest of row counts and time ranges. Reads that fall inside a single
+    segment return zero-copy views of the memory map; reads spanning segments
+    are concatenated. Rows are appended in time order per city: a batch is
+    sorted first, and rows older than the city's stored history are skipped.
+    """
+
+    def __init__(self, root: str = "data/columnar", segment_size: int = DEFAULT_SEGMENT_SIZE):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self._series: Dict[str, _CitySeries] = {}
+        self._lock = threading.RLock()
+
+    # Writes
+
+    def append(self, city: str, timestamp, temperature, humidity=None,
+               wind_speed=None, pressure=None) -> None:
+        """Append one observation for a city"""
+        self.append_many([{
+            "city": city, "timestamp": timestamp, "temperature": temperature,
+            "humidity": humidity, "wind_speed": wind_speed, "pressure": pressure,
+        }])
+
+    def append_many(self, records: Iterable[Dict]) -> int:
+        """Append observation dicts (field names or CSV headers); returns rows appended"""
+        by_city: Dict[str, List[Dict]] = {}
+        for record in records:
+            record = {_FIELD_NAMES.get(key, key): value for key, value in record.items()}
+            city = record.get("city")
+            if not city or np.isnan(_to_float(record.get("temperature"))):
+                continue
+            try:
+                # Parse up front so a bad timestamp cannot stop the batch halfway
+                record["timestamp"] = to_epoch(record.get("timestamp"))
+            except ValueError:
+                continue
+            by_city.setdefault(canonical_city(city), []).append(record)
+
+        appended = 0
+        with self._lock:
+            for city, rows in by_city.items():
+                appended += self._append_city(city, rows)
+        return appended
+
+    def _append_city(self, city: str, rows: List[Dict]) -> int:
+        series = self._open(city, create=True)
+        values = {
+            "timestamp": np.array([to_epoch(row.get("timestamp")) for row in rows], dtype=np.int64),
+        }
+        for name in COLUMNS:
+            if name != "timestamp":
+                values[name] = np.array([_to_float(row.get(name)) for row in rows], dtype=COLUMNS[name])
+
+        # Sort the batch; rows older than what is stored cannot be inserted and are skipped
+        order = np.argsort(values["timestamp"], kind="stable")
+        last = series.segments[-1]["max_ts"] if series.segments else None
+        if last is not None:
+            order = order[values["timestamp"][order] >= last]
+            if len(order) < len(rows):
+                print(f"Skipping {len(rows) - len(order)} out-of-order observations for {city}")
+        values = {name: column[order] for name, column in values.items()}
+        timestamps = values["timestamp"]
+
+        offset = 0
+        while offset < len(timestamps):
+            if not series.segments or series.segments[-1]["rows"] >= series.segment_size:
+                series.segments.append({"id": len(series.segments), "rows": 0,
+                                        "min_ts": int(timestamps[offset]), "max_ts": None})
+            segment = series.segments[-1]
+            start = segment["rows"]
+            count = min(series.segment_size - start, len(timestamps) - offset)
+            for name in COLUMNS:
+                target = series.column(segment["id"], name, writable=True)
+                target[start:start + count] = values[name][offset:offset + count]
+                target.flush()
+            segment["rows"] = start + count
+            segment["max_ts"] = int(timestamps[offset + count - 1])
+            offset += count
+
+        series.save_manifest()
+        return len(timestamps)
+
+    def clear(self) -> None:
+        """Delete every city's segments"""
+        with self._lock:
+            self._series.clear()
+            for manifest in self.root.glob("*/manifest.json"):
+                shutil.rmtree(manifest.parent)
+
+    # Reads
+
+    def read(self, city: str, start=None, end=None,
+             columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Return {column: array} for start <= timestamp <= end (inclusive).
+
+        Arrays are read-only; they are views of the memory map when the slice
+        lies in a single segment.
+        """
+        columns = columns or list(COLUMNS)
+        with self._lock:
+            series = self._open(city)
+            if series is None:
+                return {name: np.empty(0, dtype=COLUMNS[name]) for name in columns}
+
+            lo = to_epoch(start) if start is not None else None
+            hi = to_epoch(end) if end is not None else None
+            parts = []
+            for segment in series.segments:
+                if segment["rows"] == 0:
+                    continue
+                if (lo is not None and segment["max_ts"] < lo) or (hi is not None and segment["min_ts"] > hi):
+                    continue
+                timestamps = series.column(segment["id"], "timestamp")[:segment["rows"]]
+                first = int(np.searchsorted(timestamps, lo, side="left")) if lo is not None else 0
+                last = int(np.searchsorted(timestamps, hi, side="right")) if hi is not None else segment["rows"]
+                if first < last:
+                    parts.append((segment["id"], first, last))
+
+            result = {}
+            for name in columns:
+                views = [series.column(seg_id, name)[first:last] for seg_id, first, last in parts]
+                if not views:
+                    result[name] = np.empty(0, dtype=COLUMNS[name])
+                elif len(views) == 1:
+                    result[name] = _read_only(views[0])
+                else:
+                    result[name] = _read_only(np.concatenate(views))
+            return result
+
+    def latest(self, city: str, limit: int, columns: Optional[List[str]] = None) -> Dict[str, np.ndarray]:
+        """Return the last `limit` rows for a city"""
+        with self._lock:
+            series = self._open(city)
+            columns = columns or list(COLUMNS)
+            if series is None or limit <= 0:
+                return {name: np.empty(0, dtype=COLUMNS[name]) for name in columns}
+
+            parts, needed = [], limit
+            for segment in reversed(series.segments):
+                take = min(needed, segment["rows"])
+                if take:
+                    parts.append((segment["id"], segment["rows"] - take, segment["rows"]))
+                    needed -= take
+                if needed == 0:
+                    break
+            parts.reverse()
+
+            result = {}
+            for name in columns:
+                views = [series.column(seg_id, name)[first:last] for seg_id, first, last in parts]
+                result[name] = _read_only(views[0] if len(views) == 1 else (
+                    np.concatenate(views) if views else np.empty(0, dtype=COLUMNS[name])))
+            return result
+
+    def count(self, city: str) -> int:
+        with self._lock:
+            series = self._open(city)
+            return series.row_count() if series else 0
+
+    def cities(self) -> List[str]:
+        """Return every city with stored history"""
+        names = []
+        for manifest in sorted(self.root.glob("*/manifest.json")):
+            with open(manifest, "r") as f:
+                names.append(json.load(f)["city"])
+        return names
+
+    def _open(self, city: str, create: bool = False) -> Optional[_CitySeries]:
+        city = canonical_city(city)
+        series = self._series.get(city)
+        if series is None:
+            directory = self.root / city_slug(city)
+            if not (directory / "manifest.json").exists():
+                self._adopt_legacy(city, directory)
+            if not create and not (directory / "manifest.json").exists():
+                return None
+            series = _CitySeries(directory, city, self.segment_size)
+            self._series[city] = series
+        return series
+
+    def _adopt_legacy(self, city: str, directory: Path) -> None:
+        """Move a city's series out of its pre-city_slug directory, if that one is its own"""
+        legacy = self.root / legacy_city_slug(city)
+        try:
+            with open(legacy / "manifest.json", "r") as f:
+                owner = json.load(f)["city"]
+        except (OSError, ValueError, KeyError):
+            return
+        if canonical_city(owner) == city:
+            legacy.rename(directory)
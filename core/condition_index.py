@@ -0,0 +1,273 @@
+# core/condition_index.py
+"""In-memory bitmap indexes over the observation history"""
+
+import threading
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .columnar_store import to_epoch
+from .ingest import TIMESTAMP_FORMAT, canonical_city
+from .observation_store import OBSERVATION_COLUMNS
+
+# Condition class -> description keywords, checked in order (first match wins)
+CONDITION_CLASSES = [
+    ("thunderstorm", ("thunder", "storm", "tornado", "squall")),
+    ("snow", ("snow", "sleet", "blizzard")),
+    ("rain", ("rain", "drizzle", "shower")),
+    ("fog", ("fog", "mist", "haze", "smoke", "dust", "sand")),
+    ("clouds", ("cloud", "overcast")),
+    ("clear", ("clear", "sun")),
+]
+OTHER_CONDITION = "other"
+
+# Categorical dimensions that get one bitmap per distinct value
+DIMENSIONS = ("city", "condition", "hour")
+# Numeric columns available to range filters and aggregates
+NUMERIC_COLUMNS = ("temperature", "humidity", "wind_speed", "pressure")
+
+AGGREGATES = ("count", "mean", "std", "min", "max", "sum")
+
+_FIELD_NAMES = {header: column for column, header in OBSERVATION_COLUMNS}
+
+Range = Tuple[Optional[float], Optional[float]]
+Selector = Union[str, int, Iterable, None]
+
+
+def condition_class(description) -> str:
+    """Map a free-text weather description to a coarse condition class"""
+    return _condition_class(str(description or "").lower())
+
+
+@lru_cache(maxsize=1024)
+def _condition_class(text: str) -> str:
+    for name, keywords in CONDITION_CLASSES:
+        if any(keyword in text for keyword in keywords):
+            return name
+    return OTHER_CONDITION
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class ConditionIndex:
+    """Bitmap indexes on city, condition class and hour of day.
+
+    Each distinct value of a dimension owns a packed bitmap (one bit per row,
+    numpy uint8). A query ANDs the bitmaps of the requested values (ORing
+    within a dimension), then applies time and numeric range filters only to
+    the surviving rows. Numeric columns are held as float64 arrays; missing
+    values are NaN and never match a range filter.
+    """
+
+    def __init__(self, capacity: int = 4096):
+        self._lock = threading.RLock()
+        self._size = 0
+        self._capacity = max(8, -(-capacity // 8) * 8)  # whole bitmap bytes
+        self._timestamps = np.zeros(self._capacity, dtype=np.int64)
+        self._values = {name: np.full(self._capacity, np.nan) for name in NUMERIC_COLUMNS}
+        self._bitmaps: Dict[str, Dict] = {dimension: {} for dimension in DIMENSIONS}
+
+    def __len__(self) -> int:
+        return self._size
+
+    # Writes
+
+    def add_many(self, records: Iterable[Dict]) -> int:
+        """Index observation dicts (field names or CSV headers); returns rows added"""
+        rows = []
+        for record in records:
+            record = {_FIELD_NAMES.get(key, key): value for key, value in record.items()}
+            city = record.get("city")
+            if not city or np.isnan(_to_float(record.get("temperature"))):
+                continue
+            when = record.get("timestamp")
+            if not isinstance(when, datetime):
+                try:
+                    when = datetime.strptime(str(when).strip(), TIMESTAMP_FORMAT) if when else datetime.now()
+                except ValueError:
+                    continue
+            rows.append((to_epoch(when), {
+                "city": canonical_city(city),
+                "condition": condition_class(record.get("description")),
+                "hour": when.hour,
+            }, [_to_float(record.get(name)) for name in NUMERIC_COLUMNS]))
+
+        if not rows:
+            return 0
+        with self._lock:
+            first = self._size
+            self._reserve(first + len(rows))
+            positions = np.arange(first, first + len(rows))
+            self._timestamps[positions] = [row[0] for row in rows]
+            numeric = np.array([row[2] for row in rows], dtype=np.float64)
+            for column, name in enumerate(NUMERIC_COLUMNS):
+                self._values[name][positions] = numeric[:, column]
+            for dimension in DIMENSIONS:
+                by_value: Dict = {}
+                for position, (_, keys, _) in zip(positions, rows):
+                    by_value.setdefault(keys[dimension], []).append(position)
+                for value, members in by_value.items():
+                    self._set_bits(dimension, value, np.array(members))
+            self._size += len(rows)
+        return len(rows)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._size = 0
+            self._values = {name: np.full(self._capacity, np.nan) for name in NUMERIC_COLUMNS}
+            self._bitmaps = {dimension: {} for dimension in DIMENSIONS}
+
+    def _reserve(self, size: int) -> None:
+        if size <= self._capacity:
+            return
+        capacity = self._capacity
+        while capacity < size:
+            capacity *= 2
+        self._timestamps = np.resize(self._timestamps, capacity)
+        for name, values in self._values.items():
+            grown = np.full(capacity, np.nan)
+            grown[:self._size] = values[:self._size]
+            self._values[name] = grown
+        for bitmaps in self._bitmaps.values():
+            for value, bitmap in bitmaps.items():
+                grown = np.zeros(capacity // 8, dtype=np.uint8)
+                grown[:len(bitmap)] = bitmap
+                bitmaps[value] = grown
+        self._capacity = capacity
+
+    def _set_bits(self, dimension: str, value, positions: np.ndarray) -> None:
+        bitmap = self._bitmaps[dimension].get(value)
+        if bitmap is None:
+            bitmap = self._bitmaps[dimension][value] = np.zeros(self._capacity // 8, dtype=np.uint8)
+        # Big-endian bit order within each byte, matching np.unpackbits
+        np.bitwise_or.at(bitmap, positions >> 3, (0x80 >> (positions & 7)).astype(np.uint8))
+
+    # Queries
+
+    def values(self, dimension: str) -> List:
+        """Return the distinct indexed values of a dimension"""
+        with self._lock:
+            return sorted(self._bitmaps[dimension])
+
+    def select(self, city: Selector = None, condition: Selector = None, hour: Selector = None,
+               start=None, end=None, **ranges: Range) -> np.ndarray:
+        """Return row positions (in time order) matching every predicate.
+
+        city/condition/hour take one value or a collection (OR). start/end
+        bound the timestamp inclusively. Keyword ranges such as
+        temperature=(25, None) keep rows with low <= value <= high.
+        """
+        with self._lock:
+            return self._select({"city": city, "condition": condition, "hour": hour}, start, end, ranges)
+
+    def aggregate(self, column: str = "temperature", functions: Sequence[str] = AGGREGATES,
+                  **filters) -> Dict[str, float]:
+        """Aggregate a numeric column over the rows matching `filters` (see select)"""
+        with self._lock:
+            rows = self._select_filters(filters)
+            return self._aggregate(self._values[column][rows], functions)
+
+    def group_by(self, dimension: str, column: str = "temperature",
+                 functions: Sequence[str] = AGGREGATES, **filters) -> Dict[object, Dict[str, float]]:
+        """Aggregate a numeric column per value of a dimension (city, condition or hour)"""
+        with self._lock:
+            rows = self._select_filters(filters)
+            if not len(rows):
+                return {}
+            groups = {}
+            for value, bitmap in self._bitmaps[dimension].items():
+                members = rows[self._bits(bitmap)[rows]]
+                if len(members):
+                    groups[value] = self._aggregate(self._values[column][members], functions)
+            return groups
+
+    def rows(self, positions: np.ndarray) -> Dict[str, np.ndarray]:
+        """Return {"timestamp": ..., numeric columns...} for row positions"""
+        with self._lock:
+            result = {"timestamp": self._timestamps[positions]}
+            for name in NUMERIC_COLUMNS:
+                result[name] = self._values[name][positions]
+            return result
+
+    def labels(self, dimension: str, positions: np.ndarray) -> np.ndarray:
+        """Return the value of a dimension for each row position"""
+        with self._lock:
+            labels = np.empty(len(positions), dtype=object)
+            for value, bitmap in self._bitmaps[dimension].items():
+                labels[self._bits(bitmap)[positions]] = value
+            return labels
+
+    def _select_filters(self, filters: Dict) -> np.ndarray:
+        filters = dict(filters)
+        categorical = {dimension: filters.pop(dimension, None) for dimension in DIMENSIONS}
+        start, end = filters.pop("start", None), filters.pop("end", None)
+        return self._select(categorical, start, end, filters)
+
+    def _select(self, categorical: Dict, start, end, ranges: Dict) -> np.ndarray:
+        unknown = set(ranges) - set(NUMERIC_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown filter column(s): {', '.join(sorted(unknown))}")
+
+        mask = None
+        for dimension, wanted in categorical.items():
+            if wanted is None:
+                continue
+            bitmap = self._union(dimension, wanted)
+            mask = bitmap if mask is None else np.bitwise_and(mask, bitmap)
+        if mask is None:
+            rows = np.arange(self._size)
+        else:
+            rows = np.flatnonzero(self._bits(mask))
+
+        # Range predicates only touch the rows the bitmaps let through
+        timestamps = self._timestamps[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= timestamps >= to_epoch(start)
+        if end is not None:
+            keep &= timestamps <= to_epoch(end)
+        for name, (low, high) in ranges.items():
+            values = self._values[name][rows]
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+        rows = rows[keep]
+        return rows[np.argsort(self._timestamps[rows], kind="stable")]
+
+    def _union(self, dimension: str, wanted: Selector) -> np.ndarray:
+        if isinstance(wanted, (str, int)):
+            wanted = [wanted]
+        if dimension == "city":
+            wanted = [canonical_city(value) for value in wanted]
+        union = np.zeros(self._capacity // 8, dtype=np.uint8)
+        for value in wanted:
+            bitmap = self._bitmaps[dimension].get(value)
+            if bitmap is not None:
+                np.bitwise_or(union, bitmap, out=union)
+        return union
+
+    def _bits(self, bitmap: np.ndarray) -> np.ndarray:
+        return np.unpackbits(bitmap, count=self._size).astype(bool)
+
+    @staticmethod
+    def _aggregate(values: np.ndarray, functions: Sequence[str]) -> Dict[str, float]:
+        values = values[~np.isnan(values)]
+        result = {}
+        for function in functions:
+            if function == "count":
+                result["count"] = int(len(values))
+            elif function not in AGGREGATES:
+                raise ValueError(f"Unknown aggregate: {function}")
+            elif not len(values):
+                result[function] = None
+            else:
+                result[function] = float(getattr(np, function)(values))
+        return result
@@ -0,0 +1,139 @@
+# core/csv_tail.py
+"""Reverse tail reader for append-only CSV logs"""
+
+import csv
+import io
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_BLOCK_SIZE = 64 * 1024
+
+
+class CsvTailReader:
+    """Reads the last N records of a CSV file by seeking backwards in blocks.
+
+    Only the trailing blocks that hold the requested records are read, so
+    "last N rows" costs O(N) instead of O(file size). Quoted fields that span
+    lines are handled with quote parity: because a file always ends outside a
+    quoted field, a newline is a record boundary exactly when the number of
+    quote characters after it is even.
+    """
+
+    def __init__(self, path, has_header: bool = True, block_size: int = DEFAULT_BLOCK_SIZE):
+        self.path = Path(path)
+        self.has_header = has_header
+        self.block_size = block_size
+
+    def header(self) -> List[str]:
+        """Return the header row (read from the start of the file)"""
+        if not self.has_header or not self.path.exists():
+            return []
+        with open(self.path, "r", newline="") as f:
+            return next(csv.reader(f), [])
+
+    def tail_rows(self, limit: int, predicate: Optional[Callable[[List[str]], bool]] = None) -> List[List[str]]:
+        """Return up to `limit` trailing rows (oldest first).
+
+        When a predicate is given, scanning continues backwards until `limit`
+        matching rows are found or the start of the file is reached.
+        """
+        if limit <= 0 or not self.path.exists():
+            return []
+
+        rows = []
+        for row, is_first in self._iter_reversed():
+            if is_first and self.has_header:
+                break
+            if not row:
+                continue  # blank line
+            if predicate is None or predicate(row):
+                rows.append(row)
+                if len(rows) >= limit:
+                    break
+        rows.reverse()
+        return rows
+
+    def tail_dicts(self, limit: int, city: Optional[str] = None, city_field: str = "City") -> List[Dict]:
+        """Return up to `limit` trailing rows as csv.DictReader-style dicts.
+
+        Keys are the raw header names, so padded legacy headers behave exactly
+        as they do with DictReader. `city` matches case-insensitively against
+        the column whose stripped header equals `city_field`.
+        """
+        header = self.header()
+        if not header:
+            return []
+
+        predicate = None
+        if city:
+            wanted = city.strip().lower()
+            stripped = [name.strip() for name in header]
+            if city_field not in stripped:
+                return []
+            index = stripped.index(city_field)
+            predicate = lambda row: len(row) > index and row[index].strip().lower() == wanted
+
+        return [self._to_dict(header, row) for row in self.tail_rows(limit, predicate)]
+
+    @staticmethod
+    def _to_dict(header: List[str], row: List[str]) -> Dict:
+        """Mirror csv.DictReader: surplus values go under None, missing ones are None"""
+        record = dict(zip(header, row))
+        if len(row) > len(header):
+            record[None] = row[len(header):]
+        for name in header[len(row):]:
+            record[name] = None
+        return record
+
+    def _iter_reversed(self):
+        """Yield (row, is_first_record) from the end of the file backwards"""
+        with open(self.path, "rb") as f:
+            f.seek(0, io.SEEK_END)
+            position = f.tell()
+            pending = b""       # incomplete record preceding the last boundary found
+            quotes_after = 0    # quote characters from the end of `pending` to EOF
+
+            # Ignore the trailing newline that terminates the last record
+            if position:
+                f.seek(position - 1)
+                if f.read(1) == b"\n":
+                    position -= 1
+
+            while position > 0:
+                read_size = min(self.block_size, position)
+                position -= read_size
+                f.seek(position)
+                buffer = f.read(read_size) + pending
+                end = len(buffer)       # end of the record being assembled
+                scanned = end           # quotes in buffer[scanned:end] are counted
+                quotes = quotes_after
+
+                cut = buffer.rfind(b"\n", 0, scanned)
+                while cut != -1:
+                    quotes += buffer.count(b'"', cut + 1, scanned)
+                    scanned = cut
+                    if quotes % 2 == 0:
+                        yield self._parse(buffer[cut + 1:end]), False
+                        end = cut
+                        quotes_after = quotes
+                    cut = buffer.rfind(b"\n", 0, scanned)
+
+                # The incomplete record before the earliest boundary is rescanned
+                # together with the next (earlier) block
+                pending = buffer[:end]
+
+            yield self._parse(pending), True
+
+    @staticmethod
+    def _parse(record: bytes) -> List[str]:
+        text = record.decode("utf-8", errors="replace")
+        if text.endswith("\r"):
+            text = text[:-1]
+        if not text:
+            return []
+        return next(csv.reader(io.StringIO(text, newline="")), [])
+
+
+def tail_csv(path, limit: int, city: Optional[str] = None, city_field: str = "City") -> List[Dict]:
+    """Convenience wrapper: last `limit` rows of a headed CSV as dicts"""
+    return CsvTailReader(path).tail_dicts(limit, city=city, city_field=city_field)
@@ -0,0 +1,78 @@
+# core/dedup.py
+"""Write-time detection of repeated observations"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict
+
+from .columnar_store import to_epoch
+from .ingest import canonical_city
+
+# Provider refresh interval: identical readings without an observation time
+# are treated as repeats inside this window
+DEFAULT_WINDOW_SECONDS = 600.0
+DEFAULT_MAX_KEYS = 4096
+
+# Fields that change on every write and are not part of the reading itself
+_VOLATILE_FIELDS = {"timestamp", "observed_at", "city"}
+
+
+def observation_key(record: Dict) -> tuple:
+    """Return (city, provider observation time, content hash) for a write record.
+
+    A provider observation time identifies the reading on its own: every fetch
+    between two provider updates returns the same `dt`, whatever unit or
+    rounding the caller asked for, so such keys carry no content hash.
+    """
+    city = canonical_city(str(record.get("city") or ""))
+    observed_at = record.get("observed_at")
+    if observed_at is not None:
+        return (city, observed_at, None)
+    content = tuple(sorted((name, value) for name, value in record.items()
+                           if name not in _VOLATILE_FIELDS))
+    return (city, None, hash(content))
+
+
+class DuplicateFilter:
+    """Remembers recently written observation keys and rejects repeats.
+
+    Keys with a provider observation time (`observed_at`, the API's `dt`) are
+    duplicates whenever they are still in the index; keys without one only
+    count as duplicates when their timestamps are within `window` seconds of
+    each other. The index keeps the `max_keys` most recently seen keys.
+    """
+
+    def __init__(self, window: float = DEFAULT_WINDOW_SECONDS, max_keys: int = DEFAULT_MAX_KEYS):
+        self.window = window
+        self.max_keys = max_keys
+        self.accepted = 0
+        self.duplicates = 0
+        self._recent: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def accept(self, record: Dict) -> bool:
+        """Return True for a new observation, False (and count it) for a repeat"""
+        key = observation_key(record)
+        try:
+            now = to_epoch(record.get("timestamp"))
+        except ValueError:
+            now = time.time()
+        with self._lock:
+            seen = self._recent.get(key)
+            if seen is not None and (key[1] is not None or abs(now - seen) < self.window):
+                self.duplicates += 1
+                return False
+            self._recent[key] = now
+            self._recent.move_to_end(key)
+            if len(self._recent) > self.max_keys:
+                self._recent.popitem(last=False)
+            self.accepted += 1
+            return True
+
+    def clear(self) -> None:
+        with self._lock:
+            self._recent.clear()
+
+    def stats(self) -> Dict:
+        return {"accepted": self.accepted, "duplicates": self.duplicates, "tracked": len(self._recent)}
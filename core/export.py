@@ -0,0 +1,225 @@
+# core/export.py
+"""Chunked streaming export of observations to CSV, JSON Lines or Parquet"""
+
+import csv
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+PARQUET_AVAILABLE = False
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    pa = pq = None
+
+from .observation_store import OBSERVATION_COLUMNS
+
+EXPORT_FORMATS = ("csv", "jsonl", "parquet") if PARQUET_AVAILABLE else ("csv", "jsonl")
+
+DEFAULT_CHUNK_SIZE = 5000
+
+# Columns written when the caller names none (observation rows, CSV headers)
+DEFAULT_COLUMNS = [header for _, header in OBSERVATION_COLUMNS]
+
+# Parquet types of the observation columns; any other column is written as text
+_INTEGER_COLUMNS = {"Visibility", "Cloudiness", "WindDirection", "Sunrise", "Sunset"}
+_TEXT_COLUMNS = {"DateTime", "City", "Description", "Unit"}
+
+# progress(rows_written, total_rows_or_None)
+ProgressCallback = Callable[[int, Optional[int]], None]
+
+
+class ExportCancelled(Exception):
+    """Raised when an export is cancelled; the partial output is removed"""
+
+
+def chunked(rows: Iterable[Dict], size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+    """Group a row iterator into lists of at most `size` rows"""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def format_for_path(path) -> str:
+    """Infer the export format from a file extension (defaults to CSV)"""
+    suffix = Path(path).suffix.lower()
+    return {".jsonl": "jsonl", ".ndjson": "jsonl", ".parquet": "parquet"}.get(suffix, "csv")
+
+
+class _CsvSink:
+    def __init__(self, path: Path, columns: Sequence[str]):
+        self.file = open(path, "w", newline="")
+        self.writer = csv.DictWriter(self.file, fieldnames=list(columns), extrasaction="ignore")
+        self.writer.writeheader()
+
+    def write(self, rows: List[Dict]) -> None:
+        self.writer.writerows(rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+class _JsonLinesSink:
+    def __init__(self, path: Path, columns: Sequence[str]):
+        self.file = open(path, "w", encoding="utf-8")
+        self.columns = list(columns)
+
+    def write(self, rows: List[Dict]) -> None:
+        self.file.writelines(
+            json.dumps({name: row.get(name) for name in self.columns}, default=str) + "\n"
+            for row in rows)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+def _parquet_value(value, kind: str):
+    """Coerce a row value (CSV rows carry numbers as text) to the column's Parquet type"""
+    if value is None or value == "":
+        return None
+    if kind == "string":
+        return str(value)
+    try:
+        return int(float(value)) if kind == "int64" else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class _ParquetSink:
+    """Writes one row group per chunk under a schema fixed up front.
+
+    Inferring the schema from the first chunk would pin a column that is
+    empty there to the null type and make a later chunk fail.
+    """
+
+    def __init__(self, path: Path, columns: Sequence[str]):
+        self.kinds = {name: "int64" if name in _INTEGER_COLUMNS else
+                      "string" if name in _TEXT_COLUMNS or name not in DEFAULT_COLUMNS else "float64"
+                      for name in columns}
+        self.schema = pa.schema([(name, getattr(pa, kind)()) for name, kind in self.kinds.items()])
+        self.writer = pq.ParquetWriter(str(path), self.schema)
+
+    def write(self, rows: List[Dict]) -> None:
+        table = pa.Table.from_pylist(
+            [{name: _parquet_value(row.get(name), kind) for name, kind in self.kinds.items()} for row in rows],
+            schema=self.schema)
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+_SINKS = {"csv": _CsvSink, "jsonl": _JsonLinesSink, "parquet": _ParquetSink}
+
+
+def export_chunks(chunks: Iterable[List[Dict]], path, fmt: Optional[str] = None,
+                  columns: Optional[Sequence[str]] = None, total: Optional[int] = None,
+                  progress: Optional[ProgressCallback] = None,
+                  cancel_event: Optional[threading.Event] = None) -> int:
+    """Stream chunks of row dicts to `path` and return the number of rows written.
+
+    Only one chunk is held in memory at a time. Output goes to a temporary
+    file that replaces `path` on success; on cancellation (`cancel_event`
+    set) or error it is deleted and `path` is left untouched.
+    """
+    fmt = fmt or format_for_path(path)
+    if fmt not in _SINKS:
+        raise ValueError(f"Unknown export format: {fmt}")
+    if fmt == "parquet" and not PARQUET_AVAILABLE:
+        raise ValueError("Parquet export requires pyarrow")
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(path.name + ".part")
+    sink = None
+    written = 0
+    try:
+        for chunk in chunks:
+            if cancel_event is not None and cancel_event.is_set():
+                raise ExportCancelled(f"Export cancelled after {written} rows")
+            if not chunk:
+                continue
+            if sink is None:
+                sink = _SINKS[fmt](temp_path, columns or list(chunk[0].keys()))
+            sink.write(chunk)
+            written += len(chunk)
+            if progress is not None:
+                progress(written, total)
+        if sink is None:
+            # No rows matched: still produce a valid file with the full header
+            sink = _SINKS[fmt](temp_path, columns or DEFAULT_COLUMNS)
+        sink.close()
+        sink = None
+        os.replace(temp_path, path)
+        return written
+    finally:
+        if sink is not None:
+            sink.close()
+        if temp_path.exists():
+            temp_path.unlink()
+
+
+class ExportJob:
+    """Runs export_chunks on a background thread so the UI can poll and cancel"""
+
+    def __init__(self, chunks: Iterable[List[Dict]], path, fmt: Optional[str] = None,
+                 columns: Optional[Sequence[str]] = None, total: Optional[int] = None):
+        self.path = Path(path)
+        self.fmt = fmt or format_for_path(path)
+        self.total = total
+        self.rows_written = 0
+        self.error: Optional[Exception] = None
+        self.cancelled = False
+        self.elapsed = 0.0
+        self._cancel_event = threading.Event()
+        self._done = threading.Event()
+        self._args = (chunks, self.path, self.fmt, columns, total)
+        self._thread = threading.Thread(target=self._run, name="export-job", daemon=True)
+
+    def start(self) -> "ExportJob":
+        self._thread.start()
+        return self
+
+    def cancel(self) -> None:
+        self._cancel_event.set()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def fraction(self) -> Optional[float]:
+        """Completed share of the export, or None when the total is unknown"""
+        if not self.total:
+            return None
+        return min(1.0, self.rows_written / self.total)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def _progress(self, written: int, total: Optional[int]) -> None:
+        self.rows_written = written
+
+    def _run(self) -> None:
+        started = time.perf_counter()
+        chunks, path, fmt, columns, total = self._args
+        try:
+            self.rows_written = export_chunks(chunks, path, fmt, columns, total,
+                                              self._progress, self._cancel_event)
+        except ExportCancelled:
+            self.cancelled = True
+        except Exception as e:
+            self.error = e
+        finally:
+            self.elapsed = time.perf_counter() - started
+            self._done.set()
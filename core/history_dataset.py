@@ -0,0 +1,168 @@
+# core/history_dataset.py
+"""Observation history parsed once into typed per-city arrays"""
+
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .columnar_store import to_epoch
+from .ingest import canonical_city
+from .observation_store import OBSERVATION_COLUMNS
+
+# Column name -> dtype; missing numbers are NaN
+DATASET_COLUMNS = {
+    "timestamp": np.int64,
+    "temperature": np.float64,
+    "humidity": np.float64,
+    "wind_speed": np.float64,
+    "pressure": np.float64,
+    "description": object,
+}
+
+_FIELD_NAMES = {header: column for column, header in OBSERVATION_COLUMNS}
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _CityColumns:
+    """Growable column arrays for one city (capacity doubles as rows arrive)"""
+
+    def __init__(self, capacity: int = 256):
+        self.size = 0
+        self.columns = {name: np.empty(capacity, dtype=dtype) for name, dtype in DATASET_COLUMNS.items()}
+
+    def extend(self, values: Dict[str, list]) -> None:
+        count = len(values["timestamp"])
+        capacity = len(self.columns["timestamp"])
+        if self.size + count > capacity:
+            capacity = max(capacity * 2, self.size + count)
+            for name, array in self.columns.items():
+                grown = np.empty(capacity, dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.columns[name] = grown
+        for name, array in self.columns.items():
+            array[self.size:self.size + count] = values[name]
+        self.size += count
+
+
+class HistoryDataset:
+    """Per-city numpy columns built from repository rows and extended in place.
+
+    Accepts rows keyed by CSV headers (repository reads) or field names
+    (write batches). Rows without a city or numeric temperature are skipped.
+    Each city's columns are contiguous arrays found with one dict lookup, so
+    per-city statistics are vectorized slices rather than scans. grouped()
+    packs every city into shared arrays with a city -> slice map for
+    cross-city work. Arrays returned are views; treat them as read-only.
+
+    The repository's writer thread extends the dataset while the UI reads
+    it, so both go through one lock. A returned view keeps showing the rows
+    it was taken with: appends land past its end or in a grown copy.
+    """
+
+    def __init__(self, records: Iterable[Dict] = ()):
+        self._cities: Dict[str, _CityColumns] = {}
+        self._grouped = None  # (columns, slices) until the next extend()
+        self._lock = threading.RLock()
+        self.extend(records)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(columns.size for columns in self._cities.values())
+
+    def extend(self, records: Iterable[Dict]) -> int:
+        """Append rows and return how many were kept"""
+        by_city: Dict[str, Dict[str, list]] = {}
+        for record in records:
+            record = {_FIELD_NAMES.get(key, key): value for key, value in record.items()}
+            temperature = _to_float(record.get("temperature"))
+            if not record.get("city") or np.isnan(temperature):
+                continue
+            try:
+                timestamp = to_epoch(record.get("timestamp"))
+            except ValueError:
+                continue
+            values = by_city.setdefault(canonical_city(record["city"]),
+                                        {name: [] for name in DATASET_COLUMNS})
+            values["timestamp"].append(timestamp)
+            values["temperature"].append(temperature)
+            for name in ("humidity", "wind_speed", "pressure"):
+                values[name].append(_to_float(record.get(name)))
+            values["description"].append(str(record.get("description") or ""))
+
+        with self._lock:
+            for city, values in by_city.items():
+                self._cities.setdefault(city, _CityColumns()).extend(values)
+            if by_city:
+                self._grouped = None
+        return sum(len(values["timestamp"]) for values in by_city.values())
+
+    def cities(self) -> List[str]:
+        with self._lock:
+            return sorted(self._cities)
+
+    def city(self, city: str, limit: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Return the city's columns (the last `limit` rows when given), oldest first"""
+        with self._lock:
+            columns = self._cities.get(canonical_city(city))
+            if columns is None:
+                return {name: np.empty(0, dtype=dtype) for name, dtype in DATASET_COLUMNS.items()}
+            start = max(0, columns.size - limit) if limit is not None else 0
+            return {name: array[start:columns.size] for name, array in columns.columns.items()}
+
+    def grouped(self) -> Tuple[Dict[str, np.ndarray], Dict[str, slice]]:
+        """Return every city's rows packed into shared arrays plus a city -> slice map"""
+        with self._lock:
+            if self._grouped is None:
+                slices, start = {}, 0
+                for city in sorted(self._cities):
+                    size = self._cities[city].size
+                    slices[city] = slice(start, start + size)
+                    start += size
+                columns = {name: np.concatenate([self._cities[city].columns[name][:self._cities[city].size]
+                                                 for city in slices]) if slices else np.empty(0, dtype=dtype)
+                           for name, dtype in DATASET_COLUMNS.items()}
+                self._grouped = (columns, slices)
+            return self._grouped
+
+    def stats(self, city: str, column: str = "temperature",
+              limit: Optional[int] = None) -> Optional[Dict[str, float]]:
+        """Return count/mean/std/min/max of a numeric column, ignoring missing values"""
+        values = self.city(city, limit)[column]
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return None
+        return {"count": len(values), "mean": float(values.mean()), "std": float(values.std()),
+                "min": float(values.min()), "max": float(values.max())}
+
+    def zscores(self, city: str, column: str = "temperature", limit: Optional[int] = None) -> np.ndarray:
+        """Return each value's distance from the window mean in standard deviations"""
+        values = self.city(city, limit)[column]
+        if not len(values):
+            return values
+        return (values - np.nanmean(values)) / (np.nanstd(values) + 1e-6)
+
+    def trend(self, city: str, column: str = "temperature", limit: Optional[int] = None) -> Optional[float]:
+        """Return the least-squares slope of a column in units per hour"""
+        data = self.city(city, limit)
+        present = ~np.isnan(data[column])
+        hours = (data["timestamp"][present] - data["timestamp"][present][:1]) / 3600.0
+        if len(hours) < 2 or np.ptp(hours) == 0:
+            return None
+        return float(np.polyfit(hours, data[column][present], 1)[0])
+
+    def recent(self, limit: int) -> Dict[str, np.ndarray]:
+        """Return the last `limit` rows across every city in time order"""
+        with self._lock:
+            parts = [self.city(city, limit) for city in self._cities]
+        if not parts:
+            return self.city("")
+        merged = {name: np.concatenate([part[name] for part in parts]) for name in DATASET_COLUMNS}
+        order = np.argsort(merged["timestamp"], kind="stable")[-limit:]
+        return {name: array[order] for name, array in merged.items()}
@@ -0,0 +1,268 @@
+# core/ingest.py
+"""One-time ingest/migration of legacy weather logs into the canonical schema"""
+
+import csv
+import hashlib
+import json
+import os
+import re
+import string
+import sys
+import unicodedata
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+SCHEMA_VERSION = 2
+
+# Column order written by WeatherService.save_weather since schema v1
+CANONICAL_HEADER = ["DateTime", "City", "Temperature", "Description", "Unit", "Humidity", "WindSpeed"]
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def canonical_city(name: str) -> str:
+    """Return the canonical, interned key for a city name.
+
+    ' new   york ' -> 'New York', "st. john's" -> "St. John's". Interning makes
+    equality checks on hot read paths identity-fast and keeps one string
+    object per city in memory.
+    """
+    return sys.intern(string.capwords(str(name)))
+
+
+# Stored observations are metric (°C, m/s); imperial readings are converted on write
+CANONICAL_UNIT = "metric"
+_FROM_IMPERIAL = {
+    "temperature": lambda fahrenheit: (fahrenheit - 32) * 5 / 9,
+    "feels_like": lambda fahrenheit: (fahrenheit - 32) * 5 / 9,
+    "wind_speed": lambda mph: mph * 0.44704,
+}
+
+
+def to_metric(record: Dict, default_unit: str = CANONICAL_UNIT) -> Dict:
+    """Return a write record (store field names) in the canonical metric units.
+
+    `default_unit` is assumed for records without a unit. Records in a unit
+    system other than metric/imperial are returned unchanged.
+    """
+    unit = str(record.get("unit") or "").strip().lower() or default_unit
+    if unit not in ("metric", "imperial"):
+        return record
+    record = dict(record, unit=CANONICAL_UNIT)
+    if unit == "imperial":
+        for field, convert in _FROM_IMPERIAL.items():
+            try:
+                record[field] = round(convert(float(record[field])), 2)
+            except (KeyError, TypeError, ValueError):
+                pass
+    return record
+
+
+def metric_row(row: Dict[str, str]) -> Dict[str, str]:
+    """Return a validated log row (see validate_observation) in metric units.
+
+    Rows without a unit predate the Unit column, when the log was kept in °F.
+    """
+    record = to_metric({"unit": row["Unit"], "temperature": row["Temperature"],
+                        "wind_speed": row["WindSpeed"]}, default_unit="imperial")
+    return dict(row, Unit=record["unit"], Temperature=str(record["temperature"]),
+                WindSpeed=str(record["wind_speed"]))
+
+
+def city_slug(name: str) -> str:
+    """Return a file name for a city's data that no other city shares.
+
+    'São Paulo' -> 'sao_paulo-<8 hex digits>'. The readable part is ASCII
+    only, so the hash of the canonical name keeps cities apart whose
+    names reduce to the same ASCII text.
+    """
+    city = canonical_city(name)
+    ascii_name = unicodedata.normalize("NFKD", city).encode("ascii", "ignore").decode("ascii")
+    readable = re.sub(r"[^0-9A-Za-z]+", "_", ascii_name).strip("_").lower() or "city"
+    return f"{readable}-{hashlib.sha1(city.encode('utf-8')).hexdigest()[:8]}"
+
+
+def legacy_city_slug(name: str) -> str:
+    """The file name used before city_slug; only for finding existing files"""
+    return re.sub(r"[^0-9A-Za-z]+", "_", canonical_city(name)).strip("_").lower() or "_"
+
+
+class CityRegistry:
+    """Assigns stable integer ids to canonical city names"""
+
+    def __init__(self, cities: Optional[Dict[str, int]] = None):
+        self._ids: Dict[str, int] = dict(cities or {})
+
+    def intern(self, name: str) -> str:
+        """Canonicalize a name and register it, returning the canonical key"""
+        key = canonical_city(name)
+        if key not in self._ids:
+            self._ids[key] = len(self._ids) + 1
+        return key
+
+    def id_for(self, name: str) -> int:
+        return self._ids[self.intern(name)]
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(self._ids)
+
+    def __len__(self):
+        return len(self._ids)
+
+
+def schema_path(log_file) -> Path:
+    """Sidecar file recording the schema version of a CSV log"""
+    path = Path(log_file)
+    return path.with_name(f"{path.stem}.schema.json")
+
+
+def read_schema(log_file) -> Optional[Dict]:
+    """Return the recorded schema metadata, or None for an unmigrated log"""
+    try:
+        with open(schema_path(log_file), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_schema(log_file, registry: CityRegistry, source_rows: int = 0, dropped_rows: int = 0) -> None:
+    """Record the schema version and city registry next to the log"""
+    meta = {
+        "schema_version": SCHEMA_VERSION,
+        "columns": CANONICAL_HEADER,
+        "cities": registry.to_dict(),
+        "migrated_at": datetime.now().strftime(TIMESTAMP_FORMAT),
+        "source_rows": source_rows,
+        "dropped_rows": dropped_rows,
+    }
+    with open(schema_path(log_file), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def save_registry(log_file, registry: CityRegistry) -> None:
+    """Persist newly registered cities without touching the rest of the metadata"""
+    meta = read_schema(log_file)
+    if meta is None:
+        write_schema(log_file, registry)
+        return
+    meta["cities"] = registry.to_dict()
+    with open(schema_path(log_file), "w") as f:
+        json.dump(meta, f, indent=2)
+
+
+def load_registry(log_file) -> CityRegistry:
+    """Return the city registry recorded for a log (empty if none)"""
+    meta = read_schema(log_file) or {}
+    return CityRegistry(meta.get("cities"))
+
+
+def is_normalized(log_file) -> bool:
+    meta = read_schema(log_file)
+    return bool(meta) and meta.get("schema_version", 0) >= SCHEMA_VERSION
+
+
+def validate_observation(row: Dict, registry: Optional[CityRegistry] = None) -> Dict[str, str]:
+    """Validate a row keyed by CANONICAL_HEADER and return it in canonical form.
+
+    Raises ValueError when the row lacks a timestamp, city or numeric temperature.
+    """
+    clean = {}
+    for column in CANONICAL_HEADER:
+        value = row.get(column)
+        value = "" if value is None else str(value).strip()
+        clean[column] = "" if value == "None" else value
+
+    if not clean["City"]:
+        raise ValueError("Observation is missing a city")
+
+    try:
+        datetime.strptime(clean["DateTime"], TIMESTAMP_FORMAT)
+    except ValueError:
+        raise ValueError(f"Invalid observation timestamp: {clean['DateTime']!r}")
+
+    try:
+        float(clean["Temperature"])
+    except ValueError:
+        raise ValueError(f"Invalid temperature for {clean['City']}: {clean['Temperature']!r}")
+
+    # Only valid rows register their city
+    clean["City"] = registry.intern(clean["City"]) if registry is not None else canonical_city(clean["City"])
+
+    for column in ("Humidity", "WindSpeed"):
+        if clean[column]:
+            try:
+                float(clean[column])
+            except ValueError:
+                clean[column] = ""
+    return clean
+
+
+def iter_legacy_rows(log_file) -> Iterator[Dict[str, str]]:
+    """Yield raw rows of a legacy log keyed by CANONICAL_HEADER.
+
+    Handles padded/cased header names and rows carrying more values than the
+    header declares (old 4-column header with 7-column rows appended later).
+    """
+    with open(log_file, "r", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        by_name = {name.lower(): name for name in CANONICAL_HEADER}
+        columns = [by_name.get(name.strip().lower()) for name in header]
+
+        for row in reader:
+            if not any(value.strip() for value in row):
+                continue
+            record = {}
+            for index, value in enumerate(row):
+                if index < len(columns) and columns[index]:
+                    record[columns[index]] = value
+                elif index < len(CANONICAL_HEADER):
+                    # Surplus values follow the canonical writer order
+                    record.setdefault(CANONICAL_HEADER[index], value)
+            yield record
+
+
+def normalize_log_file(log_file, keep_backup: bool = True) -> Dict:
+    """Rewrite a legacy CSV log into the canonical schema exactly once.
+
+    An explicit migration step (`python -m core.migrate`); nothing calls it
+    implicitly on an existing log. A missing log is created empty. Returns a
+    report dict; a log already at SCHEMA_VERSION is left untouched.
+    """
+    log_file = Path(log_file)
+    if is_normalized(log_file):
+        return {"migrated": False, "reason": "already at schema version %d" % SCHEMA_VERSION}
+
+    registry = CityRegistry()
+    if not log_file.exists():
+        log_file.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_file, "w", newline="") as f:
+            csv.writer(f).writerow(CANONICAL_HEADER)
+        write_schema(log_file, registry)
+        return {"migrated": True, "rows": 0, "dropped": 0, "cities": 0}
+
+    rows: List[Dict[str, str]] = []
+    source_rows = 0
+    dropped = 0
+    for record in iter_legacy_rows(log_file):
+        source_rows += 1
+        try:
+            rows.append(metric_row(validate_observation(record, registry)))
+        except ValueError:
+            dropped += 1
+
+    temp_file = log_file.with_suffix(log_file.suffix + ".tmp")
+    with open(temp_file, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=CANONICAL_HEADER)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    if keep_backup:
+        backup = log_file.with_suffix(log_file.suffix + ".legacy")
+        if not backup.exists():
+            os.replace(log_file, backup)
+    os.replace(temp_file, log_file)
+    write_schema(log_file, registry, source_rows, dropped)
+
+    return {"migrated": True, "rows": len(rows), "dropped": dropped, "cities": len(registry)}
@@ -0,0 +1,25 @@
+# core/migrate.py
+"""Explicit migration of legacy CSV weather logs: python -m core.migrate [log ...]"""
+
+import argparse
+from typing import List, Optional
+
+from .ingest import normalize_log_file
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Migrate legacy weather logs to the canonical CSV schema")
+    parser.add_argument("logs", nargs="*", default=["data/weather_log.csv"])
+    parser.add_argument("--no-backup", action="store_true", help="don't keep the original as <log>.legacy")
+    args = parser.parse_args(argv)
+
+    for log_file in args.logs:
+        report = normalize_log_file(log_file, keep_backup=not args.no_backup)
+        if report["migrated"]:
+            print(f"{log_file}: {report['rows']} rows, {report['dropped']} dropped, {report['cities']} cities")
+        else:
+            print(f"{log_file}: {report['reason']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,613 @@
+# core/observation_store.py
+"""Indexed SQLite observation store"""
+
+import csv
+import gzip
+import math
+import sqlite3
+import threading
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
+
+from .ingest import canonical_city, iter_legacy_rows, to_metric
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# user_version of the database: 2 = canonical city names, 3 = rollup tables,
+# 4 = precipitation counted once per hour, 5 = city keys via string.capwords,
+# 6 = every observation in metric units
+STORE_SCHEMA_VERSION = 6
+
+# Rollup period -> number of timestamp characters that identify the bucket
+ROLLUP_PERIODS = {"hour": 13, "day": 10}
+
+# (store column, CSV header) pairs. Rows are returned keyed by the CSV header so
+# callers that used csv.DictReader on weather_log.csv keep working unchanged.
+OBSERVATION_COLUMNS = [
+    ("timestamp", "DateTime"),
+    ("city", "City"),
+    ("temperature", "Temperature"),
+    ("description", "Description"),
+    ("unit", "Unit"),
+    ("humidity", "Humidity"),
+    ("wind_speed", "WindSpeed"),
+    ("visibility", "Visibility"),
+    ("cloudiness", "Cloudiness"),
+    ("pressure", "Pressure"),
+    ("wind_direction", "WindDirection"),
+    ("feels_like", "FeelsLike"),
+    ("sunrise", "Sunrise"),
+    ("sunset", "Sunset"),
+    ("rain_1h", "Rain1h"),
+    ("rain_3h", "Rain3h"),
+    ("snow_1h", "Snow1h"),
+    ("snow_3h", "Snow3h"),
+]
+
+# Columns stored on the observations table itself (city is normalized out)
+_VALUE_COLUMNS = [column for column, _ in OBSERVATION_COLUMNS if column not in ("timestamp", "city")]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS cities (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE COLLATE NOCASE
+);
+CREATE TABLE IF NOT EXISTS observations (
+    id INTEGER PRIMARY KEY,
+    city_id INTEGER NOT NULL REFERENCES cities(id),
+    timestamp TEXT NOT NULL,
+    temperature REAL NOT NULL,
+    description TEXT,
+    unit TEXT,
+    humidity REAL,
+    wind_speed REAL,
+    visibility INTEGER,
+    cloudiness INTEGER,
+    pressure REAL,
+    wind_direction INTEGER,
+    feels_like REAL,
+    sunrise INTEGER,
+    sunset INTEGER,
+    rain_1h REAL,
+    rain_3h REAL,
+    snow_1h REAL,
+    snow_3h REAL
+);
+CREATE INDEX IF NOT EXISTS idx_observations_city_time ON observations(city_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_observations_time ON observations(timestamp);
+CREATE TABLE IF NOT EXISTS rollups (
+    city_id INTEGER NOT NULL REFERENCES cities(id),
+    period TEXT NOT NULL,
+    bucket TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    temp_sum REAL NOT NULL,
+    temp_sumsq REAL NOT NULL,
+    temp_min REAL NOT NULL,
+    temp_max REAL NOT NULL,
+    humidity_sum REAL NOT NULL,
+    humidity_count INTEGER NOT NULL,
+    wind_sum REAL NOT NULL,
+    wind_count INTEGER NOT NULL,
+    wind_u_sum REAL NOT NULL,
+    wind_v_sum REAL NOT NULL,
+    precipitation REAL NOT NULL,
+    PRIMARY KEY (city_id, period, bucket)
+) WITHOUT ROWID;
+"""
+
+# Adds one observation's contribution (or a pre-aggregated group) to a bucket
+_ROLLUP_UPSERT = """
+INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (city_id, period, bucket) DO UPDATE SET
+    count = count + excluded.count,
+    temp_sum = temp_sum + excluded.temp_sum,
+    temp_sumsq = temp_sumsq + excluded.temp_sumsq,
+    temp_min = MIN(temp_min, excluded.temp_min),
+    temp_max = MAX(temp_max, excluded.temp_max),
+    humidity_sum = humidity_sum + excluded.humidity_sum,
+    humidity_count = humidity_count + excluded.humidity_count,
+    wind_sum = wind_sum + excluded.wind_sum,
+    wind_count = wind_count + excluded.wind_count,
+    wind_u_sum = wind_u_sum + excluded.wind_u_sum,
+    wind_v_sum = wind_v_sum + excluded.wind_v_sum,
+    precipitation = CASE WHEN period = 'hour' THEN MAX(precipitation, excluded.precipitation)
+                         ELSE precipitation + excluded.precipitation END
+"""
+
+
+_SELECT_COLUMNS = "o.timestamp, c.name, " + ", ".join(f"o.{column}" for column in _VALUE_COLUMNS)
+_FROM = " FROM observations o JOIN cities c ON c.id = o.city_id"
+_SELECT = f"SELECT {_SELECT_COLUMNS}{_FROM}"
+
+
+def _number(value) -> Optional[float]:
+    """Return value as a float, or None when missing or non-numeric"""
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _accumulate(buckets: Dict[tuple, List[float]], city_id: int, timestamp: str, record: Dict) -> None:
+    """Fold one observation into the hourly and daily bucket aggregates.
+
+    rain_1h/snow_1h are trailing one-hour totals that every reading in the
+    hour repeats, so an hour keeps the largest; daily precipitation is the
+    sum of the hours (see _upsert_rollups).
+    """
+    temperature = _number(record.get("temperature"))
+    if temperature is None:
+        return
+    humidity = _number(record.get("humidity"))
+    wind_speed = _number(record.get("wind_speed"))
+    direction = _number(record.get("wind_direction"))
+    precipitation = (_number(record.get("rain_1h")) or 0.0) + (_number(record.get("snow_1h")) or 0.0)
+    u = math.cos(math.radians(direction)) if direction is not None else 0.0
+    v = math.sin(math.radians(direction)) if direction is not None else 0.0
+
+    for period, width in ROLLUP_PERIODS.items():
+        key = (city_id, period, timestamp[:width])
+        hourly = precipitation if period == "hour" else 0.0
+        agg = buckets.get(key)
+        if agg is None:
+            buckets[key] = [1, temperature, temperature * temperature, temperature, temperature,
+                            humidity or 0.0, int(humidity is not None),
+                            wind_speed or 0.0, int(wind_speed is not None), u, v, hourly]
+            continue
+        agg[0] += 1
+        agg[1] += temperature
+        agg[2] += temperature * temperature
+        agg[3] = min(agg[3], temperature)
+        agg[4] = max(agg[4], temperature)
+        agg[5] += humidity or 0.0
+        agg[6] += humidity is not None
+        agg[7] += wind_speed or 0.0
+        agg[8] += wind_speed is not None
+        agg[9] += u
+        agg[10] += v
+        agg[11] = max(agg[11], hourly)
+
+
+def _std(count: int, total: float, sum_squares: float) -> float:
+    """Population standard deviation from running sums"""
+    if count < 2:
+        return 0.0
+    mean = total / count
+    return math.sqrt(max(0.0, sum_squares / count - mean * mean))
+
+
+def format_timestamp(value: Union[str, datetime, None]) -> str:
+    """Return a sortable 'YYYY-MM-DD HH:MM:SS' string"""
+    if value is None:
+        return datetime.now().strftime(TIMESTAMP_FORMAT)
+    if isinstance(value, datetime):
+        return value.strftime(TIMESTAMP_FORMAT)
+    return str(value).strip()
+
+
+class ObservationStore:
+    """Stores weather observations in SQLite (WAL mode) with per-city time indexes"""
+
+    def __init__(self, db_path: str = "data/weather_observations.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+
+        # One shared connection guarded by a lock; background writers may use it too
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._city_ids: Dict[str, int] = {}
+        self._migrate()
+
+    def _migrate(self) -> None:
+        """Bring databases written by older versions up to STORE_SCHEMA_VERSION.
+
+        `migrated_from` is left at the previous version (None when the
+        database was current), so owners of derived data know to rebuild it.
+        """
+        self.migrated_from = None
+        version = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= STORE_SCHEMA_VERSION:
+            return
+
+        with self._conn:
+            # v2/v5: city names are canonical keys (merge rows that only differed by spacing or case)
+            cities = self._conn.execute("SELECT id, name FROM cities").fetchall() if version < 5 else []
+            for city_id, name in cities:
+                key = canonical_city(name)
+                if key == name:
+                    continue
+                existing = self._conn.execute(
+                    "SELECT id FROM cities WHERE name = ? AND id != ?", (key, city_id)).fetchone()
+                if existing:
+                    self._conn.execute("UPDATE observations SET city_id = ? WHERE city_id = ?",
+                                       (existing[0], city_id))
+                    # Buckets the surviving city lacks move over; overlapping ones are rebuilt below
+                    self._conn.execute("UPDATE OR IGNORE rollups SET city_id = ? WHERE city_id = ?",
+                                       (existing[0], city_id))
+                    self._conn.execute("DELETE FROM rollups WHERE city_id = ?", (city_id,))
+                    self._conn.execute("DELETE FROM cities WHERE id = ?", (city_id,))
+                else:
+                    self._conn.execute("UPDATE cities SET name = ? WHERE id = ?", (key, city_id))
+            # v6: imperial readings, and unit-less ones from the legacy log (recorded in °F), become metric
+            if version < 6:
+                self._conn.execute(
+                    "UPDATE observations SET temperature = ROUND((temperature - 32) * 5.0 / 9, 2), "
+                    "feels_like = ROUND((feels_like - 32) * 5.0 / 9, 2), "
+                    "wind_speed = ROUND(wind_speed * 0.44704, 2), unit = 'metric' "
+                    "WHERE unit = 'imperial' OR unit IS NULL OR unit = ''")
+            # v3: hourly/daily rollups, built from the existing observations (v4-v6 rebuild them)
+            self._rebuild_rollups()
+            self._conn.execute(f"PRAGMA user_version = {STORE_SCHEMA_VERSION}")
+        self.migrated_from = version
+
+    def close(self) -> None:
+        """Close the database connection"""
+        with self._lock:
+            self._conn.close()
+
+    # Writes
+
+    def add(self, observation, timestamp: Union[str, datetime, None] = None) -> None:
+        """Add one observation (a WeatherData instance or a field dict)"""
+        self.add_many([observation], timestamp)
+
+    def add_many(self, observations: Iterable, timestamp: Union[str, datetime, None] = None) -> int:
+        """Add several observations in one transaction and return how many were stored"""
+        rows = []
+        buckets: Dict[tuple, List[float]] = {}
+        with self._lock:
+            for observation in observations:
+                record = asdict(observation) if is_dataclass(observation) else dict(observation)
+                city = str(record.get("city") or "").strip()
+                if not city or record.get("temperature") in (None, ""):
+                    continue
+                record = to_metric(record)
+                city_id = self._city_id(canonical_city(city))
+                when = format_timestamp(record.get("timestamp", timestamp))
+                rows.append([city_id, when] + [record.get(column) for column in _VALUE_COLUMNS])
+                _accumulate(buckets, city_id, when, record)
+
+            placeholders = ", ".join("?" for _ in range(len(_VALUE_COLUMNS) + 2))
+            with self._conn:
+                self._conn.executemany(
+                    f"INSERT INTO observations (city_id, timestamp, {', '.join(_VALUE_COLUMNS)}) "
+                    f"VALUES ({placeholders})",
+                    rows,
+                )
+                # Rollups are updated in the same transaction, so they never drift
+                self._upsert_rollups(buckets)
+        return len(rows)
+
+    def _upsert_rollups(self, buckets: Dict[tuple, List[float]]) -> None:
+        """Write bucket aggregates; a day gains whatever its hours' precipitation rose by"""
+        for (city_id, period, bucket), agg in buckets.items():
+            if period != "hour" or not agg[11]:
+                continue
+            stored = self._conn.execute(
+                "SELECT precipitation FROM rollups WHERE city_id = ? AND period = 'hour' AND bucket = ?",
+                (city_id, bucket)).fetchone()
+            rise = agg[11] - (stored[0] if stored else 0.0)
+            if rise > 0:
+                buckets[(city_id, "day", bucket[:ROLLUP_PERIODS["day"]])][11] += rise
+        self._conn.executemany(_ROLLUP_UPSERT, [key + tuple(agg) for key, agg in buckets.items()])
+
+    def _rebuild_rollups(self) -> None:
+        """Recompute rollup buckets from the raw observations.
+
+        A bucket that holds more observations than remain in the table lost
+        rows to prune(); it keeps its stored figures, as do buckets whose raw
+        rows are all gone.
+        """
+        buckets: Dict[tuple, List[float]] = {}
+        columns = ["temperature", "humidity", "wind_speed", "wind_direction", "rain_1h", "snow_1h"]
+        cursor = self._conn.execute(f"SELECT city_id, timestamp, {', '.join(columns)} FROM observations")
+        for row in cursor:
+            _accumulate(buckets, row[0], row[1], dict(zip(columns, row[2:])))
+        stored = {(city_id, period, bucket): count for city_id, period, bucket, count
+                  in self._conn.execute("SELECT city_id, period, bucket, count FROM rollups")}
+        # A day keeps its stored figures as soon as one of its hours does, so the two stay consistent
+        pruned_days = {(city_id, bucket[:ROLLUP_PERIODS["day"]])
+                       for (city_id, period, bucket), agg in buckets.items()
+                       if stored.get((city_id, period, bucket), 0) > agg[0]}
+        buckets = {key: agg for key, agg in buckets.items()
+                   if (key[0], key[2][:ROLLUP_PERIODS["day"]]) not in pruned_days}
+        self._conn.executemany("DELETE FROM rollups WHERE city_id = ? AND period = ? AND bucket = ?",
+                               list(buckets))
+        self._upsert_rollups(buckets)
+
+    def prune(self, before: Union[str, datetime], archive_path: Optional[str] = None,
+              archive: Optional[Callable[[List[Dict]], object]] = None) -> int:
+        """Delete raw observations older than `before`, keeping their rollups.
+
+        When `archive_path` is given the pruned rows are exported there as CSV
+        first; `archive` is instead called with the rows (e.g. a SeriesArchive's
+        append). Returns the number of observations removed.
+        """
+        cutoff = format_timestamp(before)
+        with self._lock:
+            expired = self._conn.execute(
+                "SELECT COUNT(*) FROM observations WHERE timestamp < ?", (cutoff,)).fetchone()[0]
+            if not expired:
+                return 0
+            if archive_path or archive:
+                # range() is inclusive; the cutoff row itself is not deleted below
+                rows = [row for row in self.range(end=cutoff) if row["DateTime"] < cutoff]
+                if archive_path:
+                    self._write_csv(archive_path, rows)
+                if archive:
+                    archive(rows)
+            with self._conn:
+                self._conn.execute("DELETE FROM observations WHERE timestamp < ?", (cutoff,))
+        return expired
+
+    def clear(self) -> int:
+        """Delete every observation and rollup; returns the number of observations removed"""
+        with self._lock:
+            removed = self.count()
+            with self._conn:
+                self._conn.execute("DELETE FROM observations")
+                self._conn.execute("DELETE FROM rollups")
+        return removed
+
+    def _city_id(self, city: str) -> int:
+        """Return the interned id for a canonical city name, creating it on first use"""
+        if city not in self._city_ids:
+            self._conn.execute("INSERT OR IGNORE INTO cities (name) VALUES (?)", (city,))
+            row = self._conn.execute("SELECT id FROM cities WHERE name = ?", (city,)).fetchone()
+            self._city_ids[city] = row[0]
+        return self._city_ids[city]
+
+    # Reads
+
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        """Return the last `limit` observations (oldest first), optionally for one city"""
+        if city:
+            sql = f"{_SELECT} WHERE c.name = ? ORDER BY o.timestamp DESC, o.id DESC LIMIT ?"
+            params = (canonical_city(city), limit)
+        else:
+            sql = f"{_SELECT} ORDER BY o.timestamp DESC, o.id DESC LIMIT ?"
+            params = (limit,)
+        return list(reversed(self._query(sql, params)))
+
+    def latest_per_city(self, limit: int = 1) -> Dict[str, List[Dict]]:
+        """Return the last `limit` observations for every city"""
+        sql = (
+            "SELECT * FROM (SELECT ROW_NUMBER() OVER (PARTITION BY o.city_id "
+            f"ORDER BY o.timestamp DESC, o.id DESC) AS rn, {_SELECT_COLUMNS}{_FROM}) "
+            "WHERE rn <= ? ORDER BY name, timestamp"
+        )
+        result: Dict[str, List[Dict]] = {}
+        with self._lock:
+            for row in self._conn.execute(sql, (limit,)):
+                record = self._to_record(row[1:])
+                result.setdefault(record["City"], []).append(record)
+        return result
+
+    def range(self, city: Optional[str] = None,
+              start: Union[str, datetime, None] = None,
+              end: Union[str, datetime, None] = None) -> List[Dict]:
+        """Return observations with start <= timestamp <= end in time order"""
+        where, params = self._filters(city, start, end)
+        return self._query(f"{_SELECT}{where} ORDER BY o.timestamp, o.id", params)
+
+    def as_of(self, city: Optional[str], when: Union[str, datetime],
+              before: int = 0, after: int = 0) -> Dict:
+        """Return what the store knew at `when`: the latest observation at or before it.
+
+        The result holds "observation" (None if nothing was recorded yet),
+        up to `before` earlier rows in "previous" and up to `after` later rows
+        in "next", all oldest first. Each side is a single seek on the
+        (city, timestamp) index, so cost is O(log n) plus the window size.
+        """
+        where, params = self._filters(city, None, when)
+        earlier = self._query(f"{_SELECT}{where} ORDER BY o.timestamp DESC, o.id DESC LIMIT ?",
+                              params + [before + 1])
+        later = []
+        if after > 0:
+            clauses = ["o.timestamp > ?"] + (["c.name = ?"] if city else [])
+            later_params = [format_timestamp(when)] + ([canonical_city(city)] if city else [])
+            later = self._query(f"{_SELECT} WHERE {' AND '.join(clauses)} "
+                                f"ORDER BY o.timestamp, o.id LIMIT ?", later_params + [after])
+        earlier.reverse()
+        return {"observation": earlier[-1] if earlier else None,
+                "previous": earlier[:-1], "next": later}
+
+    def iter_chunks(self, city: Optional[str] = None,
+                    start: Union[str, datetime, None] = None,
+                    end: Union[str, datetime, None] = None,
+                    chunk_size: int = 5000) -> Iterator[List[Dict]]:
+        """Yield range() results in chunks of at most `chunk_size` rows.
+
+        Uses keyset pagination on (timestamp, id), so each chunk is one short
+        indexed query and writers can interleave between chunks.
+        """
+        where, params = self._filters(city, start, end)
+        cursor_clause = " AND " if where else " WHERE "
+        last = None
+        while True:
+            sql = f"SELECT o.id, {_SELECT_COLUMNS}{_FROM}{where}"
+            chunk_params = list(params)
+            if last is not None:
+                sql += f"{cursor_clause}(o.timestamp, o.id) > (?, ?)"
+                chunk_params.extend(last)
+            sql += " ORDER BY o.timestamp, o.id LIMIT ?"
+            chunk_params.append(chunk_size)
+            with self._lock:
+                rows = self._conn.execute(sql, chunk_params).fetchall()
+            if not rows:
+                return
+            last = (rows[-1][1], rows[-1][0])
+            yield [self._to_record(row[1:]) for row in rows]
+
+    @staticmethod
+    def _filters(city: Optional[str], start, end):
+        """Return (WHERE clause, params) for the optional city/time filters"""
+        clauses, params = [], []
+        if city:
+            clauses.append("c.name = ?")
+            params.append(canonical_city(city))
+        if start is not None:
+            clauses.append("o.timestamp >= ?")
+            params.append(format_timestamp(start))
+        if end is not None:
+            clauses.append("o.timestamp <= ?")
+            params.append(format_timestamp(end))
+        return (f" WHERE {' AND '.join(clauses)}" if clauses else ""), params
+
+    def rollups(self, city: str, period: str = "day",
+                start: Union[str, datetime, None] = None,
+                end: Union[str, datetime, None] = None) -> List[Dict]:
+        """Return per-bucket statistics for a city in time order.
+
+        `period` is "hour" or "day"; buckets are included when their start
+        falls in [start, end]. Each bucket carries count, mean, min, max, std,
+        mean humidity/wind speed, mean wind direction and precipitation total.
+        """
+        if period not in ROLLUP_PERIODS:
+            raise ValueError(f"Unknown rollup period: {period}")
+        width = ROLLUP_PERIODS[period]
+        clauses, params = ["c.name = ?", "r.period = ?"], [canonical_city(city), period]
+        if start is not None:
+            clauses.append("r.bucket >= ?")
+            params.append(format_timestamp(start)[:width])
+        if end is not None:
+            clauses.append("r.bucket <= ?")
+            params.append(format_timestamp(end)[:width])
+        sql = ("SELECT r.bucket, r.count, r.temp_sum, r.temp_sumsq, r.temp_min, r.temp_max, "
+               "r.humidity_sum, r.humidity_count, r.wind_sum, r.wind_count, r.wind_u_sum, "
+               "r.wind_v_sum, r.precipitation FROM rollups r JOIN cities c ON c.id = r.city_id "
+               f"WHERE {' AND '.join(clauses)} ORDER BY r.bucket")
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        result = []
+        for (bucket, count, temp_sum, temp_sumsq, temp_min, temp_max, humidity_sum, humidity_count,
+             wind_sum, wind_count, wind_u, wind_v, precipitation) in rows:
+            direction = round(math.degrees(math.atan2(wind_v, wind_u)), 1) % 360 if (wind_u or wind_v) else None
+            result.append({
+                "bucket": bucket,
+                "count": count,
+                "mean": temp_sum / count,
+                "min": temp_min,
+                "max": temp_max,
+                "std": _std(count, temp_sum, temp_sumsq),
+                "humidity": humidity_sum / humidity_count if humidity_count else None,
+                "wind_speed": wind_sum / wind_count if wind_count else None,
+                "wind_direction": direction,
+                "precipitation": precipitation,
+            })
+        return result
+
+    def rollup_summary(self, city: str, start: Union[str, datetime, None] = None,
+                       end: Union[str, datetime, None] = None) -> Optional[Dict]:
+        """Combine daily buckets into overall statistics (None when there is no data)"""
+        clauses, params = ["c.name = ?", "r.period = 'day'"], [canonical_city(city)]
+        if start is not None:
+            clauses.append("r.bucket >= ?")
+            params.append(format_timestamp(start)[:ROLLUP_PERIODS["day"]])
+        if end is not None:
+            clauses.append("r.bucket <= ?")
+            params.append(format_timestamp(end)[:ROLLUP_PERIODS["day"]])
+        sql = ("SELECT MIN(r.bucket), MAX(r.bucket), COUNT(*), SUM(r.count), SUM(r.temp_sum), "
+               "SUM(r.temp_sumsq), MIN(r.temp_min), MAX(r.temp_max), AVG(r.temp_max - r.temp_min), "
+               "SUM(r.precipitation) FROM rollups r JOIN cities c ON c.id = r.city_id "
+               f"WHERE {' AND '.join(clauses)}")
+        with self._lock:
+            (first, last, days, count, temp_sum, temp_sumsq, temp_min, temp_max,
+             daily_range, precipitation) = self._conn.execute(sql, params).fetchone()
+        if not days:
+            return None
+        return {
+            "first": first,
+            "last": last,
+            "days": days,
+            "count": count,
+            "mean": temp_sum / count,
+            "min": temp_min,
+            "max": temp_max,
+            "std": _std(count, temp_sum, temp_sumsq),
+            "mean_daily_range": daily_range,
+            "precipitation": precipitation,
+        }
+
+    def cities(self) -> List[str]:
+        """Return all known city names"""
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT name FROM cities ORDER BY name")]
+
+    def oldest(self) -> Dict[str, str]:
+        """Return each city's earliest stored timestamp"""
+        with self._lock:
+            return dict(self._conn.execute(
+                f"SELECT c.name, MIN(o.timestamp){_FROM} GROUP BY c.name"))
+
+    def count(self, city: Optional[str] = None,
+              start: Union[str, datetime, None] = None,
+              end: Union[str, datetime, None] = None) -> int:
+        """Return the number of stored observations, optionally filtered"""
+        where, params = self._filters(city, start, end)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*){_FROM}{where}", params).fetchone()[0]
+
+    def data_version(self) -> int:
+        """SQLite's data_version: changes when another connection commits to the database"""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _query(self, sql: str, params) -> List[Dict]:
+        with self._lock:
+            return [self._to_record(row) for row in self._conn.execute(sql, params)]
+
+    @staticmethod
+    def _to_record(row) -> Dict:
+        return {header: value for (_, header), value in zip(OBSERVATION_COLUMNS, row)}
+
+    # CSV import/export
+
+    def import_csv(self, csv_path: str, duplicate_filter=None) -> int:
+        """Import a CSV log (legacy padded headers and values allowed).
+
+        With a core.dedup.DuplicateFilter, repeated readings are dropped just
+        as they are for live writes. Returns the number of rows imported.
+        """
+        path = Path(csv_path)
+        if not path.exists():
+            return 0
+
+        by_header = {header: column for column, header in OBSERVATION_COLUMNS}
+        records = []
+        for row in iter_legacy_rows(path):
+            record = {}
+            for header, value in row.items():
+                value = value.strip()
+                if value and value != "None":
+                    record[by_header[header]] = value
+            # Rows without a unit predate the Unit column, when the log was kept in °F
+            record = to_metric(record, default_unit="imperial")
+            if duplicate_filter is None or duplicate_filter.accept(record):
+                records.append(record)
+        return self.add_many(records)
+
+    def export_csv(self, csv_path: str, city: Optional[str] = None,
+                   start: Union[str, datetime, None] = None,
+                   end: Union[str, datetime, None] = None) -> int:
+        """Write observations to CSV (gzipped for a .gz path) and return the row count"""
+        rows = self.range(city, start, end)
+        self._write_csv(csv_path, rows)
+        return len(rows)
+
+    @staticmethod
+    def _write_csv(csv_path: str, rows: List[Dict]) -> None:
+        Path(csv_path).parent.mkdir(parents=True, exist_ok=True)
+        opener = gzip.open if str(csv_path).endswith(".gz") else open
+        with opener(csv_path, "wt", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[header for _, header in OBSERVATION_COLUMNS])
+            writer.writeheader()
+            writer.writerows(rows)
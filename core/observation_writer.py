@@ -0,0 +1,185 @@
+# core/observation_writer.py
+"""Batched, buffered writer with a background flush thread"""
+
+import atexit
+import csv
+import os
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Sequence
+
+
+def csv_append_sink(path: str, header: Optional[Sequence[str]] = None) -> Callable[[List], None]:
+    """Return a sink that appends a batch of rows (lists or dicts) in one file open.
+
+    The header is written when the file is new or empty. Each batch is fsynced
+    so a flushed batch survives a crash.
+    """
+    def sink(rows: List) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        needs_header = header is not None and (not os.path.isfile(path) or os.path.getsize(path) == 0)
+        with open(path, "a", newline="") as f:
+            if rows and isinstance(rows[0], dict):
+                writer = csv.DictWriter(f, fieldnames=list(header or rows[0].keys()))
+                if needs_header:
+                    writer.writeheader()
+            else:
+                writer = csv.writer(f)
+                if needs_header:
+                    writer.writerow(header)
+            writer.writerows(rows)
+            f.flush()
+            os.fsync(f.fileno())
+    return sink
+
+
+class BufferedWriter:
+    """Queues records in memory and hands them to a sink in batches.
+
+    A daemon thread flushes whenever `max_batch` records are waiting or
+    `flush_interval` seconds have passed since the oldest queued record.
+    `flush()` blocks until everything submitted so far is written, and the
+    queue is drained at interpreter exit. A batch the sink raises on is
+    dropped and counted; the next flush() covering it returns False.
+    """
+
+    def __init__(self, sink: Callable[[List], None], name: str = "observation-writer",
+                 max_batch: int = 50, flush_interval: float = 2.0):
+        self.sink = sink
+        self.name = name
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+
+        self._queue = deque()
+        self._cond = threading.Condition()
+        self._submitted = 0     # sequence number of the last submitted record
+        self._written = 0       # sequence number of the last record handed to the sink
+        self._failed_through = 0  # sequence number of the last record in a failed batch
+        self._checked = 0       # records up to here were covered by an earlier flush()
+        self._oldest_at = None  # monotonic time the oldest queued record arrived
+        self._flush_requested = False
+        self._closed = False
+
+        # Metrics
+        self._batches = 0
+        self._errors = 0
+        self._dropped = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+        self._max_depth = 0
+
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, record) -> None:
+        """Queue one record for writing"""
+        with self._cond:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is closed")
+            self._queue.append(record)
+            self._submitted += 1
+            self._max_depth = max(self._max_depth, len(self._queue))
+            if self._oldest_at is None:
+                # Wake the flusher so it starts the flush_interval countdown
+                self._oldest_at = time.monotonic()
+                self._cond.notify_all()
+            elif len(self._queue) >= self.max_batch:
+                self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until every record submitted so far is handed to the sink.
+
+        Returns False on timeout, or when a batch with records submitted since
+        the previous flush() failed to write.
+        """
+        with self._cond:
+            target = self._submitted
+            since, self._checked = self._checked, max(self._checked, target)
+            if self._written < target:
+                self._flush_requested = True
+                self._cond.notify_all()
+                if not self._cond.wait_for(lambda: self._written >= target, timeout):
+                    return False
+            return self._failed_through <= since
+
+    def close(self, timeout: Optional[float] = 10.0) -> None:
+        """Drain the queue and stop the background thread"""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    @property
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def stats(self) -> Dict:
+        """Return queue depth and flush latency metrics"""
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue),
+                "max_queue_depth": self._max_depth,
+                "records_written": self._written - self._dropped,
+                "records_dropped": self._dropped,
+                "batches": self._batches,
+                "errors": self._errors,
+                "last_flush_ms": self._last_flush_ms,
+                "max_flush_ms": self._max_flush_ms,
+                "avg_flush_ms": self._total_flush_ms / self._batches if self._batches else 0.0,
+            }
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._batch_ready():
+                    self._cond.wait(self._time_until_due())
+                if not self._queue:
+                    self._flush_requested = False
+                    if self._closed:
+                        return
+                    continue
+                batch = list(self._queue)
+                self._queue.clear()
+                self._oldest_at = None
+                self._flush_requested = False
+
+            self._write(batch)
+
+            with self._cond:
+                self._written += len(batch)
+                self._cond.notify_all()
+
+    def _batch_ready(self) -> bool:
+        if self._closed or self._flush_requested or len(self._queue) >= self.max_batch:
+            return True
+        return self._oldest_at is not None and time.monotonic() - self._oldest_at >= self.flush_interval
+
+    def _time_until_due(self) -> Optional[float]:
+        if self._oldest_at is None:
+            return None
+        return max(0.0, self.flush_interval - (time.monotonic() - self._oldest_at))
+
+    def _write(self, batch: List) -> None:
+        started = time.perf_counter()
+        try:
+            self.sink(batch)
+        except Exception as e:
+            print(f"Error writing batch of {len(batch)} records in {self.name}: {e}")
+            with self._cond:
+                self._errors += 1
+                self._dropped += len(batch)
+                self._failed_through = self._written + len(batch)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._cond:
+            self._batches += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
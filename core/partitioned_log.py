@@ -0,0 +1,272 @@
+# core/partitioned_log.py
+"""Time-partitioned CSV logs with compressed cold partitions"""
+
+import csv
+import gzip
+import json
+import lzma
+import os
+import shutil
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Union
+
+from .csv_tail import CsvTailReader
+from .ingest import TIMESTAMP_FORMAT, canonical_city
+
+# Compression name -> (file suffix, opener)
+COMPRESSORS = {
+    "gzip": (".gz", gzip.open),
+    "lzma": (".xz", lzma.open),
+}
+
+DEFAULT_MAX_BYTES = 4 * 1024 * 1024
+
+
+def _parse_time(value) -> Optional[datetime]:
+    """Parse a log timestamp; None for blank or malformed values"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value).strip(), TIMESTAMP_FORMAT)
+    except (TypeError, ValueError):
+        return None
+
+
+class PartitionedLog:
+    """An append-only CSV log split into monthly partitions.
+
+    New rows go to the hot file at `path`, which keeps the existing file name
+    so tail readers and external tools still find recent data there. Rows from
+    earlier months (or everything, once the hot file passes `max_bytes`) are
+    moved into `<stem>.partitions/<stem>-YYYY-MM[.N].csv.gz` and compressed. A
+    manifest records each partition's time range and row count, so range reads
+    only open partitions that overlap the query. With `retention_days` set,
+    partitions older than the cutoff are moved to `archive_dir` or deleted.
+    """
+
+    def __init__(self, path, header: Sequence[str], timestamp_field: str = "DateTime",
+                 max_bytes: int = DEFAULT_MAX_BYTES, compression: str = "gzip",
+                 retention_days: Optional[int] = None, archive_dir: Optional[str] = None):
+        if compression not in COMPRESSORS:
+            raise ValueError(f"Unknown compression: {compression}")
+        self.path = Path(path)
+        self.header = list(header)
+        self.timestamp_field = timestamp_field
+        self.max_bytes = max_bytes
+        self.compression = compression
+        self.retention_days = retention_days
+        self.archive_dir = Path(archive_dir) if archive_dir else None
+
+        self.partition_dir = self.path.with_name(f"{self.path.stem}.partitions")
+        self.manifest_path = self.partition_dir / "manifest.json"
+        self.manifest = self._load_manifest()
+        self._hot_month = None  # month of the oldest hot row, cached between writes
+
+    # Writes
+
+    def write(self, rows: List) -> None:
+        """Append rows (lists in header order or dicts) and rotate if due.
+
+        Usable directly as a BufferedWriter sink.
+        """
+        if not rows:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        new_file = not self.path.exists() or self.path.stat().st_size == 0
+        with open(self.path, "a", newline="") as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(self.header)
+            for row in rows:
+                writer.writerow([row.get(name, "") for name in self.header] if isinstance(row, dict) else row)
+            f.flush()
+            os.fsync(f.fileno())
+        self.maybe_rotate()
+
+    def maybe_rotate(self, now: Optional[datetime] = None) -> bool:
+        """Rotate when the hot file is too large or holds rows from an earlier month"""
+        if not self.path.exists():
+            return False
+        now = now or datetime.now()
+        if self._hot_month is None:
+            self._hot_month = self._oldest_hot_month()
+        stale = self._hot_month is not None and self._hot_month < now.strftime("%Y-%m")
+        if stale or self.path.stat().st_size > self.max_bytes:
+            self.rotate(now)
+            return True
+        return False
+
+    def rotate(self, now: Optional[datetime] = None) -> int:
+        """Move cold rows out of the hot file; returns the number of rows moved"""
+        now = now or datetime.now()
+        current_month = now.strftime("%Y-%m")
+        oversized = self.path.exists() and self.path.stat().st_size > self.max_bytes
+
+        keep, by_month = [], {}
+        for row in self._read_rows(self.path):
+            when = _parse_time(self._field(row, self.timestamp_field))
+            month = when.strftime("%Y-%m") if when else None
+            if month is None or (month >= current_month and not oversized):
+                keep.append(row)
+            else:
+                by_month.setdefault(month, []).append((when, row))
+
+        for month, dated_rows in sorted(by_month.items()):
+            self._write_partition(month, dated_rows)
+
+        moved = sum(len(rows) for rows in by_month.values())
+        if moved:
+            temp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(temp_path, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(self.header)
+                writer.writerows(keep)
+            os.replace(temp_path, self.path)
+            self._save_manifest()
+        self._hot_month = None
+        self.apply_retention(now)
+        return moved
+
+    def apply_retention(self, now: Optional[datetime] = None) -> List[str]:
+        """Archive or delete partitions that ended before the retention cutoff"""
+        if self.retention_days is None:
+            return []
+        cutoff = ((now or datetime.now()) - timedelta(days=self.retention_days)).strftime(TIMESTAMP_FORMAT)
+        expired = [part for part in self.manifest["partitions"] if part["end"] < cutoff]
+        for part in expired:
+            source = self.partition_dir / part["file"]
+            if self.archive_dir is not None:
+                self.archive_dir.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(source), str(self.archive_dir / part["file"]))
+            elif source.exists():
+                source.unlink()
+            self.manifest["partitions"].remove(part)
+        if expired:
+            self._save_manifest()
+        return [part["file"] for part in expired]
+
+    def clear(self) -> None:
+        """Delete every partition and reset the hot file to just its header"""
+        if self.partition_dir.exists():
+            shutil.rmtree(self.partition_dir)
+        self.manifest = {"partitions": []}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, "w", newline="") as f:
+            csv.writer(f).writerow(self.header)
+        self._hot_month = None
+
+    # Reads
+
+    def read_range(self, start: Union[str, datetime, None] = None,
+                   end: Union[str, datetime, None] = None,
+                   city: Optional[str] = None, city_field: str = "City") -> Iterator[Dict]:
+        """Yield rows as dicts with start <= timestamp <= end, oldest first.
+
+        Only partitions whose manifest range overlaps the query are opened.
+        """
+        lo = _parse_time(start) if start is not None else None
+        hi = _parse_time(end) if end is not None else None
+        lo_key = lo.strftime(TIMESTAMP_FORMAT) if lo else None
+        hi_key = hi.strftime(TIMESTAMP_FORMAT) if hi else None
+        wanted = canonical_city(city) if city else None
+
+        sources = [self.partition_dir / part["file"] for part in self.manifest["partitions"]
+                   if (lo_key is None or part["end"] >= lo_key) and (hi_key is None or part["start"] <= hi_key)]
+        sources.append(self.path)
+
+        for source in sources:
+            for row in self._read_rows(source):
+                record = dict(zip(self.header, row))
+                if wanted and canonical_city(record.get(city_field) or "") != wanted:
+                    continue
+                when = _parse_time(record.get(self.timestamp_field))
+                if (lo or hi) and when is None:
+                    continue
+                if (lo and when < lo) or (hi and when > hi):
+                    continue
+                yield record
+
+    def tail_dicts(self, limit: int, city: Optional[str] = None, city_field: str = "City") -> List[Dict]:
+        """Return the last `limit` rows (oldest first), reaching into partitions if needed"""
+        rows = CsvTailReader(self.path).tail_dicts(limit, city=city, city_field=city_field) \
+            if self.path.exists() else []
+        wanted = canonical_city(city) if city else None
+        for part in reversed(self.manifest["partitions"]):
+            if len(rows) >= limit:
+                break
+            older = [dict(zip(self.header, row)) for row in self._read_rows(self.partition_dir / part["file"])]
+            if wanted:
+                older = [row for row in older if canonical_city(row.get(city_field) or "") == wanted]
+            rows = older[-(limit - len(rows)):] + rows
+        return rows
+
+    def partitions(self) -> List[Dict]:
+        """Return the manifest entries (file, start, end, rows, bytes)"""
+        return list(self.manifest["partitions"])
+
+    # Helpers
+
+    def _write_partition(self, month: str, dated_rows: List) -> None:
+        suffix, opener = COMPRESSORS[self.compression]
+        self.partition_dir.mkdir(parents=True, exist_ok=True)
+        # A month that already has a partition (size rollover) gets a sequence number
+        sequence = sum(1 for part in self.manifest["partitions"] if part["month"] == month)
+        name = f"{self.path.stem}-{month}{'.%d' % sequence if sequence else ''}.csv{suffix}"
+        target = self.partition_dir / name
+        with opener(target, "wt", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.header)
+            writer.writerows(row for _, row in dated_rows)
+
+        times = [when for when, _ in dated_rows]
+        self.manifest["partitions"].append({
+            "file": name,
+            "month": month,
+            "start": min(times).strftime(TIMESTAMP_FORMAT),
+            "end": max(times).strftime(TIMESTAMP_FORMAT),
+            "rows": len(dated_rows),
+            "bytes": target.stat().st_size,
+        })
+        self.manifest["partitions"].sort(key=lambda part: (part["start"], part["file"]))
+
+    def _read_rows(self, source: Path) -> Iterator[List[str]]:
+        """Yield data rows of a hot or compressed partition file"""
+        if not source.exists():
+            return
+        opener = open
+        for suffix, compressed_open in COMPRESSORS.values():
+            if source.name.endswith(suffix):
+                opener = compressed_open
+        with opener(source, "rt", newline="") as f:
+            reader = csv.reader(f)
+            next(reader, None)  # header
+            for row in reader:
+                if any(value.strip() for value in row):
+                    yield row
+
+    def _field(self, row: List[str], name: str) -> Optional[str]:
+        index = self.header.index(name)
+        return row[index] if index < len(row) else None
+
+    def _oldest_hot_month(self) -> Optional[str]:
+        """Month of the first dated row in the hot file (rows are in time order)"""
+        for row in self._read_rows(self.path):
+            when = _parse_time(self._field(row, self.timestamp_field))
+            if when:
+                return when.strftime("%Y-%m")
+        return None
+
+    def _load_manifest(self) -> Dict:
+        try:
+            with open(self.manifest_path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {"partitions": []}
+
+    def _save_manifest(self) -> None:
+        self.partition_dir.mkdir(parents=True, exist_ok=True)
+        temp_path = self.manifest_path.with_suffix(".tmp")
+        with open(temp_path, "w") as f:
+            json.dump(self.manifest, f, indent=2)
+        os.replace(temp_path, self.manifest_path)
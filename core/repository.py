@@ -0,0 +1,655 @@
+# core/repository.py
+"""Unified observation repository with pluggable backends and a shared read cache"""
+
+import csv
+import heapq
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import asdict, is_dataclass
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+
+import numpy as np
+
+from .columnar_store import ColumnarHistoryStore, to_epoch
+from .condition_index import NUMERIC_COLUMNS, ConditionIndex
+from .dedup import DuplicateFilter
+from .export import DEFAULT_CHUNK_SIZE, chunked
+from .ingest import (CANONICAL_HEADER, canonical_city, is_normalized, iter_legacy_rows, load_registry,
+                     metric_row, normalize_log_file, save_registry, to_metric, validate_observation)
+from .observation_store import OBSERVATION_COLUMNS, ObservationStore, format_timestamp
+from .observation_writer import BufferedWriter
+from .partitioned_log import PartitionedLog
+from .series_archive import SeriesArchive
+
+Timestamp = Union[str, datetime, None]
+
+# Field name -> CSV header, e.g. "wind_speed" -> "WindSpeed"
+_HEADERS = dict(OBSERVATION_COLUMNS)
+
+
+def to_record(observation, timestamp: Timestamp = None) -> Dict:
+    """Return a metric write record (store field names) for a WeatherData or dict"""
+    record = asdict(observation) if is_dataclass(observation) else dict(observation)
+    record.setdefault("timestamp", timestamp or datetime.now())
+    return to_metric(record)
+
+
+class ObservationBackend(ABC):
+    """Storage engine behind ObservationRepository.
+
+    Writes take records keyed by store field names ("city", "temperature").
+    Reads return rows keyed by the CSV headers ("City", "Temperature"),
+    oldest first.
+    """
+
+    @abstractmethod
+    def write_many(self, records: List[Dict]) -> int:
+        """Persist records and return how many were stored"""
+
+    @abstractmethod
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        """Return the last `limit` rows, optionally for one city"""
+
+    @abstractmethod
+    def range(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> List[Dict]:
+        """Return rows with start <= timestamp <= end"""
+
+    def latest_per_city(self, limit: int = 1) -> Dict[str, List[Dict]]:
+        """Return the last `limit` rows for every city"""
+        result: Dict[str, List[Dict]] = {}
+        for row in self.range():
+            result.setdefault(row["City"], []).append(row)
+        return {city: rows[-limit:] for city, rows in result.items()}
+
+    def as_of(self, city: Optional[str], when: Timestamp, before: int = 0, after: int = 0) -> Dict:
+        """Return the latest row at or before `when` with its neighbours (see ObservationStore.as_of)"""
+        cutoff = format_timestamp(when)
+        earlier = self.range(city, None, when)[-(before + 1):]
+        later = [row for row in self.range(city, when, None) if row["DateTime"] > cutoff][:after] \
+            if after > 0 else []
+        return {"observation": earlier[-1] if earlier else None,
+                "previous": earlier[:-1], "next": later}
+
+    def rollups(self, city: str, period: str = "day", start: Timestamp = None,
+                end: Timestamp = None) -> List[Dict]:
+        """Return pre-aggregated buckets; backends without rollups return []"""
+        return []
+
+    def rollup_summary(self, city: str, start: Timestamp = None, end: Timestamp = None) -> Optional[Dict]:
+        """Return statistics combined from daily rollups; backends without rollups return None"""
+        return None
+
+    def cities(self) -> List[str]:
+        """Return every city with stored history"""
+        return sorted(self.latest_per_city())
+
+    def iter_chunks(self, city: Optional[str] = None, start: Timestamp = None, end: Timestamp = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+        """Yield range() results in chunks; backends override this to stream"""
+        return chunked(self.range(city, start, end), chunk_size)
+
+    def count(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> Optional[int]:
+        """Return the number of matching rows, or None when it is not cheap to know"""
+        return None
+
+    def version(self) -> object:
+        """Return a token that changes when the data is modified outside this process"""
+        return None
+
+    def prune(self, before: Timestamp) -> int:
+        """Drop raw rows older than `before` and return how many; backends without retention keep them"""
+        return 0
+
+    def clear(self, archive_path: Optional[str] = None) -> int:
+        """Delete the whole history (exported to `archive_path` first) and return the row count"""
+        raise NotImplementedError(f"{type(self).__name__} cannot clear its history")
+
+    def close(self) -> None:
+        pass
+
+
+class SQLiteBackend(ObservationBackend):
+    """Backend over core.observation_store.ObservationStore.
+
+    With a core.series_archive.SeriesArchive, reads also cover rows pruned
+    into it: archived rows older than a city's oldest stored row come first.
+    """
+
+    def __init__(self, store: ObservationStore, archive: Optional[SeriesArchive] = None):
+        self.store = store
+        self.archive = archive
+
+    def write_many(self, records: List[Dict]) -> int:
+        return self.store.add_many(records)
+
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        rows = self.store.latest(city, limit=limit)
+        if len(rows) < limit:
+            rows = (self._archived(city) + rows)[-limit:]
+        return rows
+
+    def range(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> List[Dict]:
+        rows = self.store.range(city, start, end)
+        archived = self._archived(city, start, end)
+        if not archived:
+            return rows
+        return list(heapq.merge(archived, rows, key=lambda row: row["DateTime"]))
+
+    def latest_per_city(self, limit: int = 1) -> Dict[str, List[Dict]]:
+        result = self.store.latest_per_city(limit)
+        if self.archive is not None:
+            for city in self.archive.cities():
+                if len(result.get(city, [])) < limit:
+                    result[city] = (self._archived(city) + result.get(city, []))[-limit:]
+        return result
+
+    def as_of(self, city: Optional[str], when: Timestamp, before: int = 0, after: int = 0) -> Dict:
+        window = self.store.as_of(city, when, before, after)
+        if window["observation"] is None or len(window["previous"]) < before:
+            if self._archived(city, None, when):
+                return super().as_of(city, when, before, after)
+        return window
+
+    def rollups(self, city: str, period: str = "day", start: Timestamp = None,
+                end: Timestamp = None) -> List[Dict]:
+        return self.store.rollups(city, period, start, end)
+
+    def rollup_summary(self, city: str, start: Timestamp = None, end: Timestamp = None) -> Optional[Dict]:
+        return self.store.rollup_summary(city, start, end)
+
+    def cities(self) -> List[str]:
+        archived = self.archive.cities() if self.archive is not None else []
+        # store.cities() also lists interned names whose rows were all pruned or cleared
+        return sorted(set(self.store.oldest()) | set(archived))
+
+    def iter_chunks(self, city: Optional[str] = None, start: Timestamp = None, end: Timestamp = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+        chunks = self.store.iter_chunks(city, start, end, chunk_size)
+        archived = self._archived(city, start, end)
+        if not archived:
+            return chunks
+        rows = (row for chunk in chunks for row in chunk)
+        return chunked(heapq.merge(archived, rows, key=lambda row: row["DateTime"]), chunk_size)
+
+    def count(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> Optional[int]:
+        total = self.store.count(city, start, end)
+        if self.archive is not None:
+            oldest = self.store.oldest()
+            for name in ([canonical_city(city)] if city else self.archive.cities()):
+                timestamps = self.archive.scan(name, start, end, columns=["temperature"])["timestamp"]
+                cutoff = oldest.get(name)
+                total += int((timestamps < to_epoch(cutoff)).sum()) if cutoff else len(timestamps)
+        return total
+
+    def version(self) -> object:
+        return self.store.data_version()
+
+    def prune(self, before: Timestamp) -> int:
+        """Move expired rows into the series archive, if any (rollups keep their statistics)"""
+        return self.store.prune(before, archive=self.archive.append if self.archive is not None else None)
+
+    def clear(self, archive_path: Optional[str] = None) -> int:
+        """Export stored and archived rows to `archive_path`, then empty the store and the archive"""
+        rows = self.range()
+        if archive_path:
+            ObservationStore._write_csv(archive_path, rows)
+        self.store.clear()
+        if self.archive is not None:
+            self.archive.clear()
+        return len(rows)
+
+    def close(self) -> None:
+        self.store.close()
+
+    def _archived(self, city: Optional[str] = None, start: Timestamp = None,
+                  end: Timestamp = None) -> List[Dict]:
+        """Archived rows in the period that predate each city's oldest stored row"""
+        if self.archive is None:
+            return []
+        oldest = self.store.oldest()
+        rows = []
+        for name in ([canonical_city(city)] if city else self.archive.cities()):
+            cutoff = oldest.get(name)
+            rows.extend(row for row in self.archive.rows(name, start, end)
+                        if cutoff is None or row["DateTime"] < cutoff)
+        if not city:
+            rows.sort(key=lambda row: row["DateTime"])
+        return rows
+
+
+class CsvBackend(ObservationBackend):
+    """Backend over the canonical, month-partitioned CSV log.
+
+    A log that has not been migrated yet (python -m core.migrate) is read in
+    place: rows are cleaned (and converted to metric) as they are read, new
+    rows are appended in canonical column order, and the file is never
+    rotated or rewritten.
+    """
+
+    def __init__(self, log_file: str = "data/weather_log.csv", **log_options):
+        self.log_file = log_file
+        self.legacy = os.path.exists(log_file) and not is_normalized(log_file)
+        if not self.legacy:
+            normalize_log_file(log_file)  # creates a missing log with the canonical header
+        self.city_registry = load_registry(log_file)
+        self.log = PartitionedLog(log_file, CANONICAL_HEADER, **log_options)
+
+    def write_many(self, records: List[Dict]) -> int:
+        known_cities = len(self.city_registry)
+        rows = []
+        for record in records:
+            row = {header: record.get(field) for field, header in _HEADERS.items()
+                   if header in CANONICAL_HEADER}
+            row["DateTime"] = format_timestamp(record.get("timestamp"))
+            try:
+                rows.append(validate_observation(row, self.city_registry))
+            except ValueError as e:
+                print(f"Skipping invalid observation: {e}")
+        if self.legacy:
+            # Surplus values past the legacy header follow the canonical order (see iter_legacy_rows)
+            with open(self.log_file, "a", newline="") as f:
+                csv.writer(f).writerows([row[name] for name in CANONICAL_HEADER] for row in rows)
+            return len(rows)
+        self.log.write(rows)
+        if len(self.city_registry) != known_cities:
+            save_registry(self.log_file, self.city_registry)
+        return len(rows)
+
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        if self.legacy:
+            return list(deque(self._legacy_rows(city), maxlen=limit)) if limit > 0 else []
+        # Only the trailing rows are parsed; older partitions are opened only if needed
+        return self.log.tail_dicts(limit, city=city)
+
+    def range(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> List[Dict]:
+        if self.legacy:
+            return list(self._legacy_rows(city, start, end))
+        return list(self.log.read_range(start, end, city=city))
+
+    def iter_chunks(self, city: Optional[str] = None, start: Timestamp = None, end: Timestamp = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+        if self.legacy:
+            return chunked(self._legacy_rows(city, start, end), chunk_size)
+        return chunked(self.log.read_range(start, end, city=city), chunk_size)
+
+    def version(self) -> object:
+        """Hot file mtime/size plus the partition list, so external edits are noticed"""
+        try:
+            stat = self.log.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, len(self.log.partitions())
+
+    def _legacy_rows(self, city: Optional[str] = None, start: Timestamp = None,
+                     end: Timestamp = None) -> Iterator[Dict]:
+        """Canonical rows of an unmigrated log; rows that fail validation are skipped"""
+        wanted = canonical_city(city) if city else None
+        lo = format_timestamp(start) if start is not None else None
+        hi = format_timestamp(end) if end is not None else None
+        for record in iter_legacy_rows(self.log_file):
+            try:
+                row = metric_row(validate_observation(record))
+            except ValueError:
+                continue
+            if wanted and row["City"] != wanted:
+                continue
+            if (lo and row["DateTime"] < lo) or (hi and row["DateTime"] > hi):
+                continue
+            yield row
+
+
+class ColumnarBackend(ObservationBackend):
+    """Backend over core.columnar_store.ColumnarHistoryStore (numeric columns only)"""
+
+    # Columnar column -> CSV header of the rows returned
+    _COLUMN_HEADERS = {"temperature": "Temperature", "humidity": "Humidity",
+                       "wind_speed": "WindSpeed", "pressure": "Pressure"}
+
+    def __init__(self, store: ColumnarHistoryStore):
+        self.store = store
+
+    def write_many(self, records: List[Dict]) -> int:
+        return self.store.append_many(records)
+
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        if city:
+            return self._rows(city, self.store.latest(city, limit))
+        rows = [row for name in self.store.cities() for row in self.latest(name, limit)]
+        rows.sort(key=lambda row: row["DateTime"])
+        return rows[-limit:]
+
+    def range(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> List[Dict]:
+        if city:
+            return self._rows(city, self.store.read(city, start, end))
+        rows = [row for name in self.store.cities() for row in self.range(name, start, end)]
+        rows.sort(key=lambda row: row["DateTime"])
+        return rows
+
+    def latest_per_city(self, limit: int = 1) -> Dict[str, List[Dict]]:
+        return {city: self.latest(city, limit) for city in self.store.cities()}
+
+    def _rows(self, city: str, columns: Dict[str, np.ndarray]) -> List[Dict]:
+        city = canonical_city(city)
+        rows = []
+        for index, timestamp in enumerate(columns["timestamp"].tolist()):
+            row = {"DateTime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+                   "City": city}
+            for column, header in self._COLUMN_HEADERS.items():
+                value = float(columns[column][index])
+                row[header] = None if np.isnan(value) else round(value, 2)
+            rows.append(row)
+        return rows
+
+
+class ConditionIndexBackend(ObservationBackend):
+    """Backend over core.condition_index.ConditionIndex (numeric columns plus condition class)"""
+
+    def __init__(self, index: ConditionIndex):
+        self.index = index
+
+    def write_many(self, records: List[Dict]) -> int:
+        return self.index.add_many(records)
+
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        return self._rows(self.index.select(city=city)[-limit:]) if limit > 0 else []
+
+    def range(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> List[Dict]:
+        return self._rows(self.index.select(city=city, start=start, end=end))
+
+    def count(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> Optional[int]:
+        return len(self.index.select(city=city, start=start, end=end))
+
+    def _rows(self, positions: np.ndarray) -> List[Dict]:
+        columns = self.index.rows(positions)
+        cities = self.index.labels("city", positions)
+        conditions = self.index.labels("condition", positions)
+        rows = []
+        for index, timestamp in enumerate(columns["timestamp"].tolist()):
+            row = {"DateTime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"),
+                   "City": cities[index], "Condition": conditions[index]}
+            for column in NUMERIC_COLUMNS:
+                value = float(columns[column][index])
+                row[_HEADERS[column]] = None if np.isnan(value) else value
+            rows.append(row)
+        return rows
+
+
+class ObservationRepository:
+    """The one read/write entry point for weather observations.
+
+    Writes are queued on a BufferedWriter and handed to the primary backend in
+    batches, then mirrored to any secondary backends (e.g. the columnar
+    analytics store). Repeated readings (same city and provider observation
+    time, or same content within the refresh window) are dropped before they
+    are queued. Reads never wait for the writer: they go through a single LRU
+    cache of backend results, invalidated whenever a batch lands, and queued
+    observations are merged in. Rollups cover written batches only.
+    """
+
+    def __init__(self, backend: ObservationBackend, mirrors: Iterable[ObservationBackend] = (),
+                 cache_size: int = 128, name: str = "weather-log-writer",
+                 duplicate_filter: Optional[DuplicateFilter] = None):
+        self.backend = backend
+        self.mirrors = list(mirrors)
+        self.duplicate_filter = duplicate_filter or DuplicateFilter()
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, object]" = OrderedDict()
+        # Guards the cache and the queued rows; held while a batch is written, so
+        # every read sees a row either in the backend or in _pending, never both
+        self._cache_lock = threading.Lock()
+        self._pending: List[Optional[Dict]] = []  # read-shaped rows in writer queue order
+        self._listeners: List = []
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.writer = BufferedWriter(self._write_batch, name=name)
+
+    # Writes
+
+    def write(self, observation, timestamp: Timestamp = None) -> bool:
+        """Queue one observation (WeatherData or field dict); False if it was a repeat"""
+        record = to_record(observation, timestamp)
+        if not self.duplicate_filter.accept(record):
+            return False
+        with self._cache_lock:
+            self.writer.submit(record)
+            self._pending.append(_pending_row(record))
+        return True
+
+    def write_many(self, observations: Iterable, timestamp: Timestamp = None) -> int:
+        """Queue several observations and return how many were not repeats"""
+        return sum(self.write(observation, timestamp) for observation in observations)
+
+    def add_listener(self, callback) -> None:
+        """Call callback(batch) after each batch lands in the primary backend.
+
+        callback(None) means the history changed wholesale (see invalidate).
+        Callbacks run on the writer thread and must not block on reads.
+        """
+        self._listeners.append(callback)
+
+    def _notify(self, batch: Optional[List[Dict]]) -> None:
+        for callback in self._listeners:
+            try:
+                callback(batch)
+            except Exception as e:
+                print(f"Observation listener failed: {e}")
+
+    def _write_batch(self, batch: List[Dict]) -> None:
+        """Writer sink: primary backend, cache invalidation, listeners, then mirrors"""
+        with self._cache_lock:
+            try:
+                self.backend.write_many(batch)
+            finally:
+                # A failed batch is dropped by the writer, so its rows stop showing too
+                del self._pending[:len(batch)]
+                self._cache.clear()
+        self._notify(batch)
+        for mirror in self.mirrors:
+            try:
+                mirror.write_many(batch)
+            except Exception as e:
+                # The primary backend already has the rows; one failing mirror must not stop the others
+                print(f"Skipping {type(mirror).__name__} update: {e}")
+
+    # Reads
+
+    def latest(self, city: Optional[str] = None, limit: int = 7) -> List[Dict]:
+        """Return the last `limit` rows (oldest first), optionally for one city"""
+        if limit <= 0:
+            return []
+        city = canonical_city(city) if city else None
+        rows, queued = self._read(("latest", city, limit), lambda: self.backend.latest(city, limit), city)
+        return _merged(rows, queued)[-limit:] if queued else rows
+
+    def range(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> List[Dict]:
+        """Return rows with start <= timestamp <= end in time order"""
+        city = canonical_city(city) if city else None
+        start = format_timestamp(start) if start is not None else None
+        end = format_timestamp(end) if end is not None else None
+        rows, queued = self._read(("range", city, start, end),
+                                  lambda: self.backend.range(city, start, end), city, start, end)
+        return _merged(rows, queued) if queued else rows
+
+    def latest_per_city(self, limit: int = 1) -> Dict[str, List[Dict]]:
+        """Return the last `limit` rows for every city"""
+        result, queued = self._read(("per_city", limit), lambda: self.backend.latest_per_city(limit))
+        if not queued:
+            return result
+        result = dict(result)
+        for city in {row["City"] for row in queued}:
+            rows = _merged(result.get(city, []), [row for row in queued if row["City"] == city])
+            result[city] = rows[-limit:] if limit > 0 else []
+        return result
+
+    def as_of(self, city: Optional[str], when: Timestamp, before: int = 0, after: int = 0) -> Dict:
+        """Return {"observation", "previous", "next"} as the history stood at `when`"""
+        city = canonical_city(city) if city else None
+        when = format_timestamp(when)
+        window, queued = self._read(("as_of", city, when, before, after),
+                                    lambda: self.backend.as_of(city, when, before, after), city)
+        if not queued:
+            return window
+        stored = window["previous"] + ([window["observation"]] if window["observation"] else [])
+        earlier = _merged(stored, [row for row in queued if row["DateTime"] <= when])[-(before + 1):]
+        later = _merged(window["next"], [row for row in queued if row["DateTime"] > when])[:after] \
+            if after > 0 else []
+        return {"observation": earlier[-1] if earlier else None,
+                "previous": earlier[:-1], "next": later}
+
+    def cities(self) -> List[str]:
+        """Return every city with stored or queued history"""
+        cities, queued = self._read(("cities",), self.backend.cities)
+        return sorted(set(cities) | {row["City"] for row in queued}) if queued else cities
+
+    def rollups(self, city: str, period: str = "day", start: Timestamp = None,
+                end: Timestamp = None) -> List[Dict]:
+        """Return hourly/daily buckets of written batches when the backend maintains them"""
+        start = format_timestamp(start) if start is not None else None
+        end = format_timestamp(end) if end is not None else None
+        buckets, _ = self._read(("rollups", canonical_city(city), period, start, end),
+                                lambda: self.backend.rollups(city, period, start, end))
+        return buckets
+
+    def rollup_summary(self, city: str, start: Timestamp = None, end: Timestamp = None) -> Optional[Dict]:
+        """Return statistics combined from the daily rollups of written batches (None without any)"""
+        start = format_timestamp(start) if start is not None else None
+        end = format_timestamp(end) if end is not None else None
+        summary, _ = self._read(("rollup_summary", canonical_city(city), start, end),
+                                lambda: self.backend.rollup_summary(city, start, end))
+        return summary
+
+    def iter_chunks(self, city: Optional[str] = None, start: Timestamp = None, end: Timestamp = None,
+                    chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict]]:
+        """Stream matching rows in chunks, bypassing the cache (for exports).
+
+        Queued writes are flushed when iteration starts, on the consuming thread.
+        """
+        self.writer.flush()
+        yield from self.backend.iter_chunks(city, start, end, chunk_size)
+
+    def count(self, city: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> Optional[int]:
+        """Return the number of matching rows if the backend can count cheaply"""
+        city = canonical_city(city) if city else None
+        start = format_timestamp(start) if start is not None else None
+        end = format_timestamp(end) if end is not None else None
+        with self._cache_lock:
+            total = self.backend.count(city, start, end)
+            if total is None:
+                return None
+            return total + len(_matching(self._pending, city, start, end))
+
+    # Maintenance
+
+    def prune(self, before: Timestamp) -> int:
+        """Archive raw rows older than `before` (see the backend's prune); returns how many moved"""
+        self.writer.flush()
+        pruned = self.backend.prune(before)
+        if pruned:
+            self.invalidate()
+        return pruned
+
+    def clear(self, archive_path: Optional[str] = None) -> int:
+        """Delete the whole history, exporting it to `archive_path` first; returns the row count"""
+        self.writer.flush()
+        removed = self.backend.clear(archive_path)
+        self.duplicate_filter.clear()
+        self.invalidate()
+        return removed
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        return self.writer.flush(timeout)
+
+    def close(self) -> None:
+        """Drain queued writes and close every backend"""
+        self.writer.close()
+        for backend in [self.backend] + self.mirrors:
+            backend.close()
+
+    # Cache
+
+    def source_version(self) -> object:
+        """Token from the primary backend that changes on outside modification"""
+        return self.backend.version()
+
+    def invalidate(self) -> None:
+        """Drop cached reads and tell listeners after the history was changed directly"""
+        self._clear_cache()
+        self._notify(None)
+
+    def _clear_cache(self) -> None:
+        with self._cache_lock:
+            self._cache.clear()
+
+    def cache_stats(self) -> Dict:
+        total = self.cache_hits + self.cache_misses
+        return {"entries": len(self._cache), "hits": self.cache_hits, "misses": self.cache_misses,
+                "hit_rate": self.cache_hits / total if total else 0.0}
+
+    def _read(self, key: tuple, load, city: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None):
+        """Return (backend result, queued rows matching the filters) as of one moment.
+
+        Backend results are cached and shared, so treat them as read-only. A
+        miss loads while holding the lock, which only waits out a batch that
+        is being written, never the writer's flush interval.
+        """
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                value = self._cache[key]
+            else:
+                self.cache_misses += 1
+                value = self._cache[key] = load()
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            return value, _matching(self._pending, city, start, end)
+
+
+def _pending_row(record: Dict) -> Optional[Dict]:
+    """Read-shaped row for a queued record, or None when the store will skip it"""
+    city = str(record.get("city") or "").strip()
+    if not city or record.get("temperature") in (None, ""):
+        return None
+    row = {header: record.get(field) for field, header in _HEADERS.items()}
+    row["DateTime"] = format_timestamp(record.get("timestamp"))
+    row["City"] = canonical_city(city)
+    return row
+
+
+def _matching(pending: List[Optional[Dict]], city: Optional[str] = None, start: Optional[str] = None,
+              end: Optional[str] = None) -> List[Dict]:
+    return [row for row in pending if row is not None and (not city or row["City"] == city)
+            and (start is None or row["DateTime"] >= start) and (end is None or row["DateTime"] <= end)]
+
+
+def _merged(rows: List[Dict], queued: List[Dict]) -> List[Dict]:
+    """Stored rows plus queued ones in time order (a new list; cached rows stay untouched)"""
+    return sorted(rows + queued, key=lambda row: row["DateTime"])
+
+
+def open_repository(kind: str = "sqlite", path: Optional[str] = None,
+                    mirrors: Iterable[ObservationBackend] = (), **options) -> ObservationRepository:
+    """Build a repository for 'sqlite', 'csv' or 'columnar' storage at `path`"""
+    if kind == "sqlite":
+        backend = SQLiteBackend(ObservationStore(path or "data/weather_observations.db"))
+    elif kind == "csv":
+        backend = CsvBackend(path or "data/weather_log.csv", **options)
+    elif kind == "columnar":
+        backend = ColumnarBackend(ColumnarHistoryStore(path or "data/columnar"))
+    else:
+        raise ValueError(f"Unknown repository backend: {kind}")
+    return ObservationRepository(backend, mirrors=mirrors)
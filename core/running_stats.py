@@ -0,0 +1,257 @@
+# core/running_stats.py
+"""Online per-city statistics with ingest-time anomaly flags"""
+
+import json
+import math
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from .columnar_store import to_epoch
+from .ingest import canonical_city
+from .observation_store import OBSERVATION_COLUMNS
+
+# Metrics tracked for every city
+METRICS = ("temperature", "humidity", "wind_speed", "pressure")
+
+# Smoothing for the exponentially weighted moments; 2 / (N + 1) weights
+# roughly like an N-reading moving window
+DEFAULT_ALPHA = 2 / (50 + 1)
+# A reading this many (exponentially weighted) deviations away is flagged
+DEFAULT_THRESHOLD = 2.0
+# Readings needed before a city/metric can flag anything
+DEFAULT_MIN_COUNT = 5
+# Flags kept per city
+MAX_FLAGS = 50
+SAVE_EVERY_ROWS = 500        # observations folded in between saves...
+SAVE_INTERVAL = 300          # ...or seconds, whichever comes first
+
+_FIELD_NAMES = {header: column for column, header in OBSERVATION_COLUMNS}
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(value) else value
+
+
+class RunningMoments:
+    """Welford mean/variance, exponentially weighted mean/variance and min/max.
+
+    Every update and score is O(1) regardless of how much history was seen.
+    """
+
+    __slots__ = ("count", "mean", "m2", "ewm_mean", "ewm_var", "min", "max")
+
+    def __init__(self, count: int = 0, mean: float = 0.0, m2: float = 0.0, ewm_mean: float = 0.0,
+                 ewm_var: float = 0.0, min: float = math.inf, max: float = -math.inf):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.ewm_mean = ewm_mean
+        self.ewm_var = ewm_var
+        self.min = min
+        self.max = max
+
+    def update(self, value: float, alpha: float = DEFAULT_ALPHA) -> None:
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        if self.count == 1:
+            self.ewm_mean, self.ewm_var = value, 0.0
+        else:
+            diff = value - self.ewm_mean
+            increment = alpha * diff
+            self.ewm_mean += increment
+            self.ewm_var = (1 - alpha) * (self.ewm_var + diff * increment)
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance of every reading seen"""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def ewm_std(self) -> float:
+        return math.sqrt(self.ewm_var)
+
+    def zscore(self, value: float) -> float:
+        """Distance of a reading from the recent (weighted) mean in recent deviations"""
+        return (value - self.ewm_mean) / (self.ewm_std + 1e-6)
+
+    def to_dict(self) -> Dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RunningMoments":
+        return cls(**{name: data[name] for name in cls.__slots__ if name in data})
+
+
+class RunningStats:
+    """Per-city, per-metric running moments, updated as observations are written.
+
+    Each new reading is scored against the moments from before it arrived;
+    readings at least `threshold` deviations from the weighted mean are kept
+    as flags (the newest MAX_FLAGS per city). State is saved to a JSON file
+    along with the number of observations it covers, so callers can tell
+    when it no longer matches the store and needs a rebuild. Listener
+    updates save every SAVE_EVERY_ROWS rows or SAVE_INTERVAL seconds, and
+    owners call save() at shutdown.
+    """
+
+    def __init__(self, path: str = "data/running_stats.json", alpha: float = DEFAULT_ALPHA,
+                 threshold: float = DEFAULT_THRESHOLD, min_count: int = DEFAULT_MIN_COUNT):
+        self.path = Path(path)
+        self.alpha = alpha
+        self.threshold = threshold
+        self.min_count = min_count
+        self.observations = 0
+        self._moments: Dict[str, Dict[str, RunningMoments]] = {}
+        self._flags: Dict[str, deque] = {}
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.loaded = self._load()
+
+    # Updates
+
+    def update_many(self, records: Iterable[Dict]) -> List[Dict]:
+        """Fold observations (field names or CSV headers) in; returns the new flags"""
+        flags = []
+        with self._lock:
+            for record in records:
+                record = {_FIELD_NAMES.get(key, key): value for key, value in record.items()}
+                if not record.get("city"):
+                    continue
+                city = canonical_city(record["city"])
+                try:
+                    timestamp = to_epoch(record.get("timestamp"))
+                except ValueError:
+                    continue
+                moments = self._moments.setdefault(city, {})
+                for metric in METRICS:
+                    value = _to_float(record.get(metric))
+                    if value is None:
+                        continue
+                    state = moments.setdefault(metric, RunningMoments())
+                    if state.count >= self.min_count:
+                        z_score = state.zscore(value)
+                        if abs(z_score) >= self.threshold:
+                            flag = {"city": city, "metric": metric, "timestamp": timestamp,
+                                    "value": value, "expected": state.ewm_mean, "z_score": z_score,
+                                    "reading": state.count + 1}
+                            self._flags.setdefault(city, deque(maxlen=MAX_FLAGS)).append(flag)
+                            flags.append(flag)
+                    state.update(value, self.alpha)
+                self.observations += 1
+        return flags
+
+    def on_written(self, batch: Optional[List[Dict]]) -> None:
+        """Repository listener: fold each written batch in, saving every so often"""
+        if batch is None:
+            # Wholesale changes are handled by whoever made them (clear/rebuild)
+            return
+        self.update_many(batch)
+        with self._lock:
+            self._unsaved += len(batch)
+            due = self._unsaved >= SAVE_EVERY_ROWS or time.monotonic() - self._saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.observations = 0
+            self._moments.clear()
+            self._flags.clear()
+        self.save()
+
+    # Queries
+
+    def moments(self, city: str, metric: str = "temperature") -> Optional[RunningMoments]:
+        with self._lock:
+            return self._moments.get(canonical_city(city), {}).get(metric)
+
+    def summary(self, city: str, metric: str = "temperature") -> Optional[Dict[str, float]]:
+        """Return count/mean/std/min/max plus the weighted recent mean/std"""
+        state = self.moments(city, metric)
+        if state is None or not state.count:
+            return None
+        return {"count": state.count, "mean": state.mean, "std": state.std, "min": state.min,
+                "max": state.max, "recent_mean": state.ewm_mean, "recent_std": state.ewm_std}
+
+    def zscore(self, city: str, metric: str, value: float) -> Optional[float]:
+        """Score a reading against a city's recent moments without folding it in"""
+        state = self.moments(city, metric)
+        if state is None or state.count < self.min_count:
+            return None
+        return state.zscore(value)
+
+    def anomalies(self, city: str, metric: Optional[str] = None, last: Optional[int] = None) -> List[Dict]:
+        """Return flags for a city, oldest first.
+
+        `last` keeps only flags raised by the city's `last` most recent readings.
+        """
+        city = canonical_city(city)
+        with self._lock:
+            flags = list(self._flags.get(city, ()))
+            moments = self._moments.get(city, {})
+            if metric is not None:
+                flags = [flag for flag in flags if flag["metric"] == metric]
+            if last is not None:
+                flags = [flag for flag in flags
+                         if moments[flag["metric"]].count - flag["reading"] < last]
+        return flags
+
+    # Persistence
+
+    def save(self) -> None:
+        with self._lock:
+            unsaved = self._unsaved
+            state = {
+                "alpha": self.alpha,
+                "observations": self.observations,
+                "moments": {city: {metric: state.to_dict() for metric, state in metrics.items()}
+                            for city, metrics in self._moments.items()},
+                "flags": {city: list(flags) for city, flags in self._flags.items()},
+            }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            temp_path = self.path.with_suffix(".tmp")
+            with open(temp_path, "w") as f:
+                json.dump(state, f)
+            temp_path.replace(self.path)
+        except OSError as e:
+            print(f"Error saving running statistics: {e}")
+            return
+        with self._lock:
+            # Rows folded in while the file was written stay counted for the next save
+            self._unsaved -= unsaved
+            self._saved_at = time.monotonic()
+
+    def _load(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state.get("alpha") != self.alpha:
+                return False
+            self._moments = {city: {metric: RunningMoments.from_dict(data) for metric, data in metrics.items()}
+                             for city, metrics in state["moments"].items()}
+            self._flags = {city: deque(flags, maxlen=MAX_FLAGS) for city, flags in state["flags"].items()}
+            self.observations = state["observations"]
+            return True
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Error loading running statistics: {e}")
+            self._moments, self._flags, self.observations = {}, {}, 0
+            return False
@@ -0,0 +1,426 @@
+# core/series_archive.py
+"""Compressed block archive for cold observation history"""
+
+import json
+import struct
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from .columnar_store import to_epoch
+from .ingest import canonical_city, city_slug, legacy_city_slug
+from .observation_store import OBSERVATION_COLUMNS, format_timestamp
+
+# Numeric column -> quantization step. Values are stored as integer multiples
+# of the step, so the archive is lossless at the precision the API reports.
+NUMERIC_SERIES = {
+    "temperature": 0.01,
+    "feels_like": 0.01,
+    "humidity": 0.1,
+    "wind_speed": 0.01,
+    "wind_direction": 1,
+    "pressure": 0.1,
+    "visibility": 1,
+    "cloudiness": 1,
+    "rain_1h": 0.01,
+    "rain_3h": 0.01,
+    "snow_1h": 0.01,
+    "snow_3h": 0.01,
+    "sunrise": 1,
+    "sunset": 1,
+}
+# Low-cardinality text columns, dictionary-encoded per block
+TEXT_SERIES = ("description", "unit")
+
+DEFAULT_BLOCK_SIZE = 1024
+
+_FILE_MAGIC = b"WXTS1\n"
+_BLOCK_MAGIC = b"BLK1"
+# magic, rows, min timestamp, max timestamp
+_BLOCK_HEAD = struct.Struct("<4sIqq")
+_SECTION_COUNT = 1 + len(NUMERIC_SERIES) + len(TEXT_SERIES)
+_BLOCK_SIZES = struct.Struct(f"<{_SECTION_COUNT}I")
+_BLOCK_RANGES = struct.Struct(f"<{2 * len(NUMERIC_SERIES)}d")
+_DELTAS_HEAD = struct.Struct("<qBI")  # first value, bit width, packed byte count
+
+_FIELD_NAMES = {header: column for column, header in OBSERVATION_COLUMNS}
+_HEADERS = dict(OBSERVATION_COLUMNS)
+
+# Column section flags
+_ALL_MISSING, _DENSE, _MASKED = 0, 1, 2
+
+
+# Integer codecs
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+
+def _unzigzag(values: np.ndarray) -> np.ndarray:
+    return (values >> np.uint64(1)).astype(np.int64) ^ -(values & np.uint64(1)).astype(np.int64)
+
+
+def _encode_deltas(values: np.ndarray) -> bytes:
+    """First value, then zigzag deltas bit-packed at the block's widest delta"""
+    if not len(values):
+        return _DELTAS_HEAD.pack(0, 0, 0)
+    encoded = _zigzag(np.diff(values))
+    width = int(encoded.max()).bit_length() if len(encoded) else 0
+    packed = b""
+    if width:
+        shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+        bits = ((encoded[:, None] >> shifts) & np.uint64(1)).astype(np.uint8)
+        packed = np.packbits(bits.ravel()).tobytes()
+    return _DELTAS_HEAD.pack(int(values[0]), width, len(packed)) + packed
+
+
+def _decode_deltas(buffer: bytes, count: int, offset: int = 0) -> Tuple[np.ndarray, int]:
+    """Inverse of _encode_deltas; returns (values, offset after the section)"""
+    first, width, size = _DELTAS_HEAD.unpack_from(buffer, offset)
+    offset += _DELTAS_HEAD.size
+    if count == 0:
+        return np.empty(0, dtype=np.int64), offset + size
+    deltas = np.zeros(count - 1, dtype=np.int64)
+    if width:
+        bits = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8, count=size, offset=offset),
+                             count=(count - 1) * width).reshape(count - 1, width)
+        shifts = np.arange(width - 1, -1, -1, dtype=np.uint64)
+        deltas = _unzigzag((bits.astype(np.uint64) << shifts).sum(axis=1, dtype=np.uint64))
+    values = np.empty(count, dtype=np.int64)
+    values[0] = first
+    np.cumsum(deltas, out=values[1:])
+    values[1:] += first
+    return values, offset + size
+
+
+def _encode_timestamps(timestamps: np.ndarray) -> bytes:
+    """Delta-of-delta: the first timestamp, then the delta series delta-encoded again"""
+    head = struct.pack("<q", int(timestamps[0]))
+    return head + _encode_deltas(np.diff(timestamps))
+
+
+def _decode_timestamps(buffer: bytes, count: int) -> np.ndarray:
+    (first,) = struct.unpack_from("<q", buffer, 0)
+    deltas, _ = _decode_deltas(buffer, count - 1, 8)
+    timestamps = np.empty(count, dtype=np.int64)
+    timestamps[0] = first
+    np.cumsum(deltas, out=timestamps[1:])
+    timestamps[1:] += first
+    return timestamps
+
+
+# Column codecs
+
+def _encode_numeric(values: np.ndarray, step: float) -> bytes:
+    missing = np.isnan(values)
+    if missing.all():
+        return bytes([_ALL_MISSING])
+    quantized = np.zeros(len(values), dtype=np.int64)
+    quantized[~missing] = np.round(values[~missing] / step).astype(np.int64)
+    if not missing.any():
+        return bytes([_DENSE]) + _encode_deltas(quantized)
+    # Gaps repeat the previous value so they cost a zero delta
+    present = np.where(~missing, np.arange(len(values)), 0)
+    np.maximum.accumulate(present, out=present)
+    first = int(np.argmax(~missing))
+    present[:first] = first
+    quantized = quantized[present]
+    return bytes([_MASKED]) + np.packbits(missing).tobytes() + _encode_deltas(quantized)
+
+
+def _decode_numeric(buffer: bytes, count: int, step: float) -> np.ndarray:
+    flag = buffer[0]
+    if flag == _ALL_MISSING:
+        return np.full(count, np.nan)
+    offset, missing = 1, None
+    if flag == _MASKED:
+        mask_bytes = (count + 7) // 8
+        missing = np.unpackbits(np.frombuffer(buffer, dtype=np.uint8, count=mask_bytes, offset=1),
+                                count=count).astype(bool)
+        offset += mask_bytes
+    quantized, _ = _decode_deltas(buffer, count, offset)
+    values = quantized * step
+    if missing is not None:
+        values[missing] = np.nan
+    return values
+
+
+def _encode_text(values: List[str]) -> bytes:
+    vocabulary = sorted(set(values))
+    codes = {value: code for code, value in enumerate(vocabulary)}
+    words = json.dumps(vocabulary).encode("utf-8")
+    return (struct.pack("<I", len(words)) + words
+            + _encode_deltas(np.array([codes[value] for value in values], dtype=np.int64)))
+
+
+def _decode_text(buffer: bytes, count: int) -> np.ndarray:
+    (size,) = struct.unpack_from("<I", buffer, 0)
+    vocabulary = np.array(json.loads(buffer[4:4 + size].decode("utf-8")) or [""], dtype=object)
+    codes, _ = _decode_deltas(buffer, count, 4 + size)
+    return vocabulary[codes]
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class _BlockHeader:
+    """Location and summary of one block, read without touching its payload"""
+
+    def __init__(self, offset: int, rows: int, min_ts: int, max_ts: int,
+                 sizes: Tuple[int, ...], ranges: Tuple[float, ...]):
+        self.offset = offset  # start of the payload
+        self.rows = rows
+        self.min_ts = min_ts
+        self.max_ts = max_ts
+        self.sizes = sizes
+        self.ranges = {name: (ranges[2 * i], ranges[2 * i + 1]) for i, name in enumerate(NUMERIC_SERIES)}
+
+    def overlaps(self, lo: Optional[int], hi: Optional[int], where: Dict) -> bool:
+        if (lo is not None and self.max_ts < lo) or (hi is not None and self.min_ts > hi):
+            return False
+        for name, (low, high) in where.items():
+            block_min, block_max = self.ranges[name]
+            if np.isnan(block_min):  # column entirely missing in this block
+                return False
+            if (low is not None and block_max < low) or (high is not None and block_min > high):
+                return False
+        return True
+
+    def section(self, index: int) -> Tuple[int, int]:
+        """Return (offset, size) of a payload section"""
+        return self.offset + sum(self.sizes[:index]), self.sizes[index]
+
+
+class SeriesArchive:
+    """Per-city append-only archive files of compressed observation blocks.
+
+    Each block holds up to `block_size` rows: timestamps are delta-of-delta
+    encoded, numeric columns are quantized and delta-encoded, and every
+    integer series is zigzag bit-packed at the narrowest width that fits the
+    block. Text columns are dictionary-encoded. A block header records the
+    row count, time range, per-column min/max and section sizes, so scans
+    skip non-matching blocks and decode only the requested columns. Rows
+    older than what a city already has (e.g. a backfilled reading) go into
+    new blocks; scans put overlapping blocks back in time order.
+    """
+
+    def __init__(self, root: str = "data/archive/series", block_size: int = DEFAULT_BLOCK_SIZE):
+        self.root = Path(root)
+        self.block_size = block_size
+        self._headers: Dict[str, List[_BlockHeader]] = {}
+        self._lock = threading.RLock()
+
+    # Writes
+
+    def append(self, records: Iterable[Dict]) -> int:
+        """Archive observation dicts (field names or CSV headers); returns rows written"""
+        by_city: Dict[str, List[Dict]] = {}
+        for record in records:
+            record = {_FIELD_NAMES.get(key, key): value for key, value in record.items()}
+            if not record.get("city") or np.isnan(_to_float(record.get("temperature"))):
+                continue
+            by_city.setdefault(canonical_city(record["city"]), []).append(record)
+
+        with self._lock:
+            written = 0
+            for city, rows in by_city.items():
+                rows.sort(key=lambda row: format_timestamp(row.get("timestamp")))
+                timestamps = np.array([to_epoch(row.get("timestamp")) for row in rows], dtype=np.int64)
+                self._block_headers(city)  # index the existing blocks before adding to the file
+                path = self._path(city)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                new_file = not path.exists()
+                with open(path, "ab") as f:
+                    if new_file:
+                        meta = json.dumps({"city": city, "numeric": NUMERIC_SERIES,
+                                           "text": list(TEXT_SERIES)}).encode("utf-8")
+                        f.write(_FILE_MAGIC + struct.pack("<I", len(meta)) + meta)
+                    for start in range(0, len(rows), self.block_size):
+                        self._write_block(f, city, rows[start:start + self.block_size],
+                                          timestamps[start:start + self.block_size])
+                written += len(rows)
+            return written
+
+    def clear(self) -> None:
+        """Delete every archive file"""
+        with self._lock:
+            for path in self.root.glob("*.wxts"):
+                path.unlink()
+            self._headers.clear()
+
+    def _write_block(self, f: BinaryIO, city: str, rows: List[Dict], timestamps: np.ndarray) -> None:
+        sections = [_encode_timestamps(timestamps)]
+        ranges = []
+        for name, step in NUMERIC_SERIES.items():
+            values = np.array([_to_float(row.get(name)) for row in rows], dtype=np.float64)
+            sections.append(_encode_numeric(values, step))
+            # Ranges describe the stored (quantized) values that scans filter on
+            present = np.round(values[~np.isnan(values)] / step) * step
+            ranges.extend((present.min(), present.max()) if len(present) else (np.nan, np.nan))
+        for name in TEXT_SERIES:
+            sections.append(_encode_text([str(row.get(name) or "") for row in rows]))
+
+        head = (_BLOCK_HEAD.pack(_BLOCK_MAGIC, len(rows), int(timestamps[0]), int(timestamps[-1]))
+                + _BLOCK_SIZES.pack(*(len(section) for section in sections))
+                + _BLOCK_RANGES.pack(*ranges))
+        f.write(head)
+        offset = f.tell()
+        f.write(b"".join(sections))
+        self._block_headers(city).append(_BlockHeader(
+            offset, len(rows), int(timestamps[0]), int(timestamps[-1]),
+            tuple(len(section) for section in sections), tuple(ranges)))
+
+    # Reads
+
+    def scan(self, city: str, start=None, end=None, columns: Optional[List[str]] = None,
+             **where: Tuple[Optional[float], Optional[float]]) -> Dict[str, np.ndarray]:
+        """Return {"timestamp": ..., column: ...} arrays for matching rows, oldest first.
+
+        Keyword ranges such as temperature=(25, None) filter rows and let
+        whole blocks be skipped by their min/max headers.
+        """
+        columns = list(columns or list(NUMERIC_SERIES) + list(TEXT_SERIES))
+        unknown = (set(columns) | set(where)) - set(NUMERIC_SERIES) - set(TEXT_SERIES)
+        if unknown or set(where) & set(TEXT_SERIES):
+            raise ValueError(f"Unknown archive column(s): {', '.join(sorted(unknown or where))}")
+        lo = to_epoch(start) if start is not None else None
+        hi = to_epoch(end) if end is not None else None
+        needed = list(dict.fromkeys(columns + list(where)))
+
+        parts: Dict[str, List[np.ndarray]] = {name: [] for name in ["timestamp"] + needed}
+        with self._lock:
+            headers = [header for header in self._block_headers(city) if header.overlaps(lo, hi, where)]
+            ordered = all(earlier.max_ts <= later.min_ts for earlier, later in zip(headers, headers[1:]))
+            if headers:
+                with open(self._path(city), "rb") as f:
+                    for header in headers:
+                        block = self._decode_block(f, header, needed)
+                        keep = np.ones(header.rows, dtype=bool)
+                        if lo is not None:
+                            keep &= block["timestamp"] >= lo
+                        if hi is not None:
+                            keep &= block["timestamp"] <= hi
+                        for name, (low, high) in where.items():
+                            if low is not None:
+                                keep &= block[name] >= low
+                            if high is not None:
+                                keep &= block[name] <= high
+                        for name, values in block.items():
+                            parts[name].append(values[keep])
+
+        result = {}
+        for name in ["timestamp"] + columns:
+            if parts[name]:
+                result[name] = np.concatenate(parts[name])
+            else:
+                result[name] = np.empty(0, dtype=np.int64 if name == "timestamp" else
+                                        (object if name in TEXT_SERIES else np.float64))
+        if not ordered:
+            order = np.argsort(result["timestamp"], kind="stable")
+            result = {name: values[order] for name, values in result.items()}
+        return result
+
+    def rows(self, city: str, start=None, end=None) -> List[Dict]:
+        """Return archived rows keyed by CSV headers, like ObservationStore.range"""
+        data = self.scan(city, start, end)
+        city = canonical_city(city)
+        rows = []
+        for index, timestamp in enumerate(data["timestamp"].tolist()):
+            row = {"DateTime": datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S"), "City": city}
+            for name in list(NUMERIC_SERIES) + list(TEXT_SERIES):
+                value = data[name][index]
+                if name in NUMERIC_SERIES:
+                    value = None if np.isnan(value) else round(float(value), 6)
+                else:
+                    value = value or None
+                row[_HEADERS[name]] = value
+            rows.append(row)
+        return rows
+
+    def cities(self) -> List[str]:
+        """Return every city with archived history"""
+        names = []
+        for path in sorted(self.root.glob("*.wxts")):
+            with open(path, "rb") as f:
+                names.append(self._read_meta(f)["city"])
+        return names
+
+    def stats(self) -> Dict:
+        """Return archive size and row/block counts"""
+        with self._lock:
+            cities = self.cities()
+            blocks = [header for city in cities for header in self._block_headers(city)]
+            size = sum(path.stat().st_size for path in self.root.glob("*.wxts"))
+        return {"cities": len(cities), "blocks": len(blocks),
+                "rows": sum(header.rows for header in blocks), "bytes": size}
+
+    def _decode_block(self, f: BinaryIO, header: _BlockHeader, columns: List[str]) -> Dict[str, np.ndarray]:
+        """Read and decode only the timestamp section and the requested columns"""
+        order = ["timestamp"] + list(NUMERIC_SERIES) + list(TEXT_SERIES)
+        block = {}
+        for name in ["timestamp"] + columns:
+            offset, size = header.section(order.index(name))
+            f.seek(offset)
+            buffer = f.read(size)
+            if name == "timestamp":
+                block[name] = _decode_timestamps(buffer, header.rows)
+            elif name in NUMERIC_SERIES:
+                block[name] = _decode_numeric(buffer, header.rows, NUMERIC_SERIES[name])
+            else:
+                block[name] = _decode_text(buffer, header.rows)
+        return block
+
+    def _block_headers(self, city: str) -> List[_BlockHeader]:
+        """Load (once) the header of every block in a city's file"""
+        city = canonical_city(city)
+        headers = self._headers.get(city)
+        if headers is None:
+            headers = self._headers[city] = []
+            path = self._path(city)
+            if path.exists():
+                with open(path, "rb") as f:
+                    self._read_meta(f)
+                    while True:
+                        head = f.read(_BLOCK_HEAD.size)
+                        if len(head) < _BLOCK_HEAD.size:
+                            break
+                        magic, rows, min_ts, max_ts = _BLOCK_HEAD.unpack(head)
+                        if magic != _BLOCK_MAGIC:
+                            raise ValueError(f"Corrupt archive block in {path}")
+                        sizes = _BLOCK_SIZES.unpack(f.read(_BLOCK_SIZES.size))
+                        ranges = _BLOCK_RANGES.unpack(f.read(_BLOCK_RANGES.size))
+                        headers.append(_BlockHeader(f.tell(), rows, min_ts, max_ts, sizes, ranges))
+                        f.seek(sum(sizes), 1)
+        return headers
+
+    @staticmethod
+    def _read_meta(f: BinaryIO) -> Dict:
+        if f.read(len(_FILE_MAGIC)) != _FILE_MAGIC:
+            raise ValueError(f"Not a series archive: {f.name}")
+        (size,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(size).decode("utf-8"))
+
+    def _path(self, city: str) -> Path:
+        city = canonical_city(city)
+        path = self.root / f"{city_slug(city)}.wxts"
+        if not path.exists():
+            self._adopt_legacy(city, path)
+        return path
+
+    def _adopt_legacy(self, city: str, path: Path) -> None:
+        """Rename a city's pre-city_slug archive file, if that one is its own"""
+        legacy = self.root / f"{legacy_city_slug(city)}.wxts"
+        try:
+            with open(legacy, "rb") as f:
+                owner = self._read_meta(f)["city"]
+        except (OSError, ValueError, KeyError, struct.error):
+            return
+        if canonical_city(owner) == city:
+            legacy.rename(path)
@@ -1,49 +1,59 @@
 # core/storage.py
 """Data storage module"""
 
-import json
 import csv
+import os
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, List, Optional
+
+from .repository import CsvBackend, ObservationRepository
 
 class StorageManager:
     """Manages all data persistence"""
     
-    def __init__(self, data_dir: str = "data"):
+    def __init__(self, data_dir: str = "data", repository: Optional[ObservationRepository] = None):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(exist_ok=True)
+        # Same observation log (and read cache) the weather service uses
+        self.repository = repository or ObservationRepository(
+            CsvBackend(str(self.data_dir / "weather_log.csv")), name="history-writer")
+        self._import_legacy_history()
         
     def save_weather(self, weather_data: Dict) -> None:
-        """Save weather data to file"""
-        filename = self.data_dir / "weather_history.csv"
-        
-        with open(filename, 'a', newline='') as f:
-            writer = csv.writer(f)
-            writer.writerow([
-                datetime.now().isoformat(),
-                weather_data.get('name', ''),
-                weather_data.get('main', {}).get('temp', ''),
-                weather_data.get('weather', [{}])[0].get('description', '')
-            ])
+        """Queue raw API weather data for the observation log"""
+        self.repository.write({
+            'city': weather_data.get('name', ''),
+            'temperature': weather_data.get('main', {}).get('temp', ''),
+            'description': weather_data.get('weather', [{}])[0].get('description', ''),
+            'humidity': weather_data.get('main', {}).get('humidity'),
+            'wind_speed': weather_data.get('wind', {}).get('speed'),
+            'observed_at': weather_data.get('dt')
+        })
     
     def load_history(self, limit: int = 10) -> List[Dict]:
         """Load recent weather history"""
-        filename = self.data_dir / "weather_history.csv"
-        
-        if not filename.exists():
-            return []
-            
-        history = []
-        with open(filename, 'r') as f:
-            reader = csv.reader(f)
-            for row in reader:
-                if len(row) == 4:
-                    history.append({
-                        'timestamp': row[0],
-                        'city': row[1],
-                        'temperature': float(row[2]),
-                        'description': row[3]
-                    })
-        
-        return history[-limit:]  # Return most recent entries
+        return [{
+            'timestamp': row['DateTime'],
+            'city': row['City'],
+            'temperature': float(row['Temperature']),
+            'description': row.get('Description') or ''
+        } for row in self.repository.latest(limit=limit)]
+
+    def _import_legacy_history(self) -> None:
+        """Move rows from the old four-column weather_history.csv into the shared log once"""
+        legacy = self.data_dir / "weather_history.csv"
+        if not legacy.exists():
+            return
+        with open(legacy, "r", newline="") as f:
+            for row in csv.reader(f):
+                if len(row) != 4:
+                    continue
+                try:
+                    when = datetime.fromisoformat(row[0])
+                except ValueError:
+                    continue
+                self.repository.write({'city': row[1], 'temperature': row[2], 'description': row[3]},
+                                      timestamp=when.replace(microsecond=0))
+        self.repository.flush()
+        os.replace(legacy, legacy.with_name(legacy.name + ".imported"))
@@ -38,7 +38,9 @@ def main():
         print("   🌪️ Severe Weather Tracking")
         print("   📊 Comprehensive Charts & Analytics")
         
-        app = MainWindow(controller)
+        # Opt-in UI stutter diagnostics: UI_LATENCY_MONITOR=1
+        monitor_latency = os.getenv("UI_LATENCY_MONITOR", "").lower() in ("1", "true", "yes")
+        app = MainWindow(controller, monitor_latency=monitor_latency)
         app.mainloop()
         
     except Exception as e:
@@ -3,7 +3,7 @@ Machine Learning Models for Weather Dashboard
 Enhanced data models with ML capabilities
 """
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import List, Dict, Any, Optional
 import numpy as np
 
@@ -125,6 +125,32 @@ class PersonalizedRecommendation:
                f"(confidence: {self.confidence:.2f})"
 
 
+@dataclass
+class PredictionGrid:
+    """Temperature predictions for several cities at several horizons"""
+    
+    cities: List[str]
+    horizons: List[int]
+    temperatures: np.ndarray  # shape (cities, horizons)
+    confidence: np.ndarray    # shape (cities, horizons)
+    current: np.ndarray       # latest recorded temperature per city (NaN if none)
+    model_based: List[bool]   # per city: trained model vs trend heuristic
+    generated_at: datetime
+    
+    def prediction(self, city: str, hours_ahead: int) -> WeatherPrediction:
+        """Return one cell of the grid as a WeatherPrediction"""
+        row, column = self.cities.index(city), self.horizons.index(hours_ahead)
+        change = self.temperatures[row, column] - self.current[row]
+        return WeatherPrediction(
+            city=city,
+            predicted_temperature=round(float(self.temperatures[row, column]), 1),
+            confidence_score=float(self.confidence[row, column]),
+            prediction_time=self.generated_at + timedelta(hours=hours_ahead),
+            trend_direction="increasing" if change > 1 else "decreasing" if change < -1 else "stable",
+            prediction_horizon_hours=hours_ahead
+        )
+
+
 @dataclass
 class WeatherInsights:
     """Comprehensive weather analysis insights"""
@@ -165,6 +191,13 @@ class WeatherInsights:
 class MLDataPreprocessor:
     """Preprocesses weather data for ML models"""
     
+    # Columns of extract_features() / extract_feature_matrix(), in order
+    FEATURE_NAMES = [
+        'temp_norm', 'humidity_norm', 'wind_norm', 'pressure_norm', 'visibility_norm',
+        'cloudiness_norm', 'hour_sin', 'hour_cos', 'dow_sin', 'dow_cos',
+        'month_sin', 'month_cos', 'season_norm'
+    ]
+    
     @staticmethod
     def normalize_features(data: Dict[str, Any]) -> Dict[str, float]:
         """Normalize features for ML processing"""
@@ -210,37 +243,150 @@ class MLDataPreprocessor:
         return normalized
     
     @staticmethod
-    def create_sequences(data: List[Dict], sequence_length: int = 24) -> tuple:
-        """Create sequences for time series prediction"""
-        sequences = []
-        targets = []
+    def create_sequences(data, sequence_length: int = 24, horizons=1, stride: int = 1,
+                         columns: Optional[List[str]] = None, target: str = "temperature",
+                         dtype=np.float32) -> tuple:
+        """Create (windows, targets) for time series prediction without copying windows.
         
-        for i in range(len(data) - sequence_length):
-            sequences.append(data[i:i + sequence_length])
-            targets.append(data[i + sequence_length]['temperature'])
+        `data` is a list of record dicts, a dict of column arrays (e.g.
+        HistoryDataset.city()) or an (n,) / (n, features) array whose first
+        feature is the target. Windows are strided views of one contiguous
+        array, shaped (count, sequence_length, features). A window starting at
+        row i is followed by targets at rows i + sequence_length - 1 + h for
+        each horizon h (1 = the next reading). An int `horizons` gives targets
+        shaped (count,), a sequence gives (count, len(horizons)).
+        """
+        if isinstance(data, np.ndarray):
+            values = data.reshape(len(data), -1)
+            target_values = values[:, 0]
+        else:
+            if isinstance(data, dict):
+                column_data = data
+                columns = columns or [target]
+            else:
+                columns = columns or [target]
+                column_data = {name: [record.get(name, np.nan) for record in data] for name in columns}
+            values = np.column_stack([np.asarray(column_data[name], dtype=dtype) for name in columns])
+            target_values = np.asarray(column_data[target], dtype=dtype)
+        values = np.ascontiguousarray(values, dtype=dtype)
+        target_values = np.asarray(target_values, dtype=dtype)
+        
+        steps = np.atleast_1d(np.asarray(horizons, dtype=np.int64))
+        if sequence_length < 1 or stride < 1 or (steps < 1).any():
+            raise ValueError("sequence_length, stride and horizons must be positive")
+        reach = int(steps.max())
+        count = len(values) - sequence_length - reach + 1
+        if count <= 0:
+            windows = np.empty((0, sequence_length, values.shape[1]), dtype=dtype)
+            return windows, np.empty((0,) if np.ndim(horizons) == 0 else (0, len(steps)), dtype=dtype)
         
-        return sequences, targets
+        windows = np.lib.stride_tricks.sliding_window_view(values[:count + sequence_length - 1],
+                                                           sequence_length, axis=0)
+        windows = windows.transpose(0, 2, 1)[::stride]
+        future = np.lib.stride_tricks.sliding_window_view(target_values[sequence_length:], reach)[:count:stride]
+        if np.ndim(horizons) == 0:
+            return windows, future[:, reach - 1]
+        return windows, future[:, steps - 1]
     
     @staticmethod
     def extract_features(weather_data: MLEnhancedWeatherData) -> np.ndarray:
         """Extract feature vector from weather data"""
-        data_dict = weather_data.to_dict()
-        normalized = MLDataPreprocessor.normalize_features(data_dict)
-        
-        feature_vector = [
-            normalized.get('temp_norm', 0),
-            normalized.get('humidity_norm', 0),
-            normalized.get('wind_norm', 0),
-            normalized.get('pressure_norm', 0),
-            normalized.get('visibility_norm', 0),
-            normalized.get('cloudiness_norm', 0),
-            normalized.get('hour_sin', 0),
-            normalized.get('hour_cos', 0),
-            normalized.get('dow_sin', 0),
-            normalized.get('dow_cos', 0),
-            normalized.get('month_sin', 0),
-            normalized.get('month_cos', 0),
-            data_dict.get('season', 0) / 3  # Normalize season
+        return MLDataPreprocessor.extract_feature_matrix([weather_data], dtype=np.float64)[0]
+    
+    @staticmethod
+    def extract_feature_matrix(data, dtype=np.float32) -> np.ndarray:
+        """Extract an (n, len(FEATURE_NAMES)) feature matrix in one vectorized pass.
+        
+        `data` is a list of MLEnhancedWeatherData, a list of dicts or a dict of
+        column arrays (e.g. HistoryDataset.city()). Time features come from
+        hour/day_of_week/month/season columns when present, else from a
+        `datetime` or `timestamp` column (datetimes or epoch seconds, local
+        time). Absent inputs give 0 for their features, as in normalize_features.
+        """
+        absent = {}  # column -> rows whose record lacks it (their features stay 0)
+        if isinstance(data, dict):
+            columns = {name: np.asarray(values) for name, values in data.items()}
+            n = len(next(iter(columns.values()))) if columns else 0
+        else:
+            records = [record.to_dict() if isinstance(record, MLEnhancedWeatherData) else record
+                       for record in data]
+            n = len(records)
+            names = {name for record in records for name in record}
+            columns = {name: np.array([record.get(name, np.nan) for record in records])
+                       for name in names}
+            for name in names:
+                missing = np.array([name not in record for record in records], dtype=bool)
+                if missing.any():
+                    absent[name] = missing
+        
+        def column(name):
+            if name not in columns:
+                return None
+            values = columns[name].astype(np.float64)
+            return np.where(absent[name], 0.0, values) if name in absent else values
+        
+        if 'hour' not in columns:
+            columns.update(MLDataPreprocessor.time_columns(columns.get('datetime', columns.get('timestamp'))))
+        
+        matrix = np.zeros((n, len(MLDataPreprocessor.FEATURE_NAMES)), dtype=np.float64)
+        scaled = [
+            ('temperature', lambda v: (v + 50) / 100),
+            ('humidity', lambda v: v / 100),
+            ('wind_speed', lambda v: np.minimum(v / 50, 1.0)),
+            ('pressure', lambda v: (v - 900) / 200),
+            ('visibility', lambda v: np.minimum(v / 20, 1.0)),
+            ('cloudiness', lambda v: v / 100),
         ]
+        for position, (name, scale) in enumerate(scaled):
+            values = column(name)
+            if values is not None:
+                matrix[:, position] = np.where(absent[name], 0.0, scale(values)) if name in absent else scale(values)
+        
+        # Cyclical time encodings
+        for position, (name, period) in zip((6, 8, 10), (('hour', 24), ('day_of_week', 7), ('month', 12))):
+            values = column(name)
+            if values is not None:
+                angle = 2 * np.pi * values / period
+                matrix[:, position] = np.sin(angle)
+                matrix[:, position + 1] = np.cos(angle)
+                if name in absent:
+                    matrix[absent[name], position:position + 2] = 0.0
         
-        return np.array(feature_vector)
\ No newline at end of file
+        season = column('season')
+        if season is not None:
+            matrix[:, 12] = season / 3  # Normalize season
+        return matrix.astype(dtype, copy=False)
+    
+    @staticmethod
+    def time_columns(when) -> Dict[str, np.ndarray]:
+        """Local hour, weekday, month and season arrays for datetimes or epoch seconds"""
+        if when is None:
+            return {}
+        if when.dtype == object:
+            when = np.array([value.timestamp() if isinstance(value, datetime) else value
+                             for value in when], dtype=np.float64)
+        seconds = np.floor(when.astype(np.float64)).astype(np.int64)
+        if not len(seconds):
+            return {'hour': seconds, 'day_of_week': seconds, 'month': seconds, 'season': seconds}
+        
+        # Local UTC offset: one lookup per distinct day, per distinct hour on DST change days
+        def offset(value):
+            return int(datetime.fromtimestamp(int(value)).astimezone().utcoffset().total_seconds())
+        
+        days, day_of_row = np.unique(seconds // 86400, return_inverse=True)
+        day_start = np.array([offset(day * 86400) for day in days], dtype=np.int64)
+        day_end = np.array([offset(day * 86400 + 86399) for day in days], dtype=np.int64)
+        offsets = day_start[day_of_row]
+        changing = (day_start != day_end)[day_of_row]
+        if changing.any():
+            hours, hour_of_row = np.unique(seconds[changing] // 3600, return_inverse=True)
+            offsets[changing] = np.array([offset(hour * 3600) for hour in hours], dtype=np.int64)[hour_of_row]
+        local = seconds + offsets
+        
+        month = local.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64) % 12 + 1
+        return {
+            'hour': local // 3600 % 24,
+            'day_of_week': (local // 86400 + 3) % 7,  # 1970-01-01 was a Thursday
+            'month': month,
+            'season': np.array([0, 0, 1, 1, 1, 2, 2, 2, 3, 3, 3, 0])[month - 1],
+        }
\ No newline at end of file
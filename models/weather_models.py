@@ -27,6 +27,7 @@ class WeatherData:
     rain_3h: Optional[float] = None       # mm in last 3 hours
     snow_1h: Optional[float] = None       # mm in last hour
     snow_3h: Optional[float] = None       # mm in last 3 hours
+    observed_at: Optional[int] = None     # provider observation time (unix timestamp)
 
     @property
     def unit_label(self) -> str:
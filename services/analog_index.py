@@ -0,0 +1,227 @@
+"""
+Analog Index - Nearest-neighbour search over past weather states ("similar day" forecasting)
+"""
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from core.ingest import canonical_city
+from models.ml_models import MLDataPreprocessor
+
+try:
+    from sklearn.neighbors import KDTree
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+
+# MLDataPreprocessor features describing a state, with how much each one counts
+# after standardization; "recent_change" is the temperature change per hour
+# since the previous reading
+ANALOG_WEIGHTS = {
+    "temp_norm": 2.0, "humidity_norm": 1.0, "wind_norm": 0.5, "pressure_norm": 1.0,
+    "hour_sin": 1.5, "hour_cos": 1.5, "month_sin": 1.0, "month_cos": 1.0, "recent_change": 1.0,
+}
+_PREPROCESSOR_COLUMNS = [MLDataPreprocessor.FEATURE_NAMES.index(name)
+                         for name in ANALOG_WEIGHTS if name != "recent_change"]
+_WEIGHTS = np.array(list(ANALOG_WEIGHTS.values()))
+
+DEFAULT_NEIGHBOURS = 10
+REBUILD_AFTER_ROWS = 256     # unindexed rows (searched by brute force) before the tree is rebuilt
+OUTCOME_TOLERANCE_HOURS = 1.0
+_COLUMNS = ("timestamp", "temperature", "humidity", "wind_speed", "pressure")
+
+
+def outcome_indices(timestamps: np.ndarray, rows: np.ndarray, hours_ahead: float,
+                    tolerance_hours: float = OUTCOME_TOLERANCE_HOURS) -> np.ndarray:
+    """Index of the reading nearest each row's time + hours_ahead (-1 if none within tolerance)"""
+    rows = np.asarray(rows, dtype=np.int64)
+    if not len(timestamps) or not len(rows):
+        return np.full(len(rows), -1)
+    targets = timestamps[rows] + hours_ahead * 3600
+    after = np.clip(np.searchsorted(timestamps, targets), 1, max(len(timestamps) - 1, 1))
+    before = np.clip(after - 1, 0, len(timestamps) - 1)
+    after = np.minimum(after, len(timestamps) - 1)
+    nearest = np.where(np.abs(timestamps[before] - targets) <= np.abs(timestamps[after] - targets),
+                       before, after)
+    valid = (nearest > rows) & (np.abs(timestamps[nearest] - targets) <= tolerance_hours * 3600)
+    return np.where(valid, nearest, -1)
+
+
+def state_matrix(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """Unscaled analog features (ANALOG_WEIGHTS order) for every row of a city's columns"""
+    matrix = MLDataPreprocessor.extract_feature_matrix({name: columns[name] for name in _COLUMNS},
+                                                       dtype=np.float64)
+    temperatures = np.asarray(columns["temperature"], dtype=np.float64)
+    changes = np.zeros(len(temperatures))
+    if len(temperatures) > 1:
+        hours = np.maximum(np.diff(columns["timestamp"]) / 3600.0, 1.0)
+        changes[1:] = np.clip(np.diff(temperatures) / hours, -5, 5)
+    return np.nan_to_num(np.column_stack([matrix[:, _PREPROCESSOR_COLUMNS], changes]))
+
+
+class CityAnalogIndex:
+    """One city's past states in a KD-tree plus an unindexed tail.
+
+    `sync(columns)` appends rows added since the last call (columns only
+    grow; fewer rows than indexed means a reset, which rebuilds). New rows
+    go to a tail searched by brute force until REBUILD_AFTER_ROWS of them
+    pile up, then the tree is rebuilt with fresh standardization, so
+    ingest stays cheap and queries stay sub-millisecond.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.timestamps = np.empty(0, dtype=np.int64)
+        self.temperatures = np.empty(0)
+        self._raw = np.empty((0, len(_WEIGHTS)))
+        self._center = np.zeros(len(_WEIGHTS))
+        self._scale = np.ones(len(_WEIGHTS))
+        self._tree = None
+        self._indexed = 0        # rows covered by the tree; the rest are the tail
+        self._tail = np.empty((0, len(_WEIGHTS)))
+        self.rebuilds = 0
+
+    def sync(self, columns: Dict[str, np.ndarray]) -> int:
+        """Index rows not seen yet; returns how many were added"""
+        count = len(columns["timestamp"])
+        if count < self.rows:
+            self.__init__()
+        if count == self.rows:
+            return 0
+        # One row of overlap so the first new row's recent change is right
+        start = max(self.rows - 1, 0)
+        fresh = state_matrix({name: columns[name][start:count] for name in _COLUMNS})[self.rows - start:]
+        added = count - self.rows
+        self.timestamps = np.asarray(columns["timestamp"][:count], dtype=np.int64)
+        self.temperatures = np.asarray(columns["temperature"][:count], dtype=np.float64)
+        self._raw = np.concatenate([self._raw, fresh])
+        self.rows = count
+        if SKLEARN_AVAILABLE and self.rows - self._indexed >= REBUILD_AFTER_ROWS:
+            self._rebuild()
+        else:
+            if self._tree is None:
+                self._standardize()  # everything is brute force yet: keep the scaling current
+            self._tail = self._scaled(self._raw[self._indexed:])
+        return added
+
+    def query(self, state: np.ndarray, k: int = DEFAULT_NEIGHBOURS,
+              before: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (row indices, distances) of the k rows nearest an unscaled state, nearest first.
+
+        `before` restricts matches to rows older than that row index.
+        """
+        limit = self.rows if before is None else min(before, self.rows)
+        if limit <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        point = self._scaled(np.asarray(state, dtype=np.float64).reshape(1, -1))
+        indices, distances = [], []
+        indexed = min(self._indexed, limit)
+        if indexed:
+            # Rows past `limit` may be among the tree's nearest; ask for enough extra to skip them
+            ask = min(self._indexed, k + (self._indexed - indexed))
+            tree_distances, tree_indices = self._tree.query(point, k=ask)
+            keep = tree_indices[0] < limit
+            indices.append(tree_indices[0][keep])
+            distances.append(tree_distances[0][keep])
+        if limit > self._indexed:
+            tail = self._tail[:limit - self._indexed]
+            tail_distances = np.sqrt(((tail - point) ** 2).sum(axis=1))
+            indices.append(np.arange(self._indexed, limit))
+            distances.append(tail_distances)
+        indices, distances = np.concatenate(indices), np.concatenate(distances)
+        order = np.argsort(distances, kind="stable")[:k]
+        return indices[order], distances[order]
+
+    def analogs(self, k: int = DEFAULT_NEIGHBOURS, hours_ahead: Optional[float] = None) -> List[Dict]:
+        """The k past rows most like the latest one, nearest first.
+
+        Each match has its time, distance and temperature; with `hours_ahead`
+        only matches whose outcome is known are returned, with the
+        temperature `hours_ahead` later and the change.
+        """
+        if self.rows < 2:
+            return []
+        # Skip the latest row itself; ask for extra when outcomes must exist
+        rows, distances = self.query(self._raw[-1], k=k * 3 if hours_ahead else k, before=self.rows - 1)
+        outcomes = (outcome_indices(self.timestamps, rows, hours_ahead) if hours_ahead
+                    else np.zeros(len(rows), dtype=np.int64))
+        matches = []
+        for row, distance, outcome in zip(rows, distances, outcomes):
+            if outcome < 0:
+                continue
+            match = {"timestamp": int(self.timestamps[row]), "distance": float(distance),
+                     "temperature": float(self.temperatures[row])}
+            if hours_ahead:
+                match["later_temperature"] = float(self.temperatures[outcome])
+                match["change"] = match["later_temperature"] - match["temperature"]
+            matches.append(match)
+            if len(matches) == k:
+                break
+        return matches
+
+    def forecast(self, hours_ahead: float, k: int = DEFAULT_NEIGHBOURS) -> Optional[Tuple[float, float, List[Dict]]]:
+        """Return (temperature, confidence, analogs) `hours_ahead` after the latest row.
+
+        The latest temperature plus the analogs' distance-weighted mean change;
+        confidence falls as their changes disagree. None with under 3 analogs.
+        """
+        analogs = self.analogs(k, hours_ahead)
+        if len(analogs) < 3:
+            return None
+        changes = np.array([analog["change"] for analog in analogs])
+        weights = 1 / (np.array([analog["distance"] for analog in analogs]) + 0.1)
+        change = float(np.average(changes, weights=weights))
+        spread = float(np.sqrt(np.average((changes - change) ** 2, weights=weights)))
+        return float(self.temperatures[-1]) + change, max(0.4, min(0.9, 1 / (1 + spread / 3))), analogs
+
+    def _scaled(self, raw: np.ndarray) -> np.ndarray:
+        return (raw - self._center) / self._scale * _WEIGHTS
+
+    def _standardize(self) -> None:
+        self._center = self._raw.mean(axis=0) if self.rows else np.zeros(len(_WEIGHTS))
+        spread = self._raw.std(axis=0) if self.rows else np.ones(len(_WEIGHTS))
+        self._scale = np.where(spread > 1e-9, spread, 1.0)
+
+    def _rebuild(self) -> None:
+        self._standardize()
+        self._tree = KDTree(self._scaled(self._raw))
+        self._indexed = self.rows
+        self._tail = np.empty((0, len(_WEIGHTS)))
+        self.rebuilds += 1
+
+
+class AnalogIndex:
+    """Per-city analog indexes built lazily from `loader(city)` columns.
+
+    `loader` returns a city's columns (see core.history_dataset.HistoryDataset.city);
+    every call syncs the city's index with it first, which costs nothing
+    when no readings arrived.
+    """
+
+    def __init__(self, loader: Callable[[str], Dict[str, np.ndarray]], k: int = DEFAULT_NEIGHBOURS):
+        self.loader = loader
+        self.k = k
+        self._indexes: Dict[str, CityAnalogIndex] = {}
+        self._lock = threading.Lock()
+
+    def similar(self, city: str, k: Optional[int] = None, hours_ahead: Optional[float] = None) -> List[Dict]:
+        """The k past hours most like the city's latest reading (see CityAnalogIndex.analogs)"""
+        with self._lock:
+            return self._synced(city).analogs(k or self.k, hours_ahead)
+
+    def predict(self, city: str, hours_ahead: float,
+                k: Optional[int] = None) -> Optional[Tuple[float, float, List[Dict]]]:
+        """Return (temperature, confidence, analogs) for `hours_ahead`, or None without enough analogs"""
+        with self._lock:
+            return self._synced(city).forecast(hours_ahead, k or self.k)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {city: {"rows": index.rows, "indexed": index._indexed, "rebuilds": index.rebuilds}
+                    for city, index in self._indexes.items()}
+
+    def _synced(self, city: str) -> CityAnalogIndex:
+        city = canonical_city(city)
+        index = self._indexes.setdefault(city, CityAnalogIndex())
+        index.sync(self.loader(city))
+        return index
@@ -0,0 +1,143 @@
+"""
+Anomaly Engine - Robust, vectorized anomaly scoring across every city at once
+"""
+import warnings
+from datetime import datetime
+from typing import List, Optional, Sequence
+import numpy as np
+from core.history_dataset import HistoryDataset
+from models.ml_models import MLDataPreprocessor, WeatherAnomaly
+
+
+METRICS = ("temperature", "humidity", "wind_speed", "pressure")
+METRIC_UNITS = {"temperature": "°C", "humidity": "%", "wind_speed": " m/s", "pressure": " hPa"}
+# Smallest spread assumed per metric, so flat histories don't flag tiny changes
+MIN_SCALE = {"temperature": 0.5, "humidity": 2.0, "wind_speed": 0.5, "pressure": 1.0}
+
+DEFAULT_WINDOW = 168       # readings per city kept in the (city x time) array
+DEFAULT_ROLLING = 24       # trailing readings behind each rolling median/MAD
+MIN_ROLLING = 5            # shortest rolling baseline used for short histories
+DEFAULT_THRESHOLD = 3.5    # robust z-score that counts as anomalous
+MIN_HOUR_SAMPLES = 3       # readings an hour of day needs for a seasonal profile
+MAD_TO_STD = 1.4826        # MAD of a normal distribution -> standard deviation
+
+
+class AnomalyEngine:
+    """Scores readings against robust baselines for all cities in one pass.
+
+    The latest `window` readings of every city are packed into a
+    (metric, city, time) array. Each reading's seasonal residual (its value
+    minus the city's median for that hour of day) is scored as a robust
+    z-score against the median/MAD of the residuals of the `rolling`
+    readings before it (fewer, down to MIN_ROLLING, for short histories).
+    Day/night swings and slow drifts therefore don't count as anomalies,
+    and single outliers barely move the baseline.
+    """
+
+    def __init__(self, window: int = DEFAULT_WINDOW, rolling: int = DEFAULT_ROLLING,
+                 threshold: float = DEFAULT_THRESHOLD):
+        self.window = window
+        self.rolling = rolling
+        self.threshold = threshold
+
+    def scan(self, dataset: HistoryDataset, cities: Optional[Sequence[str]] = None,
+             metrics: Sequence[str] = METRICS, recent: int = 1) -> List[WeatherAnomaly]:
+        """Return anomalies among each city's `recent` latest readings, most severe first"""
+        cities = list(cities) if cities is not None else dataset.cities()
+        if not cities:
+            return []
+        timestamps, values = self._pack(dataset, cities, metrics)
+        scores, expected = self.score(timestamps, values, metrics)
+
+        # Only the newest `recent` positions of each city matter "right now"
+        recent_scores = scores[:, :, -recent:]
+        rows = np.argwhere(np.nan_to_num(recent_scores) >= self.threshold)
+        anomalies = []
+        for metric_index, city_index, offset in rows:
+            position = values.shape[2] - recent + offset
+            actual = float(values[metric_index, city_index, position])
+            anomalies.append(self._anomaly(cities[city_index], metrics[metric_index],
+                                           int(timestamps[city_index, position]), actual,
+                                           float(expected[metric_index, city_index, position]),
+                                           float(recent_scores[metric_index, city_index, offset])))
+        anomalies.sort(key=lambda anomaly: anomaly.severity_score, reverse=True)
+        return anomalies
+
+    def score(self, timestamps: np.ndarray, values: np.ndarray, metrics: Sequence[str] = METRICS):
+        """Return (scores, expected) for a (metric, city, time) array; NaN marks no score.
+
+        `timestamps` is (city, time) epoch seconds, 0 where a city has no reading.
+        """
+        length = values.shape[2]
+        rolling = min(self.rolling, length // 2)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # all-NaN slices -> NaN
+
+            # Seasonal baseline: the city's median for each hour of day (overall
+            # median for hours with too few readings)
+            hours = np.full(timestamps.shape, -1, dtype=np.int64)
+            present = timestamps > 0
+            if present.any():
+                hours[present] = MLDataPreprocessor.time_columns(timestamps[present])["hour"]
+            one_hot = hours[:, :, None] == np.arange(24)                       # (city, time, hour)
+            by_hour = np.where(one_hot[None], values[..., None], np.nan)          # (metric, city, time, hour)
+            profile = np.nanmedian(by_hour, axis=2)                                # (metric, city, hour)
+            sparse = np.broadcast_to(one_hot.sum(axis=1) < MIN_HOUR_SAMPLES, profile.shape)
+            profile = np.where(sparse, np.nanmedian(values, axis=-1, keepdims=True), profile)
+            seasonal = np.take_along_axis(profile, np.broadcast_to(np.clip(hours, 0, 23)[None],
+                                                                   values.shape), axis=2)
+            residual = values - seasonal
+
+            # Rolling: median/MAD of the residuals strictly before each position
+            if rolling >= MIN_ROLLING:
+                windows = np.lib.stride_tricks.sliding_window_view(residual, rolling, axis=-1)[:, :, :-1]
+                center = np.full(values.shape, np.nan)
+                mad = np.full(values.shape, np.nan)
+                center[:, :, rolling:] = np.nanmedian(windows, axis=-1)
+                mad[:, :, rolling:] = np.nanmedian(np.abs(windows - center[:, :, rolling:, None]), axis=-1)
+            else:
+                # Too short for a rolling baseline: score against the whole window
+                center = np.nanmedian(residual, axis=-1, keepdims=True)
+                mad = np.nanmedian(np.abs(residual - center), axis=-1, keepdims=True)
+
+            scores = np.abs(residual - center) / self._scale(mad, metrics)
+        return scores, seasonal + center
+
+    @staticmethod
+    def _scale(mad: np.ndarray, metrics: Sequence[str]) -> np.ndarray:
+        floors = np.array([MIN_SCALE[name] for name in metrics])
+        return np.maximum(mad * MAD_TO_STD, floors.reshape((-1,) + (1,) * (mad.ndim - 1)))
+
+    def _pack(self, dataset: HistoryDataset, cities: List[str], metrics: Sequence[str]):
+        """(city, time) timestamps and (metric, city, time) values, right-aligned, NaN-padded"""
+        columns = [dataset.city(city, limit=self.window) for city in cities]
+        length = max([len(data["timestamp"]) for data in columns] + [1])
+        timestamps = np.zeros((len(cities), length), dtype=np.int64)
+        values = np.full((len(metrics), len(cities), length), np.nan)
+        for row, data in enumerate(columns):
+            size = len(data["timestamp"])
+            if not size:
+                continue
+            timestamps[row, length - size:] = data["timestamp"]
+            for index, metric in enumerate(metrics):
+                values[index, row, length - size:] = data[metric]
+        return timestamps, values
+
+    def _anomaly(self, city: str, metric: str, timestamp: int, actual: float, expected: float,
+                 score: float) -> WeatherAnomaly:
+        high = actual > expected
+        if metric == "temperature":
+            anomaly_type = "extreme_hot" if high else "extreme_cold"
+        else:
+            anomaly_type = f"{'high' if high else 'low'}_{metric}"
+        unit = METRIC_UNITS.get(metric, "")
+        return WeatherAnomaly(
+            city=city,
+            datetime=datetime.fromtimestamp(timestamp),
+            anomaly_type=anomaly_type,
+            severity_score=min(1.0, score / (2 * self.threshold)),
+            description=(f"{metric.replace('_', ' ').title()} {actual:g}{unit} is {score:.1f} robust "
+                         f"deviations from typical ({expected:.1f}{unit})"),
+            expected_value=expected,
+            actual_value=actual
+        )
@@ -0,0 +1,320 @@
+"""
+Backtest - Rolling-origin evaluation of temperature predictors over stored history
+
+Run from the project root, e.g.:
+    python -m services.backtest --predictors trend model --horizons 1 6 24 --workers 4
+"""
+import argparse
+import importlib
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from core.history_dataset import HistoryDataset
+from core.repository import open_repository
+from services.analog_index import CityAnalogIndex, outcome_indices
+from services.forecast_model import MIN_TRAINING_ROWS, RETRAIN_AFTER_ROWS, fit_temperature_model
+from services.ml_service import trend_forecast
+
+
+DEFAULT_HORIZONS = (1, 3, 6, 12, 24)
+DEFAULT_PREDICTORS = ("persistence", "trend", "model", "analog")
+MIN_HISTORY = 24             # readings before the first forecast origin
+DEFAULT_STEP = 6             # readings between forecast origins
+TARGET_TOLERANCE_HOURS = 1.0 # how far the scored reading may be from origin + horizon
+HIT_TOLERANCE = 2.0          # °C; a forecast this close counts as a hit for calibration
+CALIBRATION_BINS = 5
+REPORT_DIR = "data/backtests"
+
+_COLUMNS = ("timestamp", "temperature", "humidity", "wind_speed", "pressure")
+
+
+# Predictors: fit(history) is called once per forecast origin with the columns
+# up to and including it; predict(history, hours_ahead) returns
+# (temperature, confidence_score) like MLService.predict_temperature.
+
+class PersistencePredictor:
+    """Baseline: the latest reading, unchanged"""
+
+    def fit(self, history: Dict[str, np.ndarray]) -> None:
+        pass
+
+    def predict(self, history: Dict[str, np.ndarray], hours_ahead: float) -> Tuple[float, float]:
+        return float(history["temperature"][-1]), 0.5
+
+
+class TrendPredictor:
+    """MLService's trend heuristic over the last 5 readings"""
+
+    def fit(self, history: Dict[str, np.ndarray]) -> None:
+        pass
+
+    def predict(self, history: Dict[str, np.ndarray], hours_ahead: float) -> Tuple[float, float]:
+        return trend_forecast(history["temperature"][-5:], hours_ahead)
+
+
+class ModelPredictor:
+    """The per-city temperature model, retrained on the same schedule as the registry.
+
+    Falls back to the trend heuristic until the city has MIN_TRAINING_ROWS
+    readings, exactly like predict_temperature.
+    """
+
+    def __init__(self):
+        self.model = None
+
+    def fit(self, history: Dict[str, np.ndarray]) -> None:
+        rows = len(history["timestamp"])
+        needed = MIN_TRAINING_ROWS if self.model is None else self.model.rows + RETRAIN_AFTER_ROWS
+        if rows >= needed:
+            self.model = fit_temperature_model("backtest", history) or self.model
+
+    def predict(self, history: Dict[str, np.ndarray], hours_ahead: float) -> Tuple[float, float]:
+        if self.model is None:
+            return trend_forecast(history["temperature"][-5:], hours_ahead)
+        readings = [{name: history[name][i].item() for name in _COLUMNS}
+                    for i in range(max(0, len(history["timestamp"]) - 2), len(history["timestamp"]))]
+        previous = readings[0] if len(readings) > 1 else None
+        return self.model.predict(readings[-1], previous, hours_ahead), self.model.confidence
+
+
+class AnalogPredictor:
+    """What followed the most similar past hours (see services.analog_index), else the trend heuristic"""
+
+    def __init__(self):
+        self.index = CityAnalogIndex()
+
+    def fit(self, history: Dict[str, np.ndarray]) -> None:
+        self.index.sync(history)
+
+    def predict(self, history: Dict[str, np.ndarray], hours_ahead: float) -> Tuple[float, float]:
+        forecast = self.index.forecast(hours_ahead)
+        if forecast is None:
+            return trend_forecast(history["temperature"][-5:], hours_ahead)
+        return forecast[0], forecast[1]
+
+
+PREDICTORS = {"persistence": PersistencePredictor, "trend": TrendPredictor, "model": ModelPredictor,
+              "analog": AnalogPredictor}
+
+
+def resolve_predictor(spec: str):
+    """Return a predictor class by name, or by "package.module:ClassName" for new candidates"""
+    if spec in PREDICTORS:
+        return PREDICTORS[spec]
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown predictor: {spec} (expected one of {sorted(PREDICTORS)} or module:Class)")
+    return getattr(importlib.import_module(module_name), class_name)
+
+
+def backtest_city(city: str, columns: Dict[str, np.ndarray], predictors: Sequence[str],
+                  horizons: Sequence[float], min_history: int = MIN_HISTORY, step: int = DEFAULT_STEP,
+                  tolerance_hours: float = TARGET_TOLERANCE_HOURS) -> Dict[str, Dict[str, list]]:
+    """Replay one city's history; returns per-predictor lists of scored forecasts.
+
+    Each origin sees only readings up to and including itself. Runs in a
+    worker process, so everything in and out is plain data.
+    """
+    timestamps = columns["timestamp"]
+    origins = np.arange(min_history - 1, len(timestamps) - 1, step)
+    targets = {hours: outcome_indices(timestamps, origins, hours, tolerance_hours) for hours in horizons}
+    results = {}
+    for spec in predictors:
+        predictor = resolve_predictor(spec)()
+        rows = {"horizon": [], "predicted": [], "actual": [], "confidence": [], "latency_ns": []}
+        fit_ns = 0
+        for position, origin in enumerate(origins):
+            history = {name: columns[name][:origin + 1] for name in _COLUMNS}
+            started = time.perf_counter_ns()
+            predictor.fit(history)
+            fit_ns += time.perf_counter_ns() - started
+            for hours in horizons:
+                target = targets[hours][position]
+                if target < 0:
+                    continue
+                started = time.perf_counter_ns()
+                predicted, confidence = predictor.predict(history, hours)
+                rows["latency_ns"].append(time.perf_counter_ns() - started)
+                rows["horizon"].append(hours)
+                rows["predicted"].append(float(predicted))
+                rows["actual"].append(float(columns["temperature"][target]))
+                rows["confidence"].append(float(confidence))
+        rows["fit_seconds"] = fit_ns / 1e9
+        results[spec] = rows
+    return results
+
+
+def summarize(rows: Dict[str, np.ndarray], horizons: Sequence[float]) -> Dict:
+    """Accuracy per horizon and overall, confidence calibration and latency percentiles"""
+    errors = rows["predicted"] - rows["actual"]
+
+    def accuracy(mask) -> Dict:
+        if not mask.any():
+            return {"count": 0}
+        error = errors[mask]
+        return {"count": int(mask.sum()), "mae": float(np.mean(np.abs(error))),
+                "rmse": float(np.sqrt(np.mean(error ** 2))), "bias": float(np.mean(error))}
+
+    # Calibration: does a forecast with confidence c land within HIT_TOLERANCE c of the time?
+    hits = np.abs(errors) <= HIT_TOLERANCE
+    bins = np.clip((rows["confidence"] * CALIBRATION_BINS).astype(int), 0, CALIBRATION_BINS - 1)
+    calibration, gap = [], 0.0
+    for index in range(CALIBRATION_BINS):
+        mask = bins == index
+        if not mask.any():
+            continue
+        mean_confidence, hit_rate = float(rows["confidence"][mask].mean()), float(hits[mask].mean())
+        gap += mask.sum() * abs(mean_confidence - hit_rate)
+        calibration.append({"range": [index / CALIBRATION_BINS, (index + 1) / CALIBRATION_BINS],
+                            "count": int(mask.sum()), "mean_confidence": mean_confidence,
+                            "hit_rate": hit_rate, "mae": float(np.mean(np.abs(errors[mask])))})
+
+    latency_us = rows["latency_ns"] / 1000.0
+    return {
+        "overall": accuracy(np.ones(len(errors), dtype=bool)),
+        "by_horizon": {str(hours): accuracy(rows["horizon"] == hours) for hours in horizons},
+        "calibration": {"hit_tolerance": HIT_TOLERANCE, "bins": calibration,
+                        "expected_calibration_error": float(gap / len(errors)) if len(errors) else None},
+        "latency_us": ({"p50": float(np.percentile(latency_us, 50)), "p90": float(np.percentile(latency_us, 90)),
+                        "p99": float(np.percentile(latency_us, 99)), "max": float(latency_us.max()),
+                        "mean": float(latency_us.mean())} if len(latency_us) else {}),
+        "fit_seconds": float(rows["fit_seconds"]),
+    }
+
+
+def run_backtest(dataset: HistoryDataset, predictors: Sequence[str] = DEFAULT_PREDICTORS,
+                 horizons: Sequence[float] = DEFAULT_HORIZONS, cities: Optional[Sequence[str]] = None,
+                 min_history: int = MIN_HISTORY, step: int = DEFAULT_STEP,
+                 tolerance_hours: float = TARGET_TOLERANCE_HOURS, workers: Optional[int] = None) -> Dict:
+    """Backtest predictors on every city (one process-pool task per city) and build a report"""
+    for spec in predictors:
+        resolve_predictor(spec)  # fail fast, before any worker starts
+    cities = [city for city in (cities or dataset.cities())
+              if len(dataset.city(city)["timestamp"]) > min_history]
+    workers = workers or os.cpu_count() or 1
+    arguments = [(city, {name: dataset.city(city)[name] for name in _COLUMNS}, list(predictors),
+                  list(horizons), min_history, step, tolerance_hours) for city in cities]
+
+    started = time.perf_counter()
+    if workers == 1 or len(cities) < 2:
+        city_results = [backtest_city(*args) for args in arguments]
+    else:
+        # spawn: workers shouldn't inherit the parent's store/writer threads
+        with ProcessPoolExecutor(max_workers=min(workers, len(cities)),
+                                 mp_context=multiprocessing.get_context("spawn")) as pool:
+            city_results = list(pool.map(backtest_city, *zip(*arguments)))
+    elapsed = time.perf_counter() - started
+
+    report = {
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        "config": {"predictors": list(predictors), "horizons": list(horizons), "min_history": min_history,
+                   "step": step, "tolerance_hours": tolerance_hours, "workers": workers},
+        "cities": cities,
+        "elapsed_seconds": elapsed,
+        "predictors": {},
+    }
+    for spec in predictors:
+        merged = {name: np.concatenate([np.asarray(result[spec][name], dtype=np.float64)
+                                        for result in city_results]) if city_results else np.empty(0)
+                  for name in ("horizon", "predicted", "actual", "confidence", "latency_ns")}
+        merged["fit_seconds"] = sum(result[spec]["fit_seconds"] for result in city_results)
+        summary = summarize(merged, horizons)
+        summary["by_city"] = {city: float(np.mean(np.abs(np.subtract(result[spec]["predicted"],
+                                                                     result[spec]["actual"]))))
+                              for city, result in zip(cities, city_results) if result[spec]["predicted"]}
+        report["predictors"][spec] = summary
+    return report
+
+
+def write_report(report: Dict, directory: str = REPORT_DIR) -> Path:
+    """Save a report as timestamped JSON and return its path"""
+    path = Path(directory)
+    path.mkdir(parents=True, exist_ok=True)
+    path = path / f"backtest_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    return path
+
+
+def compare_reports(previous: Dict, current: Dict) -> Dict[str, Dict[str, Optional[float]]]:
+    """Change in MAE (current - previous) per predictor and horizon, plus p50 latency"""
+    changes = {}
+    for spec, summary in current["predictors"].items():
+        before = previous.get("predictors", {}).get(spec)
+        if before is None:
+            continue
+        deltas = {}
+        for key, stats in [("overall", summary["overall"])] + list(summary["by_horizon"].items()):
+            old = before["overall"] if key == "overall" else before["by_horizon"].get(key)
+            if old and "mae" in old and "mae" in stats:
+                deltas[f"mae_{key}"] = stats["mae"] - old["mae"]
+        if summary["latency_us"] and before.get("latency_us"):
+            deltas["latency_p50_us"] = summary["latency_us"]["p50"] - before["latency_us"]["p50"]
+        changes[spec] = deltas
+    return changes
+
+
+def format_report(report: Dict, changes: Optional[Dict] = None) -> str:
+    """Human-readable summary table of a report (and its changes vs. a previous run)"""
+    horizons = [str(hours) for hours in report["config"]["horizons"]]
+    lines = [f"Backtest of {len(report['cities'])} cities in {report['elapsed_seconds']:.1f}s",
+             f"{'predictor':<14}{'MAE':>7}{'RMSE':>7}" + "".join(f"{'MAE@' + h + 'h':>9}" for h in horizons)
+             + f"{'ECE':>7}{'p50 µs':>9}{'p99 µs':>9}"]
+    for spec, summary in report["predictors"].items():
+        overall = summary["overall"]
+        if not overall["count"]:
+            lines.append(f"{spec:<14} no scored forecasts")
+            continue
+        by_horizon = "".join(f"{summary['by_horizon'][h].get('mae', float('nan')):>9.2f}" for h in horizons)
+        lines.append(f"{spec:<14}{overall['mae']:>7.2f}{overall['rmse']:>7.2f}{by_horizon}"
+                     f"{summary['calibration']['expected_calibration_error']:>7.2f}"
+                     f"{summary['latency_us']['p50']:>9.1f}{summary['latency_us']['p99']:>9.1f}")
+    for spec, deltas in (changes or {}).items():
+        lines.append(f"{spec:<14}vs previous: " + ", ".join(f"{key} {value:+.2f}" for key, value in deltas.items()))
+    return "\n".join(lines)
+
+
+def load_dataset(kind: str = "sqlite", path: Optional[str] = None) -> HistoryDataset:
+    repository = open_repository(kind, path)
+    dataset = HistoryDataset()
+    for chunk in repository.iter_chunks():
+        dataset.extend(chunk)
+    return dataset
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Rolling-origin backtest of temperature predictors")
+    parser.add_argument("--source", default="sqlite", choices=["sqlite", "csv", "columnar"])
+    parser.add_argument("--path", help="store path (defaults to the app's)")
+    parser.add_argument("--predictors", nargs="+", default=list(DEFAULT_PREDICTORS),
+                        help=f"names ({', '.join(PREDICTORS)}) or module:Class")
+    parser.add_argument("--horizons", nargs="+", type=float, default=list(DEFAULT_HORIZONS))
+    parser.add_argument("--cities", nargs="+")
+    parser.add_argument("--min-history", type=int, default=MIN_HISTORY)
+    parser.add_argument("--step", type=int, default=DEFAULT_STEP)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--output", default=REPORT_DIR, help="directory for the JSON report")
+    parser.add_argument("--compare", help="previous report to compare against")
+    args = parser.parse_args(argv)
+
+    horizons = [int(hours) if float(hours).is_integer() else hours for hours in args.horizons]
+    report = run_backtest(load_dataset(args.source, args.path), args.predictors, horizons, args.cities,
+                          args.min_history, args.step, workers=args.workers)
+    changes = None
+    if args.compare:
+        with open(args.compare) as f:
+            changes = compare_reports(json.load(f), report)
+        report["compared_to"] = {"path": args.compare, "changes": changes}
+    path = write_report(report, args.output)
+    print(format_report(report, changes))
+    print(f"Report written to {path}")
+
+
+if __name__ == "__main__":
+    main()
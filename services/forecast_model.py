@@ -0,0 +1,311 @@
+"""
+Forecast Model - Trained, persisted per-city temperature regressors
+"""
+import pickle
+import queue
+import threading
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+from core.ingest import canonical_city, city_slug, legacy_city_slug
+from models.ml_models import MLDataPreprocessor
+
+try:
+    from sklearn.linear_model import Ridge
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+
+# MLDataPreprocessor features used as model inputs, in order
+BASE_FEATURES = ["temp_norm", "humidity_norm", "wind_norm", "pressure_norm",
+                 "hour_sin", "hour_cos", "dow_sin", "dow_cos", "month_sin", "month_cos"]
+FEATURES = BASE_FEATURES + ["horizon", "target_hour_sin", "target_hour_cos", "recent_change"]
+_BASE_COLUMNS = [MLDataPreprocessor.FEATURE_NAMES.index(name) for name in BASE_FEATURES]
+
+MODEL_VERSION_FORMAT = "v{:04d}.pkl"
+MIN_TRAINING_ROWS = 48       # readings a city needs before a model is trained
+RETRAIN_AFTER_ROWS = 24      # new readings that trigger a background retrain
+MAX_HORIZON_HOURS = 72
+PAIRS_PER_READING = 12       # later readings used as targets for each reading
+KEEP_VERSIONS = 3
+
+
+def _base_matrix(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """BASE_FEATURES for every row of timestamp/temperature/humidity/wind/pressure columns"""
+    matrix = MLDataPreprocessor.extract_feature_matrix(
+        {name: columns[name] for name in ("timestamp", "temperature", "humidity", "wind_speed", "pressure")},
+        dtype=np.float64)
+    return matrix[:, _BASE_COLUMNS]
+
+
+def _utc_offset(timestamp) -> float:
+    return datetime.fromtimestamp(int(timestamp)).astimezone().utcoffset().total_seconds()
+
+
+def _recent_changes(temperatures: np.ndarray, timestamps: np.ndarray) -> np.ndarray:
+    """Temperature change per hour since the previous reading (0 for the first)"""
+    changes = np.zeros(len(temperatures))
+    if len(temperatures) > 1:
+        hours = np.maximum(np.diff(timestamps) / 3600.0, 1.0)
+        changes[1:] = np.clip(np.diff(temperatures) / hours, -5, 5)
+    return changes
+
+
+def feature_grid(latest: List[Dict[str, float]], previous: List[Optional[Dict[str, float]]],
+                 horizons: np.ndarray) -> np.ndarray:
+    """Feature rows for every (reading, horizon) pair, shape (readings, horizons, features).
+
+    Per-reading columns come from one batched extraction; the horizon and
+    target-hour columns are broadcast across all horizons at once.
+    """
+    horizons = np.asarray(horizons, dtype=np.float64)
+    base = _base_matrix({name: np.array([row[name] for row in latest], dtype=np.float64)
+                         for name in ("timestamp", "temperature", "humidity", "wind_speed", "pressure")})
+    changes = np.zeros(len(latest))
+    for i, (row, before) in enumerate(zip(latest, previous)):
+        if before is not None:
+            hours = max((row["timestamp"] - before["timestamp"]) / 3600.0, 1.0)
+            changes[i] = np.clip((row["temperature"] - before["temperature"]) / hours, -5, 5)
+
+    # Local clock hour of each target time, using each reading's UTC offset
+    local = np.array([row["timestamp"] + _utc_offset(row["timestamp"]) for row in latest], dtype=np.float64)
+    target_hours = np.floor((local[:, None] + horizons[None, :] * 3600) / 3600) % 24
+    grid = np.empty((len(latest), len(horizons), len(FEATURES)))
+    grid[:, :, :len(BASE_FEATURES)] = base[:, None, :]
+    grid[:, :, len(BASE_FEATURES)] = horizons[None, :] / 24
+    grid[:, :, len(BASE_FEATURES) + 1] = np.sin(2 * np.pi * target_hours / 24)
+    grid[:, :, len(BASE_FEATURES) + 2] = np.cos(2 * np.pi * target_hours / 24)
+    grid[:, :, len(BASE_FEATURES) + 3] = changes[:, None]
+    return np.nan_to_num(grid)
+
+
+@lru_cache(maxsize=256)
+def _feature_row(latest: tuple, previous: Optional[tuple], hours_ahead: float) -> np.ndarray:
+    """One feature row, memoized: the latest reading changes far less often than it is queried"""
+    return feature_grid([dict(latest)], [dict(previous) if previous else None], [hours_ahead])[0, 0]
+
+
+def build_training_set(columns: Dict[str, np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+    """Pair each reading with the next PAIRS_PER_READING (up to MAX_HORIZON_HOURS ahead).
+
+    Returns (features, target) where the target is the temperature change
+    between the reading and the later one. Rows are ordered by reading, then
+    by how far ahead the later reading is.
+    """
+    timestamps = np.asarray(columns["timestamp"], dtype=np.int64)
+    temperatures = np.asarray(columns["temperature"], dtype=np.float64)
+    count = len(timestamps)
+    base = _base_matrix(columns)
+    changes = _recent_changes(temperatures, timestamps)
+
+    # (reading, offset) index pairs, flattened reading-major
+    first = np.repeat(np.arange(count), PAIRS_PER_READING)
+    later = first + np.tile(np.arange(1, PAIRS_PER_READING + 1), count)
+    keep = later < count
+    first, later = first[keep], later[keep]
+    horizon = (timestamps[later] - timestamps[first]) / 3600.0
+    keep = (horizon > 0) & (horizon <= MAX_HORIZON_HOURS)
+    first, later, horizon = first[keep], later[keep], horizon[keep]
+
+    # The target time's hour encoding is the later reading's own hour encoding
+    hour_columns = [BASE_FEATURES.index("hour_sin"), BASE_FEATURES.index("hour_cos")]
+    features = np.column_stack([base[first], horizon / 24, base[later][:, hour_columns], changes[first]])
+    return np.nan_to_num(features).reshape(-1, len(FEATURES)), temperatures[later] - temperatures[first]
+
+
+class TemperatureModel:
+    """One trained model version: the regressor plus its training metadata"""
+
+    def __init__(self, city: str, version: int, estimator, rows: int, mae: float, trained_at: str):
+        self.city = city
+        self.version = version
+        self.estimator = estimator
+        self.rows = rows
+        self.mae = mae
+        self.trained_at = trained_at
+        # Linear model: predictions are a dot product, no estimator call needed
+        self._coef = np.asarray(estimator.coef_, dtype=np.float64)
+        self._intercept = float(estimator.intercept_)
+
+    @property
+    def confidence(self) -> float:
+        return max(0.4, min(0.95, 1 / (1 + self.mae / 3)))
+
+    def predict(self, latest: Dict[str, float], previous: Optional[Dict[str, float]],
+                hours_ahead: float) -> float:
+        """Predict the temperature `hours_ahead` after the latest reading"""
+        row = _feature_row(tuple(latest.items()), tuple(previous.items()) if previous else None,
+                           float(hours_ahead))
+        return latest["temperature"] + float(row @ self._coef) + self._intercept
+
+
+def fit_temperature_model(city: str, columns: Dict[str, np.ndarray], version: int = 1) -> Optional[TemperatureModel]:
+    """Fit a model on a city's columns; None without scikit-learn or enough pairs"""
+    if not SKLEARN_AVAILABLE:
+        return None
+    features, target = build_training_set(columns)
+    if len(target) < 2:
+        return None
+
+    # Hold out the most recent fifth to measure error, then refit on everything
+    split = int(len(target) * 0.8)
+    estimator = Ridge(alpha=1.0).fit(features[:split], target[:split])
+    mae = float(np.mean(np.abs(estimator.predict(features[split:]) - target[split:])))
+    estimator = Ridge(alpha=1.0).fit(features, target)
+    return TemperatureModel(city, version, estimator, len(columns["timestamp"]), mae,
+                            datetime.now().isoformat(timespec="seconds"))
+
+
+class TemperatureModelRegistry:
+    """Versioned per-city models under `root`, loaded lazily and retrained in the background.
+
+    Artifacts are pickles at <root>/temperature/<city slug>/vNNNN.pkl; the
+    newest version is loaded on first use and kept in memory. `maybe_retrain`
+    queues a city for the worker thread once it has MIN_TRAINING_ROWS readings
+    (first model) or RETRAIN_AFTER_ROWS more than the current model saw, so
+    no training ever happens on the caller's thread. `loader(city)` returns
+    the city's columns (see core.history_dataset.HistoryDataset.city).
+    """
+
+    def __init__(self, loader: Callable[[str], Dict[str, np.ndarray]], root: str = "data/models",
+                 min_rows: int = MIN_TRAINING_ROWS, retrain_after: int = RETRAIN_AFTER_ROWS):
+        self.loader = loader
+        self.root = Path(root) / "temperature"
+        self.min_rows = min_rows
+        self.retrain_after = retrain_after
+        self._models: Dict[str, Optional[TemperatureModel]] = {}
+        self._lock = threading.Lock()
+        self._pending = set()
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        self._worker = None
+        self.trainings = 0
+        self.errors = 0
+
+    def get(self, city: str) -> Optional[TemperatureModel]:
+        """Return the newest model for a city, loading it from disk on first use"""
+        city = canonical_city(city)
+        with self._lock:
+            if city in self._models:
+                return self._models[city]
+        model = self._load(city)
+        with self._lock:
+            return self._models.setdefault(city, model)
+
+    def maybe_retrain(self, city: str, rows: int) -> bool:
+        """Queue a background (re)training if `rows` readings warrant one"""
+        if not SKLEARN_AVAILABLE:
+            return False
+        model = self.get(city)
+        needed = self.min_rows if model is None else model.rows + self.retrain_after
+        if rows < needed:
+            return False
+        city = canonical_city(city)
+        with self._lock:
+            if city in self._pending:
+                return False
+            self._pending.add(city)
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="model-trainer", daemon=True)
+                self._worker.start()
+        self._queue.put(city)
+        return True
+
+    def predict_many(self, models: List[Optional[TemperatureModel]], latest: List[Dict[str, float]],
+                     previous: List[Optional[Dict[str, float]]],
+                     horizons: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Predict every (model, horizon) pair with one vectorized product.
+
+        Returns (temperatures, confidence), each shaped (len(models), len(horizons));
+        rows whose model is None are NaN.
+        """
+        trained = np.array([model is not None for model in models], dtype=bool)
+        temperatures = np.full((len(models), len(horizons)), np.nan)
+        confidence = np.full((len(models), len(horizons)), np.nan)
+        if not trained.any():
+            return temperatures, confidence
+        rows = np.flatnonzero(trained)
+        coef = np.array([models[i]._coef for i in rows])
+        intercept = np.array([models[i]._intercept for i in rows])
+        current = np.array([latest[i]["temperature"] for i in rows], dtype=np.float64)
+        grid = feature_grid([latest[i] for i in rows], [previous[i] for i in rows], np.asarray(horizons))
+        temperatures[rows] = current[:, None] + np.einsum("chf,cf->ch", grid, coef) + intercept[:, None]
+        confidence[rows] = np.array([models[i].confidence for i in rows])[:, None]
+        return temperatures, confidence
+
+    def wait(self) -> None:
+        """Block until every queued training has finished"""
+        self._queue.join()
+
+    def train(self, city: str) -> Optional[TemperatureModel]:
+        """Train, save and install a new model version for a city"""
+        city = canonical_city(city)
+        columns = self.loader(city)
+        if len(columns["timestamp"]) < self.min_rows:
+            return None
+        current = self.get(city)
+        model = fit_temperature_model(city, columns, (current.version if current else 0) + 1)
+        if model is None:
+            return None
+        self._save(model)
+        with self._lock:
+            self._models[city] = model
+        self.trainings += 1
+        return model
+
+    def stats(self) -> Dict:
+        with self._lock:
+            loaded = {city: model.version for city, model in self._models.items() if model}
+            return {"loaded": loaded, "pending": len(self._pending),
+                    "trainings": self.trainings, "errors": self.errors}
+
+    def _run(self) -> None:
+        while True:
+            city = self._queue.get()
+            try:
+                self.train(city)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error training temperature model for {city}: {e}")
+            finally:
+                with self._lock:
+                    self._pending.discard(city)
+                self._queue.task_done()
+
+    def _versions(self, city: str, directory: Optional[Path] = None) -> List[Path]:
+        directory = directory or self.root / city_slug(city)
+        return sorted(directory.glob("v*.pkl")) if directory.exists() else []
+
+    def _load(self, city: str) -> Optional[TemperatureModel]:
+        # Models saved before city_slug sit under the old, lossy name, which
+        # other cities may share; the artifact's own city decides
+        paths = (list(reversed(self._versions(city)))
+                 or list(reversed(self._versions(city, self.root / legacy_city_slug(city)))))
+        for path in paths:
+            try:
+                with open(path, "rb") as f:
+                    artifact = pickle.load(f)
+                if artifact.get("features") != FEATURES:
+                    continue  # trained on a different feature layout
+                if canonical_city(artifact.get("city") or "") != city:
+                    continue  # another city's model
+                return TemperatureModel(artifact["city"], artifact["version"], artifact["estimator"],
+                                        artifact["rows"], artifact["mae"], artifact["trained_at"])
+            except Exception as e:
+                print(f"Error loading temperature model {path}: {e}")
+        return None
+
+    def _save(self, model: TemperatureModel) -> None:
+        directory = self.root / city_slug(model.city)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / MODEL_VERSION_FORMAT.format(model.version)
+        temp_path = path.with_suffix(".tmp")
+        with open(temp_path, "wb") as f:
+            pickle.dump({"city": model.city, "version": model.version, "features": FEATURES,
+                         "estimator": model.estimator, "rows": model.rows, "mae": model.mae,
+                         "trained_at": model.trained_at}, f)
+        temp_path.replace(path)
+        for old in self._versions(model.city)[:-KEEP_VERSIONS]:
+            old.unlink()
@@ -2,9 +2,12 @@
 Journal Service - Handles weather journal functionality
 """
 import os
-import csv
 from datetime import datetime
 
+from core.export import chunked, export_chunks
+from core.observation_writer import BufferedWriter
+from core.partitioned_log import PartitionedLog
+
 
 class JournalService:
     """Service for weather journal entries"""
@@ -12,15 +15,24 @@ class JournalService:
     def __init__(self, log_file="data/journal_log.csv"):
         self.log_file = log_file
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        # Monthly partitions; older months are gzipped under journal_log.partitions/
+        self.log = PartitionedLog(log_file, ["DateTime", "Entry", "Mood"])
+        self.writer = BufferedWriter(self.log.write, name="journal-writer")
 
     def save_entry(self, text, mood):
-        """Save a journal entry"""
-        file_exists = os.path.isfile(self.log_file)
-        with open(self.log_file, "a", newline="") as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow(["DateTime", "Entry", "Mood"])
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
-                text, mood
-            ])
+        """Queue a journal entry for the journal log"""
+        self.writer.submit([
+            datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
+            text, mood
+        ])
+
+    def export_entries(self, path=None, start=None, end=None):
+        """Stream journal entries to CSV/JSONL and return a summary"""
+        self.writer.flush()
+        path = path or os.path.join("data", "exports",
+                                    f"journal_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+        written = export_chunks(chunked(self.log.read_range(start, end)), path,
+                                columns=self.log.header)
+        if not written:
+            return "📔 No journal entries to export."
+        return f"📤 Exported {written} journal entries to {path}"
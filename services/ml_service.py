@@ -2,82 +2,161 @@
 ML Service - Handles machine learning predictions and analysis
 """
 import os
-import csv
+import threading
 import numpy as np
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
+from core.condition_index import condition_class
+from core.history_dataset import HistoryDataset
+from core.repository import CsvBackend, ObservationRepository
 from models.ml_models import (
     MLEnhancedWeatherData, WeatherPrediction, WeatherPattern, 
     WeatherAnomaly, PersonalizedRecommendation, WeatherInsights,
-    MLDataPreprocessor
+    MLDataPreprocessor, PredictionGrid
 )
+from services.analog_index import AnalogIndex
+from services.anomaly_engine import AnomalyEngine
+from services.forecast_model import TemperatureModelRegistry
+
+
+def trend_forecast(recent_temps, hours_ahead):
+    """Trend heuristic: mean of the recent readings plus their average step per day ahead.
+    
+    `hours_ahead` may be a number or an array of horizons. Returns
+    (predicted temperature(s), confidence), confidence from the readings' spread.
+    """
+    recent_temps = np.asarray(recent_temps, dtype=np.float64)
+    temp_trend = np.mean(np.diff(recent_temps)) if len(recent_temps) > 1 else 0
+    predicted = np.mean(recent_temps) + temp_trend * (np.asarray(hours_ahead, dtype=np.float64) / 24)
+    
+    # Calculate confidence based on data consistency
+    temp_variance = np.var(recent_temps) if len(recent_temps) > 1 else 10
+    confidence = max(0.4, min(0.9, 1 / (1 + temp_variance / 10)))
+    return (predicted.item() if np.ndim(predicted) == 0 else predicted), confidence
 
 
 class MLService:
     """Machine Learning service for weather predictions and insights"""
     
-    def __init__(self, log_file="data/weather_log.csv"):
+    def __init__(self, log_file="data/weather_log.csv", repository=None, history_store=None,
+                 condition_index=None, running_stats=None, model_dir="data/models", regime_model=None):
         self.log_file = log_file
+        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+        # core.repository.ObservationRepository; a CSV-backed one when none is shared
+        self.repository = repository or ObservationRepository(CsvBackend(log_file), name="ml-log-writer")
+        # Optional core.columnar_store.ColumnarHistoryStore for numeric scans
+        self.history_store = history_store
+        # Optional core.condition_index.ConditionIndex for condition/city/hour queries
+        self.condition_index = condition_index
+        # Optional core.running_stats.RunningStats kept current at ingest
+        self.running_stats = running_stats
+        # Optional services.regime_model.RegimeModel with per-observation regime assignments
+        self.regime_model = regime_model
         self.preprocessor = MLDataPreprocessor()
-        self._ensure_data_dir()
+        
+        # History parsed once into per-city arrays; extended by write notifications
+        # and reloaded when the backing log changes outside this process
+        self._dataset = None
+        self._dataset_version = None
+        self._dataset_writes = 0  # batches seen by the listener, so reloads can tell they raced one
+        self._dataset_lock = threading.Lock()
+        self.repository.add_listener(self._on_history_written)
+        
+        # Per-city temperature models: loaded on first use, retrained off the request path
+        self.models = TemperatureModelRegistry(lambda city: self.dataset().city(city), root=model_dir)
+        # Robust rolling/seasonal anomaly scoring over every city at once
+        self.anomaly_engine = AnomalyEngine()
+        # Per-city nearest-neighbour index of past states ("similar hours")
+        self.analogs = AnalogIndex(lambda city: self.dataset().city(city))
     
-    def _ensure_data_dir(self):
-        """Ensure data directory exists"""
-        os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
+    def dataset(self) -> HistoryDataset:
+        """Return the shared history dataset, reloading it only when it is stale"""
+        for _ in range(3):
+            self.repository.flush()
+            version = self.repository.source_version()
+            with self._dataset_lock:
+                if self._dataset is not None and version == self._dataset_version:
+                    return self._dataset
+                writes = self._dataset_writes
+            
+            # Load outside the lock: reads flush the writer, whose listener takes the lock
+            dataset = HistoryDataset()
+            try:
+                for chunk in self.repository.iter_chunks():
+                    dataset.extend(chunk)
+            except Exception as e:
+                print(f"Error loading historical data: {e}")
+            with self._dataset_lock:
+                # A batch that landed mid-load may be missing from it; only keep a clean load
+                if self._dataset_writes == writes:
+                    self._dataset, self._dataset_version = dataset, version
+                    return dataset
+        # Still racing writers: serve this load, but keep nothing cached so the next call reloads
+        with self._dataset_lock:
+            self._dataset = None
+        return dataset
     
-    def load_historical_data(self, limit: int = 100) -> List[Dict]:
-        """Load historical weather data from CSV"""
+    def _on_history_written(self, batch) -> None:
+        """Repository listener: append new observations, or drop the cache on a reset"""
+        with self._dataset_lock:
+            self._dataset_writes += 1
+            if self._dataset is None:
+                return
+            if batch is None:
+                self._dataset = None
+                return
+            self._dataset.extend(batch)
+            # Our own write moved the log's mtime/size; that is not an outside change
+            self._dataset_version = self.repository.source_version()
+            dataset = self._dataset
+        
+        # Enough new readings queue a background retrain (never trained here)
+        for city in {record.get("city") for record in batch if record.get("city")}:
+            self.models.maybe_retrain(city, len(dataset.city(city)["timestamp"]))
+    
+    def load_historical_data(self, limit: int = 100, city: Optional[str] = None) -> List[Dict]:
+        """Load the last `limit` records (optionally for one city) from the repository"""
         try:
-            if not os.path.exists(self.log_file):
-                return []
-            
-            with open(self.log_file, "r") as file:
-                reader = list(csv.DictReader(file))
-                return reader[-limit:] if reader else []
+            return self.repository.latest(city, limit=limit)
         except Exception as e:
             print(f"Error loading historical data: {e}")
             return []
     
+    def _city_temperatures(self, city: str, limit: int = 50) -> List[float]:
+        """Return the last `limit` temperatures recorded for a city, oldest first"""
+        if self.history_store is not None:
+            self.repository.flush()
+            temps = self.history_store.latest(city, limit, columns=["temperature"])["temperature"]
+            # float32 columns; round away the representation noise
+            return [round(temp, 2) for temp in temps.tolist()]
+
+        return self.dataset().city(city, limit)["temperature"].tolist()
+    
     def predict_temperature(self, city: str, hours_ahead: int = 24) -> WeatherPrediction:
-        """Predict temperature using simple trend analysis"""
-        historical_data = self.load_historical_data(limit=50)
-        
-        if len(historical_data) < 3:
-            # Not enough data for prediction
-            return WeatherPrediction(
-                city=city,
-                predicted_temperature=20.0,
-                confidence_score=0.3,
-                prediction_time=datetime.now() + timedelta(hours=hours_ahead),
-                trend_direction="unknown",
-                prediction_horizon_hours=hours_ahead
-            )
+        """Predict temperature with the city's trained model, else simple trend analysis"""
+        prediction = self._model_prediction(city, hours_ahead)
+        if prediction is not None:
+            return prediction
         
-        # Extract temperatures for the city
-        city_temps = []
-        for record in historical_data:
-            if record.get("City", "").lower() == city.lower():
-                try:
-                    temp = float(record.get("Temperature", 0))
-                    city_temps.append(temp)
-                except (ValueError, TypeError):
-                    continue
+        city_temps = self._city_temperatures(city, limit=50)
         
         if len(city_temps) < 2:
+            recent_temps = self.dataset().recent(10)["temperature"]
+            if len(recent_temps) < 3:
+                # Not enough data for prediction
+                return WeatherPrediction(
+                    city=city,
+                    predicted_temperature=20.0,
+                    confidence_score=0.3,
+                    prediction_time=datetime.now() + timedelta(hours=hours_ahead),
+                    trend_direction="unknown",
+                    prediction_horizon_hours=hours_ahead
+                )
             # Use global average if no city-specific data
-            city_temps = [float(record.get("Temperature", 20)) for record in historical_data[-10:]]
-        
-        # Simple trend-based prediction
-        recent_temps = city_temps[-5:]  # Last 5 readings
-        avg_temp = np.mean(recent_temps)
-        temp_trend = np.mean(np.diff(recent_temps)) if len(recent_temps) > 1 else 0
+            city_temps = recent_temps.tolist()
         
-        # Predict based on trend
-        predicted_temp = avg_temp + (temp_trend * (hours_ahead / 24))
-        
-        # Calculate confidence based on data consistency
-        temp_variance = np.var(recent_temps) if len(recent_temps) > 1 else 10
-        confidence = max(0.4, min(0.9, 1 / (1 + temp_variance / 10)))
+        # Simple trend-based prediction from the last 5 readings
+        predicted_temp, confidence = trend_forecast(city_temps[-5:], hours_ahead)
         
         return WeatherPrediction(
             city=city,
@@ -88,35 +167,149 @@ class MLService:
             prediction_horizon_hours=hours_ahead
         )
     
+    def predict_many(self, cities: List[str], horizons: List[int] = (6, 12, 24, 48)) -> PredictionGrid:
+        """Predict every city at every horizon in one vectorized pass.
+        
+        Cities with a trained model share one feature grid and one batched
+        model product; the rest use the same trend heuristic as
+        predict_temperature, computed for all horizons at once.
+        """
+        horizons = list(horizons)
+        dataset = self.dataset()
+        hours = np.asarray(horizons, dtype=np.float64)
+        columns = ("timestamp", "temperature", "humidity", "wind_speed", "pressure")
+        
+        models, latest, previous = [], [], []
+        current = np.full(len(cities), np.nan)
+        temperatures = np.full((len(cities), len(horizons)), np.nan)
+        confidence = np.full((len(cities), len(horizons)), np.nan)
+        global_temps = None
+        for i, city in enumerate(cities):
+            city_data = dataset.city(city, limit=5)
+            count = len(city_data["timestamp"])
+            if count:
+                current[i] = city_data["temperature"][-1]
+                self.models.maybe_retrain(city, len(dataset.city(city)["timestamp"]))
+            model = self.models.get(city) if count else None
+            models.append(model)
+            readings = [{name: city_data[name][j].item() for name in columns}
+                        for j in range(max(0, count - 2), count)]
+            latest.append(readings[-1] if readings else None)
+            previous.append(readings[0] if len(readings) > 1 else None)
+            if model is not None:
+                continue
+            
+            # Trend heuristic (see predict_temperature) across every horizon
+            recent_temps = city_data["temperature"]
+            if count < 2:
+                if global_temps is None:
+                    global_temps = dataset.recent(10)["temperature"]
+                if len(global_temps) < 3:
+                    temperatures[i], confidence[i] = 20.0, 0.3
+                    continue
+                recent_temps = global_temps[-5:]
+            predicted, confidence[i] = trend_forecast(recent_temps, hours)
+            temperatures[i] = np.round(predicted, 1)
+        
+        trained = [i for i, model in enumerate(models) if model is not None]
+        if trained:
+            predicted, model_confidence = self.models.predict_many(
+                [models[i] for i in trained], [latest[i] for i in trained],
+                [previous[i] for i in trained], horizons)
+            temperatures[trained] = np.round(predicted, 1)
+            confidence[trained] = model_confidence
+        
+        return PredictionGrid(
+            cities=list(cities),
+            horizons=horizons,
+            temperatures=temperatures,
+            confidence=confidence,
+            current=current,
+            model_based=[model is not None for model in models],
+            generated_at=datetime.now()
+        )
+    
+    def predict_temperature_analog(self, city: str, hours_ahead: int = 24) -> WeatherPrediction:
+        """Predict from what followed the city's most similar past hours, else predict_temperature"""
+        forecast = self.analogs.predict(city, hours_ahead)
+        if forecast is None:
+            return self.predict_temperature(city, hours_ahead)
+        predicted, confidence, _ = forecast
+        change = predicted - self.dataset().city(city, limit=1)["temperature"][-1]
+        
+        return WeatherPrediction(
+            city=city,
+            predicted_temperature=round(predicted, 1),
+            confidence_score=confidence,
+            prediction_time=datetime.now() + timedelta(hours=hours_ahead),
+            trend_direction="increasing" if change > 1 else "decreasing" if change < -1 else "stable",
+            prediction_horizon_hours=hours_ahead
+        )
+    
+    def find_similar_conditions(self, city: str, k: int = 5, hours_ahead: Optional[int] = 6) -> List[Dict]:
+        """The k past hours most like the city's current reading, with what followed `hours_ahead` later"""
+        return self.analogs.similar(city, k, hours_ahead)
+    
+    def _model_prediction(self, city: str, hours_ahead: int) -> Optional[WeatherPrediction]:
+        """Predict from the latest reading with the trained model, if one exists yet"""
+        city_data = self.dataset().city(city)
+        rows = len(city_data["timestamp"])
+        if not rows:
+            return None
+        self.models.maybe_retrain(city, rows)
+        model = self.models.get(city)
+        if model is None:
+            return None
+        
+        readings = [{name: city_data[name][i].item() for name in
+                     ("timestamp", "temperature", "humidity", "wind_speed", "pressure")}
+                    for i in range(max(0, rows - 2), rows)]
+        latest = readings[-1]
+        previous = readings[0] if len(readings) > 1 else None
+        predicted = model.predict(latest, previous, hours_ahead)
+        change = predicted - latest["temperature"]
+        
+        return WeatherPrediction(
+            city=city,
+            predicted_temperature=round(predicted, 1),
+            confidence_score=model.confidence,
+            prediction_time=datetime.now() + timedelta(hours=hours_ahead),
+            trend_direction="increasing" if change > 1 else "decreasing" if change < -1 else "stable",
+            prediction_horizon_hours=hours_ahead
+        )
+    
+    def _condition_profile(self, city: str) -> Tuple[int, Optional[Dict], Dict[str, int]]:
+        """Return (record count, temperature stats, condition counts) for a city"""
+        if self.condition_index is not None:
+            self.repository.flush()
+            stats = self.condition_index.aggregate("temperature", ("count", "mean", "std"), city=city)
+            conditions = self.condition_index.group_by("condition", functions=("count",), city=city)
+            return (stats["count"], stats if stats["count"] else None,
+                    {name: group["count"] for name, group in conditions.items()})
+        
+        # Without an index: classify the city's recent descriptions
+        city_data = self.dataset().city(city, limit=100)
+        temperatures = city_data["temperature"]
+        conditions: Dict[str, int] = {}
+        for description in city_data["description"]:
+            condition = condition_class(description)
+            conditions[condition] = conditions.get(condition, 0) + 1
+        stats = {"mean": float(np.mean(temperatures)), "std": float(np.std(temperatures))} \
+            if len(temperatures) else None
+        return len(temperatures), stats, conditions
+    
     def detect_weather_patterns(self, city: str) -> List[WeatherPattern]:
         """Detect recurring weather patterns"""
-        historical_data = self.load_historical_data(limit=100)
+        record_count, temp_stats, conditions = self._condition_profile(city)
         patterns = []
         
-        # Group data by city
-        city_data = [record for record in historical_data 
-                    if record.get("City", "").lower() == city.lower()]
-        
-        if len(city_data) < 10:
+        if record_count < 10:
             return patterns
         
-        # Analyze temperature patterns
-        temperatures = []
-        descriptions = []
-        
-        for record in city_data:
-            try:
-                temp = float(record.get("Temperature", 0))
-                desc = record.get("Description", "").lower()
-                temperatures.append(temp)
-                descriptions.append(desc)
-            except (ValueError, TypeError):
-                continue
-        
-        if temperatures:
+        if temp_stats:
             # Temperature trend pattern
-            avg_temp = np.mean(temperatures)
-            temp_std = np.std(temperatures)
+            avg_temp = temp_stats["mean"]
+            temp_std = temp_stats["std"]
             
             if temp_std < 3:
                 pattern_type = "stable_temperature"
@@ -134,20 +327,50 @@ class MLService:
             patterns.append(WeatherPattern(
                 pattern_name=pattern_type,
                 description=description,
-                frequency=len(city_data),
+                frequency=record_count,
                 typical_conditions={"temperature_std": temp_std},
                 associated_cities=[city]
             ))
         
+        # Current weather regime and how often the city is in it (precomputed assignments)
+        regime = self.current_regime(city)
+        if regime is not None:
+            patterns.append(WeatherPattern(
+                pattern_name="weather_regime",
+                description=(f"Currently in a '{regime['name']}' regime (about {regime['temperature']:.0f}°C, "
+                             f"{regime['humidity']}% humidity) since "
+                             f"{datetime.fromtimestamp(regime['since']).strftime('%b %d %H:%M')}; "
+                             f"seen in {regime['share']:.0%} of readings here"),
+                frequency=regime["share"],
+                typical_conditions={name: regime[name] for name in
+                                    ("regime", "temperature", "humidity", "wind_speed", "pressure")},
+                associated_cities=[city]
+            ))
+        
+        # What followed the most similar past hours
+        analogs = self.analogs.similar(city, hours_ahead=6)
+        if len(analogs) >= 3:
+            changes = [analog["change"] for analog in analogs]
+            mean_change = float(np.mean(changes))
+            agreeing = sum(1 for change in changes if np.sign(change) == np.sign(mean_change))
+            patterns.append(WeatherPattern(
+                pattern_name="similar_past_conditions",
+                description=(f"In {len(analogs)} past hours most like now, temperature changed "
+                             f"{mean_change:+.1f}°C over the next 6h ({agreeing} of {len(analogs)} agree)"),
+                frequency=agreeing / len(analogs),
+                typical_conditions={"expected_change_6h": mean_change,
+                                    "analog_times": [analog["timestamp"] for analog in analogs]},
+                associated_cities=[city]
+            ))
+        
         # Weather condition patterns
-        if descriptions:
-            from collections import Counter
-            desc_counts = Counter(descriptions)
-            most_common = desc_counts.most_common(3)
+        if conditions:
+            total = sum(conditions.values())
+            most_common = sorted(conditions.items(), key=lambda item: item[1], reverse=True)[:3]
             
             for desc, count in most_common:
                 if count >= 3:  # At least 3 occurrences
-                    frequency = count / len(descriptions)
+                    frequency = count / total
                     patterns.append(WeatherPattern(
                         pattern_name="weather_condition",
                         description=f"Frequent {desc} weather ({count} times)",
@@ -158,74 +381,64 @@ class MLService:
         
         return patterns
     
+    def current_regime(self, city: str) -> Optional[Dict]:
+        """The weather regime a city is in now, since when and how often it occurs there"""
+        if self.regime_model is None:
+            return None
+        return self.regime_model.current(city)
+    
+    def regime_frequency(self, city: Optional[str] = None) -> List[Dict]:
+        """Every regime's typical conditions with its share of a city's (or all) readings"""
+        if self.regime_model is None:
+            return []
+        shares = self.regime_model.frequency(city)
+        regimes = [dict(regime, share=shares.get(regime["regime"], 0.0)) for regime in self.regime_model.regimes()]
+        return sorted(regimes, key=lambda regime: regime["share"], reverse=True)
+    
     def detect_anomalies(self, city: str) -> List[WeatherAnomaly]:
         """Detect weather anomalies"""
-        historical_data = self.load_historical_data(limit=50)
-        anomalies = []
-        
-        city_data = [record for record in historical_data 
-                    if record.get("City", "").lower() == city.lower()]
-        
-        if len(city_data) < 5:
-            return anomalies
-        
-        temperatures = []
-        for record in city_data:
-            try:
-                temp = float(record.get("Temperature", 0))
-                temperatures.append((temp, record))
-            except (ValueError, TypeError):
-                continue
-        
-        if len(temperatures) < 5:
-            return anomalies
-        
-        # Calculate temperature statistics
-        temps_only = [t[0] for t in temperatures]
-        mean_temp = np.mean(temps_only)
-        std_temp = np.std(temps_only)
-        
-        # Detect temperature anomalies (outside 2 standard deviations)
-        for temp, record in temperatures[-10:]:  # Check last 10 readings
-            z_score = abs(temp - mean_temp) / (std_temp + 1e-6)  # Avoid division by zero
-            
-            if z_score > 2:  # Significant anomaly
-                anomaly_type = "extreme_hot" if temp > mean_temp else "extreme_cold"
-                severity = min(1.0, z_score / 3)
-                
-                anomalies.append(WeatherAnomaly(
-                    city=city,
-                    datetime=datetime.now(),
-                    anomaly_type=anomaly_type,
-                    severity_score=severity,
-                    description=f"Temperature {temp}°C is {z_score:.1f} standard deviations from normal ({mean_temp:.1f}°C)",
-                    expected_value=mean_temp,
-                    actual_value=temp
-                ))
+        if self.running_stats is not None:
+            return self._flagged_anomalies(city)
         
+        # Robust rolling/seasonal scores over the city's last 10 readings
+        return self.anomaly_engine.scan(self.dataset(), cities=[city], metrics=("temperature",), recent=10)
+    
+    def detect_fleet_anomalies(self, recent: int = 1, limit: Optional[int] = None) -> List[WeatherAnomaly]:
+        """What's unusual right now: every city and metric scored in one pass, most severe first"""
+        anomalies = self.anomaly_engine.scan(self.dataset(), recent=recent)
+        return anomalies[:limit] if limit is not None else anomalies
+    
+    def _flagged_anomalies(self, city: str) -> List[WeatherAnomaly]:
+        """Temperature anomalies flagged at ingest among the last 10 readings"""
+        self.repository.flush()
+        anomalies = []
+        for flag in self.running_stats.anomalies(city, "temperature", last=10):
+            z_score = abs(flag["z_score"])
+            anomalies.append(WeatherAnomaly(
+                city=city,
+                datetime=datetime.fromtimestamp(flag["timestamp"]),
+                anomaly_type="extreme_hot" if flag["value"] > flag["expected"] else "extreme_cold",
+                severity_score=min(1.0, z_score / 3),
+                description=f"Temperature {flag['value']}°C is {z_score:.1f} standard deviations "
+                            f"from normal ({flag['expected']:.1f}°C)",
+                expected_value=flag["expected"],
+                actual_value=flag["value"]
+            ))
         return anomalies
     
     def generate_personalized_recommendations(self, city: str, user_preferences: Dict = None) -> List[PersonalizedRecommendation]:
         """Generate personalized weather-based recommendations"""
         recommendations = []
-        historical_data = self.load_historical_data(limit=20)
-        
         # Get latest weather for the city
-        latest_weather = None
-        for record in reversed(historical_data):
-            if record.get("City", "").lower() == city.lower():
-                latest_weather = record
-                break
-        
-        if not latest_weather:
+        latest = self.dataset().city(city, limit=1)
+        if not len(latest["temperature"]):
             return recommendations
         
-        try:
-            temp = float(latest_weather.get("Temperature", 20))
-            description = latest_weather.get("Description", "").lower()
-            humidity = float(latest_weather.get("Humidity", 50)) if latest_weather.get("Humidity") else 50
-        except (ValueError, TypeError):
-            return recommendations
+        temp = float(latest["temperature"][-1])
+        description = latest["description"][-1].lower()
+        humidity = float(latest["humidity"][-1]) if latest["humidity"][-1] else 50
+        if np.isnan(humidity):
+            humidity = 50
         
         # Temperature-based recommendations
         if temp < 5:
@@ -285,11 +498,10 @@ class MLService:
     
     def generate_weather_insights(self, city: str) -> WeatherInsights:
         """Generate comprehensive weather insights"""
-        historical_data = self.load_historical_data(limit=100)
-        city_data = [record for record in historical_data 
-                    if record.get("City", "").lower() == city.lower()]
+        dataset = self.dataset()
+        temp_stats = dataset.stats(city, "temperature", limit=100)
         
-        if not city_data:
+        if temp_stats is None:
             return WeatherInsights(
                 city=city,
                 analysis_period="last 100 records",
@@ -304,53 +516,13 @@ class MLService:
                 personalized_recommendations=[]
             )
         
-        # Calculate statistics
-        temperatures = []
-        humidities = []
-        wind_speeds = []
-        
-        for record in city_data:
-            try:
-                temp = float(record.get("Temperature", 0))
-                temperatures.append(temp)
-                
-                if record.get("Humidity"):
-                    humidity = float(record.get("Humidity", 50))
-                    humidities.append(humidity)
-                
-                if record.get("WindSpeed"):
-                    wind = float(record.get("WindSpeed", 0))
-                    wind_speeds.append(wind)
-            except (ValueError, TypeError):
-                continue
-        
-        # Temperature statistics
-        temp_stats = {}
-        if temperatures:
-            temp_stats = {
-                "mean": np.mean(temperatures),
-                "min": min(temperatures),
-                "max": max(temperatures),
-                "std": np.std(temperatures)
-            }
-        
-        # Humidity statistics
-        humidity_stats = {}
-        if humidities:
-            humidity_stats = {
-                "mean": np.mean(humidities),
-                "min": min(humidities),
-                "max": max(humidities)
-            }
-        
-        # Wind statistics
-        wind_stats = {}
-        if wind_speeds:
-            wind_stats = {
-                "mean": np.mean(wind_speeds),
-                "min": min(wind_speeds),
-                "max": max(wind_speeds)
-            }
+        # Per-city statistics are vectorized over the city's last 100 readings
+        temperatures = dataset.city(city, limit=100)["temperature"]
+        temp_stats = {name: temp_stats[name] for name in ("mean", "min", "max", "std")}
+        humidity_stats = dataset.stats(city, "humidity", limit=100) or {}
+        humidity_stats = {name: humidity_stats[name] for name in ("mean", "min", "max") if humidity_stats}
+        wind_stats = dataset.stats(city, "wind_speed", limit=100) or {}
+        wind_stats = {name: wind_stats[name] for name in ("mean", "min", "max") if wind_stats}
         
         # Determine temperature trend
         if len(temperatures) >= 3:
@@ -365,17 +537,18 @@ class MLService:
                 temp_trend = "stable"
         else:
             temp_trend = "insufficient data"
+        slope = dataset.trend(city, "temperature", limit=100)
         
         return WeatherInsights(
             city=city,
-            analysis_period=f"last {len(city_data)} records",
+            analysis_period=f"last {len(temperatures)} records",
             temperature_stats=temp_stats,
             humidity_stats=humidity_stats,
             wind_stats=wind_stats,
             temperature_trend=temp_trend,
             seasonal_patterns=self.detect_weather_patterns(city),
             short_term_forecast=[self.predict_temperature(city, 24)],
-            long_term_trends={"trend": temp_trend},
+            long_term_trends={"trend": temp_trend, "slope_per_day": slope * 24 if slope is not None else None},
             detected_anomalies=self.detect_anomalies(city),
             personalized_recommendations=self.generate_personalized_recommendations(city)
         )
@@ -406,7 +579,7 @@ class MLService:
             # ML enhancements
             predicted_temperature_trend=[prediction.predicted_temperature],
             weather_pattern_score=0.7,  # Calculate based on patterns
-            anomaly_score=max([a.severity_score for a in anomalies], default=0.0),
+            anomaly_score=self._anomaly_score(city, weather_data.get("temperature"), anomalies),
             comfort_index=self._calculate_comfort_index(weather_data),
             recommendations=[rec.recommendation for rec in recommendations],
             seasonal_analysis={"season": self._get_current_season()}
@@ -414,6 +587,15 @@ class MLService:
         
         return enhanced_data
     
+    def _anomaly_score(self, city: str, temperature, anomalies: List[WeatherAnomaly]) -> float:
+        """Score the current reading in O(1) from running stats, else use recent anomalies"""
+        score = max([a.severity_score for a in anomalies], default=0.0)
+        if self.running_stats is not None and temperature is not None:
+            z_score = self.running_stats.zscore(city, "temperature", float(temperature))
+            if z_score is not None:
+                score = max(score, min(1.0, abs(z_score) / 3))
+        return score
+    
     def _calculate_comfort_index(self, weather_data: Dict) -> float:
         """Calculate a simple comfort index based on temperature and humidity"""
         temp = weather_data.get("temperature", 20)
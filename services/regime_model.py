@@ -0,0 +1,354 @@
+"""
+Regime Model - Incremental weather-regime clustering with stored per-observation assignments
+"""
+import pickle
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from core.columnar_store import to_epoch
+from core.ingest import canonical_city
+from core.observation_store import OBSERVATION_COLUMNS
+from models.ml_models import MLDataPreprocessor
+
+try:
+    from sklearn.cluster import MiniBatchKMeans
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+
+
+# MLDataPreprocessor features that describe a regime, with fixed weights that
+# bring typical spreads (~8°C, ~20% humidity, ~3 m/s, ~8 hPa) to similar sizes.
+# Fixed rather than fitted scaling keeps old and new assignments comparable.
+REGIME_WEIGHTS = {"temp_norm": 3.0, "humidity_norm": 1.0, "wind_norm": 5.0, "pressure_norm": 6.0,
+                  "month_sin": 0.3, "month_cos": 0.3}
+_FEATURE_COLUMNS = [MLDataPreprocessor.FEATURE_NAMES.index(name) for name in REGIME_WEIGHTS]
+_WEIGHTS = np.array(list(REGIME_WEIGHTS.values()))
+
+# Stand-ins for a missing humidity, wind speed or pressure, so a gap reads as
+# ordinary conditions rather than 0% humidity, calm air or 900 hPa
+TYPICAL_VALUES = {"humidity": 60.0, "wind_speed": 3.0, "pressure": 1013.0}
+
+DEFAULT_REGIMES = 6
+MIN_FIT_ROWS = 64            # observations buffered before the first fit
+RELABEL_SHIFT = 0.05         # accumulated centroid movement that triggers relabelling stored rows
+UNASSIGNED = -1
+SAVE_EVERY_ROWS = 500        # observations folded in between saves...
+SAVE_INTERVAL = 300          # ...or seconds, whichever comes first
+_STATE_VERSION = 3
+
+_FIELD_NAMES = {header: column for column, header in OBSERVATION_COLUMNS}
+
+
+class _CityRegimes:
+    """Growable per-city arrays: timestamps, regime vectors and their assignments"""
+
+    def __init__(self, capacity: int = 256):
+        self.size = 0
+        self.latest = -1     # row of the newest timestamp
+        self.timestamps = np.empty(capacity, dtype=np.int64)
+        self.vectors = np.empty((capacity, len(_WEIGHTS)), dtype=np.float32)
+        self.regimes = np.empty(capacity, dtype=np.int16)
+
+    def extend(self, timestamps: np.ndarray, vectors: np.ndarray, regimes: np.ndarray) -> None:
+        count = len(timestamps)
+        if self.size + count > len(self.timestamps):
+            capacity = max(len(self.timestamps) * 2, self.size + count)
+            for name in ("timestamps", "vectors", "regimes"):
+                array = getattr(self, name)
+                grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                setattr(self, name, grown)
+        self.timestamps[self.size:self.size + count] = timestamps
+        self.vectors[self.size:self.size + count] = vectors
+        self.regimes[self.size:self.size + count] = regimes
+        newest = self.size + int(np.argmax(timestamps))
+        if self.latest < 0 or self.timestamps[newest] >= self.timestamps[self.latest]:
+            self.latest = newest
+        self.size += count
+
+
+class RegimeModel:
+    """MiniBatchKMeans weather regimes shared by every city, updated as observations are written.
+
+    Each observation becomes a weighted vector of temperature, humidity,
+    wind, pressure and time of year. Batches are folded into the clustering
+    with partial_fit, then assigned; assignments and per-city regime counts
+    are stored, so "which regime is a city in and how common is it" is a
+    lookup rather than a history scan. Until MIN_FIT_ROWS observations have
+    arrived they are kept unassigned. When the centroids have drifted by
+    RELABEL_SHIFT in total, stored vectors are reassigned in one vectorized
+    pass. State is pickled with the number of observations it covers, so
+    callers can tell when it needs a rebuild (see RunningStats); listener
+    updates save every SAVE_EVERY_ROWS rows or SAVE_INTERVAL seconds, and
+    owners call save() at shutdown.
+    """
+
+    def __init__(self, path: str = "data/regimes.pkl", n_regimes: int = DEFAULT_REGIMES):
+        self.path = Path(path)
+        self.n_regimes = n_regimes
+        self.observations = 0
+        self._kmeans = None
+        self._cities: Dict[str, _CityRegimes] = {}
+        self._counts: Dict[str, np.ndarray] = {}
+        self._shift = 0.0
+        self._unsaved = 0
+        self._saved_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.loaded = self._load()
+
+    @property
+    def fitted(self) -> bool:
+        return self._kmeans is not None and hasattr(self._kmeans, "cluster_centers_")
+
+    # Updates
+
+    def update_many(self, records: Iterable[Dict]) -> int:
+        """Fold observations (field names or CSV headers) in; returns how many were stored"""
+        by_city: Dict[str, List[int]] = {}
+        rows = []
+        counted = 0
+        for record in records:
+            record = {_FIELD_NAMES.get(key, key): value for key, value in record.items()}
+            if not record.get("city"):
+                continue
+            try:
+                timestamp = to_epoch(record.get("timestamp"))
+            except ValueError:
+                continue
+            counted += 1
+            if np.isnan(_number(record.get("temperature"))):
+                continue
+            # Temperature-only readings (the legacy log) have nothing else to cluster on
+            if all(np.isnan(_number(record.get(name))) for name in TYPICAL_VALUES):
+                continue
+            rows.append(dict(record, timestamp=timestamp))
+            by_city.setdefault(canonical_city(record["city"]), []).append(len(rows) - 1)
+        if not SKLEARN_AVAILABLE:
+            with self._lock:
+                self.observations += counted
+            return 0
+        vectors = regime_vectors(rows)
+
+        with self._lock:
+            self.observations += counted
+            if not len(rows):
+                return 0
+            regimes = np.full(len(rows), UNASSIGNED, dtype=np.int16)
+            if self.fitted:
+                self._partial_fit(vectors)
+                regimes = self._kmeans.predict(vectors).astype(np.int16)
+            for city, indices in by_city.items():
+                state = self._cities.setdefault(city, _CityRegimes())
+                state.extend(np.array([rows[i]["timestamp"] for i in indices], dtype=np.int64),
+                             vectors[indices], regimes[indices])
+            if not self.fitted:
+                self._first_fit()
+            elif self._shift >= RELABEL_SHIFT:
+                self._relabel()
+            else:
+                self._count(regimes, by_city)
+        return len(rows)
+
+    def on_written(self, batch: Optional[List[Dict]]) -> None:
+        """Repository listener: assign each written batch, saving every so often"""
+        if batch is None:
+            # Wholesale changes are handled by whoever made them (clear/rebuild)
+            return
+        self.update_many(batch)
+        with self._lock:
+            self._unsaved += len(batch)
+            due = self._unsaved >= SAVE_EVERY_ROWS or time.monotonic() - self._saved_at >= SAVE_INTERVAL
+        if due:
+            self.save()
+
+    def clear(self) -> None:
+        with self._lock:
+            self.observations = 0
+            self._kmeans = None
+            self._cities.clear()
+            self._counts.clear()
+            self._shift = 0.0
+        self.save()
+
+    # Queries
+
+    def current(self, city: str) -> Optional[Dict]:
+        """The regime of a city's newest observation, since when, and how often the city is in it"""
+        city = canonical_city(city)
+        with self._lock:
+            state = self._cities.get(city)
+            if state is None or state.latest < 0 or state.regimes[state.latest] == UNASSIGNED:
+                return None
+            regime = int(state.regimes[state.latest])
+            counts = self._counts[city]
+            # The current run: back from the newest row to the last one (in arrival order) in another regime
+            others = np.flatnonzero(state.regimes[:state.latest + 1] != regime)
+            since = int(state.timestamps[others[-1] + 1 if len(others) else 0])
+            center = self._kmeans.cluster_centers_[regime]
+        return dict(describe_regime(center), regime=regime, since=since,
+                    share=float(counts[regime] / counts.sum()), observations=int(counts[regime]))
+
+    def frequency(self, city: Optional[str] = None) -> Dict[int, float]:
+        """Share of a city's (or every city's) assigned observations in each regime"""
+        with self._lock:
+            if city is not None:
+                counts = self._counts.get(canonical_city(city))
+            else:
+                counts = sum(self._counts.values()) if self._counts else None
+        if counts is None or not counts.sum():
+            return {}
+        return {regime: float(count / counts.sum()) for regime, count in enumerate(counts) if count}
+
+    def regimes(self) -> List[Dict]:
+        """Every regime's typical conditions and overall share, most common first"""
+        shares = self.frequency()
+        with self._lock:
+            if not self.fitted:
+                return []
+            centers = self._kmeans.cluster_centers_.copy()
+        described = [dict(describe_regime(center), regime=regime, share=shares.get(regime, 0.0))
+                     for regime, center in enumerate(centers)]
+        return sorted(described, key=lambda regime: regime["share"], reverse=True)
+
+    def assignments(self, city: str, limit: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, regimes) stored for a city's observations in arrival order (last `limit`)"""
+        with self._lock:
+            state = self._cities.get(canonical_city(city))
+            if state is None:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int16)
+            start = max(0, state.size - limit) if limit is not None else 0
+            return state.timestamps[start:state.size].copy(), state.regimes[start:state.size].copy()
+
+    # Clustering (callers hold the lock)
+
+    def _partial_fit(self, vectors: np.ndarray) -> None:
+        before = self._kmeans.cluster_centers_.copy()
+        self._kmeans.partial_fit(vectors)
+        self._shift += float(np.abs(self._kmeans.cluster_centers_ - before).max())
+
+    def _first_fit(self) -> None:
+        """Fit on the buffered vectors once there are enough, then assign them all"""
+        pending = sum(state.size for state in self._cities.values())
+        if pending < max(MIN_FIT_ROWS, self.n_regimes):
+            return
+        self._kmeans = MiniBatchKMeans(n_clusters=self.n_regimes, random_state=0, n_init=3,
+                                       batch_size=256)
+        self._kmeans.partial_fit(np.concatenate([state.vectors[:state.size] for state in self._cities.values()]))
+        self._relabel()
+
+    def _relabel(self) -> None:
+        self._counts = {}
+        for city, state in self._cities.items():
+            if state.size:
+                state.regimes[:state.size] = self._kmeans.predict(state.vectors[:state.size])
+            self._counts[city] = np.bincount(state.regimes[:state.size], minlength=self.n_regimes)
+        self._shift = 0.0
+
+    def _count(self, regimes: np.ndarray, by_city: Dict[str, List[int]]) -> None:
+        for city, rows in by_city.items():
+            counts = self._counts.setdefault(city, np.zeros(self.n_regimes, dtype=np.int64))
+            counts += np.bincount(regimes[rows], minlength=self.n_regimes)
+
+    # Persistence
+
+    def save(self) -> None:
+        with self._lock:
+            state = {
+                "version": _STATE_VERSION,
+                "weights": REGIME_WEIGHTS,
+                "n_regimes": self.n_regimes,
+                "observations": self.observations,
+                "kmeans": self._kmeans,
+                "shift": self._shift,
+                "cities": {city: (state.timestamps[:state.size], state.vectors[:state.size],
+                                  state.regimes[:state.size]) for city, state in self._cities.items()},
+            }
+            try:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = self.path.with_suffix(".tmp")
+                with open(temp_path, "wb") as f:
+                    pickle.dump(state, f)
+                temp_path.replace(self.path)
+                self._unsaved, self._saved_at = 0, time.monotonic()
+            except OSError as e:
+                print(f"Error saving weather regimes: {e}")
+
+    def _load(self) -> bool:
+        if not self.path.exists():
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+            if (state.get("version") != _STATE_VERSION or state.get("weights") != REGIME_WEIGHTS
+                    or state.get("n_regimes") != self.n_regimes):
+                return False
+            self._kmeans = state["kmeans"]
+            self._shift = state["shift"]
+            for city, (timestamps, vectors, regimes) in state["cities"].items():
+                self._cities[city] = _CityRegimes(max(len(timestamps), 1))
+                if len(timestamps):
+                    self._cities[city].extend(timestamps, vectors, regimes)
+            if self.fitted:
+                self._counts = {city: np.bincount(city_state.regimes[:city_state.size], minlength=self.n_regimes)
+                                for city, city_state in self._cities.items()}
+            self.observations = state["observations"]
+            return True
+        except Exception as e:
+            print(f"Error loading weather regimes: {e}")
+            self._kmeans, self._cities, self._counts, self.observations = None, {}, {}, 0
+            return False
+
+
+def regime_vectors(records: List[Dict]) -> np.ndarray:
+    """Weighted regime vectors (REGIME_WEIGHTS order) for records with epoch timestamps.
+
+    Imperial readings are converted to °C and m/s; missing humidity, wind
+    speed and pressure take their TYPICAL_VALUES.
+    """
+    if not records:
+        return np.empty((0, len(_WEIGHTS)), dtype=np.float32)
+    columns = {name: np.array([_number(record.get(name)) for record in records])
+               for name in ("temperature", "humidity", "wind_speed", "pressure")}
+    imperial = np.array([record.get("unit") == "imperial" for record in records])
+    columns["temperature"] = np.where(imperial, (columns["temperature"] - 32) * 5 / 9, columns["temperature"])
+    columns["wind_speed"] = np.where(imperial, columns["wind_speed"] * 0.44704, columns["wind_speed"])
+    for name, typical in TYPICAL_VALUES.items():
+        columns[name] = np.where(np.isnan(columns[name]), typical, columns[name])
+    columns["timestamp"] = np.array([record["timestamp"] for record in records], dtype=np.int64)
+    matrix = MLDataPreprocessor.extract_feature_matrix(columns, dtype=np.float64)[:, _FEATURE_COLUMNS]
+    return (np.nan_to_num(matrix) * _WEIGHTS).astype(np.float32)
+
+
+def describe_regime(center: np.ndarray) -> Dict:
+    """Typical conditions of a regime centroid and a short name for it"""
+    features = np.asarray(center, dtype=np.float64) / _WEIGHTS
+    temperature = features[0] * 100 - 50
+    humidity = features[1] * 100
+    wind_speed = features[2] * 50
+    pressure = features[3] * 200 + 900
+
+    words = ["Cold" if temperature < 5 else "Cool" if temperature < 15 else "Mild" if temperature < 25 else "Hot"]
+    if humidity >= 80:
+        words.append("humid")
+    elif humidity <= 40:
+        words.append("dry")
+    if wind_speed >= 8:
+        words.append("windy")
+    elif wind_speed <= 2:
+        words.append("calm")
+    if pressure <= 1005:
+        words.append("low pressure")
+    elif pressure >= 1020:
+        words.append("high pressure")
+    return {"name": ", ".join(words), "temperature": round(float(temperature), 1), "humidity": round(humidity),
+            "wind_speed": round(float(wind_speed), 1), "pressure": round(pressure)}
+
+
+def _number(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
@@ -2,17 +2,23 @@
 Weather Service - Handles all weather-related business logic
 """
 import os
-import csv
+from dataclasses import fields
 from datetime import datetime
 from core.api import WeatherAPI
+from core.observation_store import OBSERVATION_COLUMNS
+from core.repository import CsvBackend, ObservationRepository
 from features.activity_suggester import ActivitySuggester
 from models.weather_models import WeatherData
 
+# Retention for raw observation logs; expired partitions are moved to the archive
+LOG_RETENTION_DAYS = 365
+LOG_ARCHIVE_DIR = "data/archive"
+
 
 class WeatherService:
     """Main weather service handling current weather and data persistence"""
     
-    def __init__(self, api_key, log_file="data/weather_log.csv"):
+    def __init__(self, api_key, log_file="data/weather_log.csv", repository=None):
         if not api_key:
             raise ValueError("Missing WEATHER_API_KEY")
         
@@ -20,11 +26,23 @@ class WeatherService:
         self.activity_suggester = ActivitySuggester()
         self.log_file = log_file
         os.makedirs(os.path.dirname(log_file), exist_ok=True)
+        if repository is None:
+            # Standalone use: canonical CSV log in monthly partitions, raw rows kept for a year
+            repository = ObservationRepository(CsvBackend(
+                log_file, retention_days=LOG_RETENTION_DAYS, archive_dir=LOG_ARCHIVE_DIR))
+        # core.repository.ObservationRepository shared with the other history readers
+        self.repository = repository
+        # Observations are queued and written in batches off the calling thread
+        self.writer = repository.writer
+        # When set, current weather and history come from the store as of this time
+        self.replay_time = None
 
     def get_current_weather(self, city, unit="metric"):
         """Get current weather for a city"""
         if not city:
             raise ValueError("City name cannot be empty")
+        if self.replay_time is not None:
+            return self.get_weather_as_of(city, self.replay_time)
             
         try:
             data = self.api.fetch_weather(city, unit)
@@ -50,7 +68,7 @@ class WeatherService:
             snow_1h = data.get("snow", {}).get("1h", 0)
             snow_3h = data.get("snow", {}).get("3h", 0)
             
-            return WeatherData(
+            weather = WeatherData(
                 temperature=temp,
                 description=desc,
                 humidity=humidity,
@@ -67,10 +85,14 @@ class WeatherService:
                 rain_1h=rain_1h,
                 rain_3h=rain_3h,
                 snow_1h=snow_1h,
-                snow_3h=snow_3h
+                snow_3h=snow_3h,
+                observed_at=data.get("dt")
             )
         except Exception as e:
             raise Exception(f"Failed to get weather data for '{city}': {str(e)}")
+
+        self.save_observation(weather)
+        return weather
             
     def get_historical_data(self, city, time_range):
         """Get historical weather data for analytics
@@ -97,9 +119,15 @@ class WeatherService:
             }
             days = days_map.get(time_range, 7)
             
-            # Generate timestamps
             end_date = datetime.now()
             start_date = end_date - timedelta(days=days)
+            
+            # Recorded observations are served from the hourly/daily rollups
+            recorded = self._historical_from_rollups(city, start_date, end_date)
+            if recorded:
+                return recorded
+            
+            # Generate timestamps
             timestamps = [start_date + timedelta(hours=i) for i in range(days * 24)]
             
             # Generate sample data with realistic patterns
@@ -133,10 +161,7 @@ class WeatherService:
                 # Daily precipitation sum
                 daily_precip.append(sum(precipitation[i] for i, ts in enumerate(timestamps) if ts.date() == date))
                 
-                # Simulate daylight hours with seasonal variation
-                day_of_year = date.timetuple().tm_yday
-                daylight = 12 + 4 * np.sin(2 * np.pi * (day_of_year - 172) / 365)  # Peak at summer solstice
-                daylight_hours.append(daylight)
+                daylight_hours.append(self._daylight_hours(date))
             
             return {
                 'timestamps': timestamps,
@@ -152,87 +177,79 @@ class WeatherService:
         except Exception as e:
             print(f"Error generating historical data: {str(e)}")
             return None
+
+    def _historical_from_rollups(self, city, start, end):
+        """Build get_historical_data's result from stored rollups (None if no data)"""
+        import numpy as np
         
-        # Save basic weather data (keeping existing format for CSV compatibility)
-        self.save_weather(city, temp, desc, unit, humidity, wind_speed)
-        
-        # Create a result object that supports attribute access
-        class WeatherResult:
-            pass
+        hours = self.repository.rollups(city, "hour", start, end)
+        if not hours:
+            return None
+        days = self.repository.rollups(city, "day", start, end)
+        dates = [datetime.strptime(day["bucket"], "%Y-%m-%d").date() for day in days]
         
-        result = WeatherResult()
-        result.temperature = temp
-        result.description = desc
-        result.humidity = humidity
-        result.wind_speed = wind_speed
-        result.unit = unit
-        result.visibility = visibility
-        result.cloudiness = cloudiness
-        result.pressure = pressure
-        result.feels_like = feels_like
-        result.wind_direction = wind_direction
-        result.sunrise = sunrise
-        result.sunset = sunset
-        result.rain_1h = rain_1h
-        result.rain_3h = rain_3h
-        result.snow_1h = snow_1h
-        result.snow_3h = snow_3h
+        def column(name):
+            return np.array([np.nan if row[name] is None else row[name] for row in hours], dtype=float)
         
-        return result
+        return {
+            'timestamps': [datetime.strptime(row["bucket"], "%Y-%m-%d %H") for row in hours],
+            'dates': dates,
+            'temperatures': column("mean"),
+            'humidity': column("humidity"),
+            'wind_speeds': column("wind_speed"),
+            'wind_directions': np.nan_to_num(column("wind_direction")),
+            'precipitation': [day["precipitation"] for day in days],
+            'daylight_hours': [self._daylight_hours(date) for date in dates]
+        }
+    
+    @staticmethod
+    def _daylight_hours(date):
+        """Approximate daylight hours with seasonal variation"""
+        import numpy as np
+        day_of_year = date.timetuple().tm_yday
+        return 12 + 4 * np.sin(2 * np.pi * (day_of_year - 172) / 365)  # Peak at summer solstice
+
+    def save_observation(self, weather_data):
+        """Log a full WeatherData observation without interrupting the caller"""
+        try:
+            self.repository.write(weather_data)
+        except Exception as e:
+            print(f"Error saving weather observation: {e}")
 
     def save_weather(self, city, temp, desc, unit=None, humidity=None, wind_speed=None):
-        """Save weather data to CSV log"""
-        file_exists = os.path.isfile(self.log_file)
-        with open(self.log_file, "a", newline="") as file:
-            writer = csv.writer(file)
-            if not file_exists:
-                writer.writerow(["DateTime", "City", "Temperature", "Description", "Unit", "Humidity", "WindSpeed"])
-            writer.writerow([
-                datetime.now().strftime("%Y-%m-%d %H:%M:%S"), 
-                city, temp, desc, unit, humidity, wind_speed
-            ])
+        """Queue weather data for the observation repository"""
+        self.repository.write({
+            "city": city, "temperature": temp, "description": desc,
+            "unit": unit, "humidity": humidity, "wind_speed": wind_speed
+        })
 
-    def load_weather_history(self, limit=7):
-        """Load recent weather history from CSV"""
-        if not os.path.exists(self.log_file):
-            return [], []
-        
-        with open(self.log_file, "r") as file:
-            reader = list(csv.DictReader(file))
-            if not reader:
-                return [], []
-            
-            recent = reader[-limit:]
-            
-            # Handle different CSV formats (old vs new)
-            dates = []
-            temps = []
-            
-            for row in recent:
-                # Try different possible column names
-                date_value = None
-                temp_value = None
-                
-                # Date column variants
-                for date_col in ["DateTime", "DateTime           "]:  # Handle spaces
-                    if date_col in row and row[date_col]:
-                        date_value = row[date_col].strip()
-                        break
-                
-                # Temperature column variants  
-                for temp_col in ["Temperature", " Temperature"]:  # Handle spaces
-                    if temp_col in row and row[temp_col]:
-                        try:
-                            temp_value = float(row[temp_col].strip())
-                            break
-                        except (ValueError, TypeError):
-                            continue
-                
-                if date_value and temp_value is not None:
-                    dates.append(date_value)
-                    temps.append(temp_value)
-            
-            return dates, temps
+    def get_weather_as_of(self, city, when):
+        """Rebuild the WeatherData recorded for a city at or before `when` (no network)"""
+        if not city:
+            raise ValueError("City name cannot be empty")
+        row = self.repository.as_of(city, when)["observation"]
+        if row is None:
+            raise Exception(f"No stored weather for '{city}' at or before {when}")
+        model_fields = {field.name for field in fields(WeatherData)}
+        values = {column: row.get(header) for column, header in OBSERVATION_COLUMNS
+                  if column in model_fields and row.get(header) is not None}
+        values.setdefault("description", "")
+        values.setdefault("humidity", 0)
+        values.setdefault("wind_speed", 0.0)
+        values.setdefault("unit", "metric")
+        values.setdefault("city", row.get("City"))
+        return WeatherData(**values)
+
+    def load_weather_history(self, limit=7, as_of=None):
+        """Load recent weather history, optionally as it stood at `as_of`"""
+        as_of = as_of if as_of is not None else self.replay_time
+        if as_of is not None:
+            window = self.repository.as_of(None, as_of, before=limit - 1)
+            recent = window["previous"] + ([window["observation"]] if window["observation"] else [])
+        else:
+            recent = self.repository.latest(limit=limit)
+        return ([row["DateTime"] for row in recent],
+                [float(row["Temperature"]) for row in recent])
 
     def suggest_activity(self, description):
         """Get activity suggestion based on weather description"""
@@ -0,0 +1,111 @@
+"""
+Tests for services.backtest rolling-origin replay, scoring and reports
+"""
+import json
+import tempfile
+import unittest
+
+import numpy as np
+
+from core.history_dataset import HistoryDataset
+from services.backtest import (backtest_city, compare_reports, format_report, resolve_predictor,
+                               run_backtest, summarize, write_report)
+
+START = 1709251200  # 2024-03-01 00:00 UTC
+
+
+class LookAheadProbe:
+    """Test predictor: fails if it is shown a reading past the forecast origin"""
+
+    def fit(self, history):
+        self.origin = history["timestamp"][-1]
+
+    def predict(self, history, hours_ahead):
+        assert history["timestamp"][-1] == self.origin, "history past the origin"
+        return float(history["temperature"][-1]), 0.95
+
+
+def linear_dataset(cities=("Oslo",), hours=60, slope=0.5):
+    """Hourly readings rising `slope` °C an hour, with no readings for hours 41-44"""
+    dataset = HistoryDataset()
+    for offset, city in enumerate(cities):
+        dataset.extend({"city": city, "timestamp": START + 3600 * h, "temperature": offset + slope * h,
+                        "humidity": 60, "wind_speed": 2, "pressure": 1010}
+                       for h in range(hours) if not 41 <= h <= 44)
+    return dataset
+
+
+class BacktestCityTest(unittest.TestCase):
+
+    def test_persistence_error_is_the_change_over_the_horizon(self):
+        columns = linear_dataset().city("Oslo")
+        rows = backtest_city("Oslo", columns, ["persistence", "tests.test_backtest:LookAheadProbe"],
+                             [1, 6], min_history=10, step=5)["persistence"]
+        # Brute force: the reading nearest origin + horizon, at most an hour off and after the origin
+        hours = (columns["timestamp"] - START) // 3600
+        expected = {1: [], 6: []}
+        for origin in range(9, len(hours) - 1, 5):
+            for horizon, actuals in expected.items():
+                target = hours[origin] + horizon
+                later = [i for i in range(origin + 1, len(hours)) if abs(hours[i] - target) <= 1]
+                if later:
+                    nearest = min(later, key=lambda i: (abs(hours[i] - target), i))
+                    actuals.append((0.5 * hours[origin], 0.5 * hours[nearest]))
+        for horizon, pairs in expected.items():
+            scored = [(p, a) for h, p, a in zip(rows["horizon"], rows["predicted"], rows["actual"])
+                      if h == horizon]
+            self.assertEqual(scored, pairs)
+        self.assertLess(len(expected[6]), len(range(9, len(hours) - 1, 5)))  # the gap cost some targets
+        self.assertEqual(len(rows["latency_ns"]), len(rows["predicted"]))
+
+    def test_unknown_predictor(self):
+        with self.assertRaises(ValueError):
+            resolve_predictor("oracle")
+        self.assertIs(resolve_predictor("tests.test_backtest:LookAheadProbe"), LookAheadProbe)
+
+
+class SummaryTest(unittest.TestCase):
+
+    def test_accuracy_and_calibration(self):
+        rows = {"horizon": np.array([1, 1, 6, 6.0]), "predicted": np.array([10, 11, 12, 20.0]),
+                "actual": np.array([10, 10, 10, 10.0]), "confidence": np.array([0.9, 0.9, 0.3, 0.3]),
+                "latency_ns": np.array([1000, 2000, 3000, 4000.0]), "fit_seconds": 0.5}
+        summary = summarize(rows, [1, 6, 24])
+        self.assertEqual(summary["overall"]["count"], 4)
+        self.assertAlmostEqual(summary["overall"]["mae"], 13 / 4)
+        self.assertAlmostEqual(summary["by_horizon"]["6"]["bias"], 6)
+        self.assertEqual(summary["by_horizon"]["24"], {"count": 0})
+        bins = {tuple(b["range"]): b for b in summary["calibration"]["bins"]}
+        self.assertEqual((bins[(0.8, 1.0)]["hit_rate"], bins[(0.2, 0.4)]["hit_rate"]), (1.0, 0.5))
+        self.assertAlmostEqual(summary["calibration"]["expected_calibration_error"], (2 * 0.1 + 2 * 0.2) / 4)
+        self.assertEqual(summary["latency_us"]["max"], 4.0)
+
+
+class RunBacktestTest(unittest.TestCase):
+
+    def test_report_round_trip(self):
+        dataset = linear_dataset(cities=("Oslo", "Lima", "Tiny"))
+        dataset.extend({"city": "Short", "timestamp": START + 3600 * h, "temperature": 1.0} for h in range(5))
+        report = run_backtest(dataset, ["persistence", "trend"], [1, 6], min_history=10, step=5, workers=1)
+        self.assertEqual(report["cities"], ["Lima", "Oslo", "Tiny"])  # "Short" has too little history
+        self.assertEqual(set(report["predictors"]["persistence"]["by_city"]), {"Lima", "Oslo", "Tiny"})
+        self.assertAlmostEqual(report["predictors"]["persistence"]["by_horizon"]["1"]["mae"], 0.5)
+
+        with tempfile.TemporaryDirectory() as directory:
+            with open(write_report(report, directory)) as f:
+                saved = json.load(f)
+        self.assertEqual(saved["predictors"]["trend"]["overall"], report["predictors"]["trend"]["overall"])
+        changes = compare_reports(saved, report)
+        self.assertEqual(changes["persistence"]["mae_overall"], 0.0)
+        self.assertIn("persistence", format_report(report, changes))
+
+    def test_worker_processes_give_the_same_scores(self):
+        dataset = linear_dataset(cities=("Oslo", "Lima"))
+        serial = run_backtest(dataset, ["persistence"], [1, 6], min_history=10, step=5, workers=1)
+        parallel = run_backtest(dataset, ["persistence"], [1, 6], min_history=10, step=5, workers=2)
+        self.assertEqual(parallel["predictors"]["persistence"]["by_city"],
+                         serial["predictors"]["persistence"]["by_city"])
+
+
+if __name__ == "__main__":
+    unittest.main()
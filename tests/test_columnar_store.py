@@ -0,0 +1,83 @@
+"""
+Tests for core.columnar_store per-city column segments
+"""
+import contextlib
+import io
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from core.columnar_store import ColumnarHistoryStore, to_epoch
+from core.ingest import city_slug, legacy_city_slug
+
+
+def hour(h):
+    return f"2024-03-01 {h:02d}:00:00"
+
+
+class ColumnarHistoryStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ColumnarHistoryStore(self.tmp.name, segment_size=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_across_segments(self):
+        self.store.append_many([{"City": "oslo", "DateTime": hour(h), "Temperature": h, "Humidity": None}
+                                for h in range(10)])
+        self.assertEqual(self.store.count("Oslo"), 10)
+        columns = self.store.read("OSLO", hour(2), hour(6))
+        np.testing.assert_array_equal(columns["temperature"], [2, 3, 4, 5, 6])
+        self.assertTrue(np.isnan(columns["humidity"]).all())
+        np.testing.assert_array_equal(self.store.latest("oslo", 3)["timestamp"],
+                                      [to_epoch(hour(h)) for h in (7, 8, 9)])
+
+    def test_reads_are_read_only(self):
+        self.store.append("oslo", hour(1), 1.0)
+        with self.assertRaises(ValueError):
+            self.store.read("oslo")["temperature"][0] = 99.0
+
+    def test_batches_are_sorted_and_stale_rows_skipped(self):
+        self.store.append_many([{"city": "rome", "timestamp": hour(h), "temperature": h} for h in (5, 3, 4)])
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.store.append_many([{"city": "rome", "timestamp": hour(h), "temperature": h} for h in (2, 6)])
+        np.testing.assert_array_equal(self.store.read("rome")["temperature"], [3, 4, 5, 6])
+
+    def test_rows_without_city_time_or_temperature_are_ignored(self):
+        added = self.store.append_many([{"city": "rome", "timestamp": "yesterday", "temperature": 1},
+                                        {"city": "", "timestamp": hour(1), "temperature": 1},
+                                        {"city": "rome", "timestamp": hour(1), "temperature": "n/a"}])
+        self.assertEqual(added, 0)
+
+    def test_non_ascii_cities_do_not_collide(self):
+        self.store.append("São Paulo", hour(1), 25.0)
+        self.store.append("S?o Paulo", hour(1), 5.0)
+        self.assertEqual(self.store.read("são paulo")["temperature"].tolist(), [25.0])
+        self.assertEqual(self.store.read("S?o Paulo")["temperature"].tolist(), [5.0])
+        self.assertEqual(sorted(self.store.cities()), ["S?o Paulo", "São Paulo"])
+        self.assertTrue(city_slug("São Paulo").startswith("sao_paulo-"))
+
+    def test_legacy_directory_is_adopted_by_its_city(self):
+        self.store.append("São Paulo", hour(1), 25.0)
+        root = Path(self.tmp.name)
+        (root / city_slug("São Paulo")).rename(root / legacy_city_slug("São Paulo"))
+        reopened = ColumnarHistoryStore(self.tmp.name, segment_size=4)
+        # Another city with the same legacy slug must not take it over
+        self.assertEqual(reopened.count("S?o Paulo"), 0)
+        self.assertEqual(reopened.read("São Paulo")["temperature"].tolist(), [25.0])
+        with open(root / city_slug("São Paulo") / "manifest.json") as f:
+            self.assertEqual(json.load(f)["city"], "São Paulo")
+
+    def test_clear(self):
+        self.store.append("oslo", hour(1), 1.0)
+        self.store.clear()
+        self.assertEqual(self.store.cities(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,97 @@
+"""
+Tests for core.condition_index bitmap queries against a brute-force scan
+"""
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from core.condition_index import ConditionIndex, condition_class
+
+DESCRIPTIONS = ["clear sky", "light rain", "overcast clouds", "mist", "heavy snow", "thunderstorm", "tornado?", ""]
+
+
+def observations(count=300, seed=3):
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 3, 1)
+    rows = []
+    for i in range(count):
+        rows.append({"city": ["oslo", "Lima", "Cairo"][i % 3],
+                     "timestamp": start + timedelta(hours=int(rng.integers(0, 500))),
+                     "temperature": round(float(rng.normal(15, 8)), 2),
+                     "humidity": None if i % 10 == 0 else float(rng.integers(20, 100)),
+                     "description": DESCRIPTIONS[i % len(DESCRIPTIONS)]})
+    return rows
+
+
+class ConditionIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = observations()
+        self.index = ConditionIndex(capacity=10)  # grows several times
+        self.assertEqual(self.index.add_many(self.rows[:120]), 120)
+        self.assertEqual(self.index.add_many(self.rows[120:] + [{"city": "Oslo", "temperature": None},
+                                                               {"city": "", "temperature": 3},
+                                                               {"City": "Oslo", "DateTime": "bad",
+                                                                "Temperature": 3}]), 180)
+
+    def expected(self, keep):
+        matching = [row for row in self.rows if keep(row)]
+        return sorted(matching, key=lambda row: row["timestamp"])
+
+    def test_condition_classes(self):
+        self.assertEqual([condition_class(text) for text in DESCRIPTIONS],
+                         ["clear", "rain", "clouds", "fog", "snow", "thunderstorm", "thunderstorm", "other"])
+        self.assertEqual(condition_class(None), "other")
+
+    def test_select_matches_a_scan(self):
+        keep = (lambda row: row["city"].lower() in ("oslo", "lima")
+                and condition_class(row["description"]) == "rain"
+                and row["timestamp"].hour in (6, 7, 8, 9, 10, 11, 12)
+                and row["temperature"] >= 10)
+        positions = self.index.select(city=["OSLO", "lima"], condition="rain", hour=range(6, 13),
+                                      temperature=(10, None))
+        expected = self.expected(keep)
+        self.assertEqual(len(positions), len(expected))
+        np.testing.assert_allclose(self.index.rows(positions)["temperature"],
+                                   [row["temperature"] for row in expected])
+        self.assertTrue(set(self.index.labels("city", positions)) <= {"Oslo", "Lima"})
+
+    def test_time_and_missing_values(self):
+        start, end = datetime(2024, 3, 5), datetime(2024, 3, 10)
+        positions = self.index.select(start=start, end=end, humidity=(None, 60))
+        expected = self.expected(lambda row: start <= row["timestamp"] <= end
+                                 and row["humidity"] is not None and row["humidity"] <= 60)
+        self.assertEqual(len(positions), len(expected))
+
+    def test_aggregate_and_group_by(self):
+        cairo = np.array([row["temperature"] for row in self.rows if row["city"] == "Cairo"])
+        stats = self.index.aggregate("temperature", city="Cairo")
+        self.assertEqual(stats["count"], len(cairo))
+        self.assertAlmostEqual(stats["mean"], cairo.mean())
+        self.assertAlmostEqual(stats["std"], cairo.std())
+        groups = self.index.group_by("city", "humidity", functions=("count",))
+        self.assertEqual(sum(group["count"] for group in groups.values()),
+                         sum(row["humidity"] is not None for row in self.rows))
+        self.assertEqual(self.index.aggregate(city="Nowhere"), {"count": 0, "mean": None, "std": None,
+                                                                "min": None, "max": None, "sum": None})
+        self.assertEqual(self.index.group_by("hour", city="Nowhere"), {})
+
+    def test_errors_and_clear(self):
+        with self.assertRaises(ValueError):
+            self.index.select(dew_point=(0, None))
+        with self.assertRaises(ValueError):
+            self.index.aggregate(functions=("median",))
+        self.index.clear()
+        self.assertEqual((len(self.index), self.index.values("city"), len(self.index.select())), (0, [], 0))
+        self.index.add_many(self.rows[:5])
+        self.assertEqual(len(self.index.select(city="Oslo")), 2)
+
+    def test_capacity_that_is_not_whole_bytes(self):
+        index = ConditionIndex(capacity=10)
+        self.assertEqual(index.add_many(self.rows[:10]), 10)
+        self.assertEqual(len(index.select(city="Oslo")), 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
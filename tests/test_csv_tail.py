@@ -0,0 +1,70 @@
+"""
+Tests for core.csv_tail reverse CSV reads
+"""
+import csv
+import os
+import tempfile
+import unittest
+
+from core.csv_tail import CsvTailReader, tail_csv
+
+
+class CsvTailReaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "log.csv")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, rows, header=("DateTime", "City", "Temperature", "Description")):
+        with open(self.path, "w", newline="") as f:
+            writer = csv.writer(f)
+            if header:
+                writer.writerow(header)
+            writer.writerows(rows)
+
+    def test_matches_forward_read_for_any_block_size(self):
+        rows = [[f"2024-01-01 00:{i:02d}:00", "Paris" if i % 3 else "Oslo", str(i),
+                 'light "drizzle",\nthen fog' if i % 4 == 0 else "clear"] for i in range(40)]
+        self.write(rows)
+        for block_size in (1, 7, 64, 4096):
+            reader = CsvTailReader(self.path, block_size=block_size)
+            self.assertEqual(reader.tail_rows(5), rows[-5:])
+            self.assertEqual(reader.tail_rows(100), rows)
+
+    def test_city_filter_scans_back(self):
+        rows = [["2024-01-01 00:00:00", "Oslo", "1", "snow"]] + \
+               [[f"2024-01-01 01:{i:02d}:00", "Paris", str(i), "clear"] for i in range(20)]
+        self.write(rows)
+        found = tail_csv(self.path, 3, city=" oslo ")
+        self.assertEqual([row["Temperature"] for row in found], ["1"])
+
+    def test_padded_legacy_header_and_short_rows(self):
+        with open(self.path, "w", newline="") as f:
+            f.write("DateTime           , City     , Temperature\n")
+            f.write("2024-01-01 00:00:00,Rome,12\n")
+            f.write("2024-01-01 01:00:00,Rome\n")
+        rows = CsvTailReader(self.path).tail_dicts(5, city="Rome", city_field="City")
+        self.assertEqual(rows[0][" Temperature"], "12")
+        self.assertIsNone(rows[1][" Temperature"])
+
+    def test_empty_and_missing_files(self):
+        self.assertEqual(tail_csv(self.path, 3), [])
+        self.write([])
+        self.assertEqual(tail_csv(self.path, 3), [])
+        self.assertEqual(CsvTailReader(self.path).tail_rows(0), [])
+
+    def test_without_header_first_row_is_data(self):
+        self.write([["a", "1"], ["b", "2"]], header=None)
+        self.assertEqual(CsvTailReader(self.path, has_header=False).tail_rows(5), [["a", "1"], ["b", "2"]])
+
+    def test_crlf_line_endings(self):
+        with open(self.path, "w", newline="\r\n") as f:
+            f.write("DateTime,City\n2024-01-01 00:00:00,Lima\n")
+        self.assertEqual(tail_csv(self.path, 1), [{"DateTime": "2024-01-01 00:00:00", "City": "Lima"}])
+
+
+if __name__ == "__main__":
+    unittest.main()
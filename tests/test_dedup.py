@@ -0,0 +1,59 @@
+"""
+Tests for core.dedup write-time duplicate detection
+"""
+import unittest
+
+from core.dedup import DuplicateFilter, observation_key
+
+
+def reading(**fields):
+    record = {"city": "london", "temperature": 15.2, "humidity": 70,
+              "timestamp": "2024-05-01 12:00:00", "observed_at": 1714564800}
+    record.update(fields)
+    return record
+
+
+class ObservationKeyTest(unittest.TestCase):
+
+    def test_provider_time_identifies_reading(self):
+        # Same API `dt` fetched again in another unit is the same reading
+        self.assertEqual(observation_key(reading()),
+                         observation_key(reading(city="London", temperature=59.4, unit="imperial")))
+
+    def test_content_hash_without_provider_time(self):
+        first = observation_key(reading(observed_at=None))
+        self.assertEqual(first, observation_key(reading(observed_at=None, timestamp="2024-05-01 12:03:00")))
+        self.assertNotEqual(first, observation_key(reading(observed_at=None, temperature=16.0)))
+
+
+class DuplicateFilterTest(unittest.TestCase):
+
+    def test_refetch_with_same_dt_is_dropped(self):
+        dedup = DuplicateFilter()
+        self.assertTrue(dedup.accept(reading()))
+        self.assertFalse(dedup.accept(reading(timestamp="2024-05-01 12:05:00")))
+        self.assertTrue(dedup.accept(reading(observed_at=1714565400)))
+        self.assertEqual(dedup.stats()["duplicates"], 1)
+
+    def test_window_applies_without_provider_time(self):
+        dedup = DuplicateFilter(window=600)
+        self.assertTrue(dedup.accept(reading(observed_at=None)))
+        self.assertFalse(dedup.accept(reading(observed_at=None, timestamp="2024-05-01 12:09:00")))
+        self.assertTrue(dedup.accept(reading(observed_at=None, timestamp="2024-05-01 12:30:00")))
+
+    def test_index_is_bounded(self):
+        dedup = DuplicateFilter(max_keys=2)
+        for dt in (1, 2, 3):
+            dedup.accept(reading(observed_at=dt))
+        self.assertEqual(dedup.stats()["tracked"], 2)
+        self.assertTrue(dedup.accept(reading(observed_at=1)))
+
+    def test_clear_forgets_keys(self):
+        dedup = DuplicateFilter()
+        dedup.accept(reading())
+        dedup.clear()
+        self.assertTrue(dedup.accept(reading()))
+
+
+if __name__ == "__main__":
+    unittest.main()
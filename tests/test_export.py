@@ -0,0 +1,95 @@
+"""
+Tests for core.export streaming exports
+"""
+import csv
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from core.export import DEFAULT_COLUMNS, PARQUET_AVAILABLE, ExportCancelled, ExportJob, chunked, export_chunks
+
+
+def rows(count, start=0):
+    return [{"DateTime": f"2024-01-01 00:{minute:02d}:00", "City": "Oslo", "Temperature": str(minute),
+             "Humidity": None, "Pressure": None} for minute in range(start, start + count)]
+
+
+class ExportTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp.name, name)
+
+    def test_chunked(self):
+        self.assertEqual([len(chunk) for chunk in chunked(range(7), 3)], [3, 3, 1])
+
+    def test_csv_round_trip(self):
+        path = self.path("out.csv")
+        written = export_chunks(chunked(rows(5), 2), path, columns=["DateTime", "Temperature"])
+        self.assertEqual(written, 5)
+        with open(path, newline="") as f:
+            exported = list(csv.DictReader(f))
+        self.assertEqual([row["Temperature"] for row in exported], ["0", "1", "2", "3", "4"])
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_jsonl(self):
+        path = self.path("out.jsonl")
+        export_chunks([rows(2)], path, columns=["City", "Humidity"])
+        with open(path) as f:
+            self.assertEqual([json.loads(line) for line in f], [{"City": "Oslo", "Humidity": None}] * 2)
+
+    def test_empty_export_keeps_full_header(self):
+        path = self.path("empty.csv")
+        self.assertEqual(export_chunks([], path), 0)
+        with open(path, newline="") as f:
+            self.assertEqual(next(csv.reader(f)), DEFAULT_COLUMNS)
+
+    def test_cancel_leaves_destination_untouched(self):
+        path = self.path("out.csv")
+        with open(path, "w") as f:
+            f.write("previous export")
+        cancel = threading.Event()
+
+        def chunks():
+            yield rows(2)
+            cancel.set()
+            yield rows(2, start=2)
+
+        with self.assertRaises(ExportCancelled):
+            export_chunks(chunks(), path, cancel_event=cancel)
+        with open(path) as f:
+            self.assertEqual(f.read(), "previous export")
+        self.assertFalse(os.path.exists(path + ".part"))
+
+    def test_unknown_format(self):
+        with self.assertRaises(ValueError):
+            export_chunks([rows(1)], self.path("out.xml"), fmt="xml")
+
+    def test_export_job(self):
+        job = ExportJob(chunked(rows(4), 2), self.path("job.jsonl"), total=4).start()
+        self.assertTrue(job.wait(5))
+        self.assertEqual((job.rows_written, job.fraction, job.error, job.fmt), (4, 1.0, None, "jsonl"))
+
+    @unittest.skipUnless(PARQUET_AVAILABLE, "pyarrow is not installed")
+    def test_parquet_schema_survives_empty_first_chunk(self):
+        import pyarrow.parquet as pq
+        path = self.path("out.parquet")
+        later = rows(2, start=2)
+        later[0]["Humidity"], later[1]["Pressure"] = 80, "1012.5"
+        export_chunks([rows(2), later], path, columns=["DateTime", "Temperature", "Humidity", "Pressure", "Note"])
+        table = pq.read_table(path)
+        self.assertEqual(str(table.schema.field("Humidity").type), "double")
+        self.assertEqual(table.column("Temperature").to_pylist(), [0.0, 1.0, 2.0, 3.0])
+        self.assertEqual(table.column("Pressure").to_pylist(), [None, None, None, 1012.5])
+        self.assertEqual(str(table.schema.field("Note").type), "string")
+
+
+if __name__ == "__main__":
+    unittest.main()
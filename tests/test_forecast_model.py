@@ -0,0 +1,95 @@
+"""
+Tests for services.forecast_model training pairs, predictions and versioned artifacts
+"""
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from core.history_dataset import HistoryDataset
+from core.ingest import city_slug, legacy_city_slug
+from services.forecast_model import (FEATURES, KEEP_VERSIONS, PAIRS_PER_READING, SKLEARN_AVAILABLE,
+                                     TemperatureModelRegistry, build_training_set)
+
+
+def hourly(city, hours=96, start=1709251200):
+    """A city's columns with a daily temperature cycle, one reading an hour"""
+    timestamps = start + 3600 * np.arange(hours)
+    temperatures = 10 + 5 * np.sin(2 * np.pi * np.arange(hours) / 24)
+    return HistoryDataset({"city": city, "timestamp": int(ts), "temperature": float(t), "humidity": 70,
+                           "wind_speed": 3, "pressure": 1012} for ts, t in zip(timestamps, temperatures))
+
+
+class TrainingSetTest(unittest.TestCase):
+
+    def test_pairs_each_reading_with_later_ones(self):
+        columns = hourly("Oslo", hours=20).city("Oslo")
+        features, target = build_training_set(columns)
+        pairs = sum(min(PAIRS_PER_READING, 19 - i) for i in range(20))
+        self.assertEqual(features.shape, (pairs, len(FEATURES)))
+        horizon = FEATURES.index("horizon")
+        np.testing.assert_allclose(features[:3, horizon], np.array([1, 2, 3]) / 24)
+        self.assertAlmostEqual(target[0], columns["temperature"][1] - columns["temperature"][0])
+
+    def test_empty_and_single_reading(self):
+        for hours in (0, 1):
+            features, target = build_training_set(hourly("Oslo", hours=hours).city("Oslo"))
+            self.assertEqual((features.shape, len(target)), ((0, len(FEATURES)), 0))
+
+
+@unittest.skipUnless(SKLEARN_AVAILABLE, "scikit-learn is not installed")
+class TemperatureModelRegistryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.datasets = {}
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def registry(self):
+        return TemperatureModelRegistry(lambda city: self.datasets[city].city(city), root=self.tmp.name)
+
+    def test_train_save_and_reload(self):
+        self.datasets["Oslo"] = hourly("Oslo")
+        registry = self.registry()
+        self.assertFalse(registry.maybe_retrain("Oslo", 10))
+        self.assertTrue(registry.maybe_retrain("oslo", 96))
+        registry.wait()
+        model = registry.get("Oslo")
+        self.assertEqual((model.city, model.version, model.rows), ("Oslo", 1, 96))
+
+        reloaded = self.registry().get("OSLO")
+        self.assertEqual(reloaded.version, 1)
+        columns = self.datasets["Oslo"].city("Oslo")
+        latest = {name: float(columns[name][-1]) for name in ("timestamp", "temperature", "humidity",
+                                                              "wind_speed", "pressure")}
+        single = reloaded.predict(latest, None, 6)
+        grid, confidence = registry.predict_many([model, None], [latest, latest], [None, None], [6, 12])
+        self.assertAlmostEqual(grid[0, 0], single)
+        self.assertTrue(np.isnan(grid[1]).all() and np.isnan(confidence[1]).all())
+
+    def test_old_versions_are_pruned(self):
+        self.datasets["Oslo"] = hourly("Oslo")
+        registry = self.registry()
+        for _ in range(KEEP_VERSIONS + 1):
+            registry.train("Oslo")
+        directory = Path(self.tmp.name) / "temperature" / city_slug("Oslo")
+        self.assertEqual(len(list(directory.glob("v*.pkl"))), KEEP_VERSIONS)
+        self.assertEqual(self.registry().get("Oslo").version, KEEP_VERSIONS + 1)
+
+    def test_a_shared_legacy_directory_only_serves_its_own_city(self):
+        # 'New-York' and 'New York' had the same directory name before city_slug
+        self.datasets["New-york"] = hourly("New-york")
+        self.registry().train("New-york")
+        root = Path(self.tmp.name) / "temperature"
+        (root / city_slug("New-york")).rename(root / legacy_city_slug("New York"))
+
+        registry = self.registry()
+        self.assertIsNone(registry.get("New York"))
+        self.assertEqual(registry.get("New-york").city, "New-york")
+
+
+if __name__ == "__main__":
+    unittest.main()
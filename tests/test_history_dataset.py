@@ -0,0 +1,77 @@
+"""
+Tests for core.history_dataset per-city arrays, including reads while a writer extends them
+"""
+import threading
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from core.history_dataset import HistoryDataset
+
+
+def hour(h):
+    return datetime(2024, 3, 1) + timedelta(hours=h)
+
+
+class HistoryDatasetTest(unittest.TestCase):
+
+    def test_rows_by_header_or_field_name(self):
+        dataset = HistoryDataset([{"City": "oslo", "DateTime": hour(1), "Temperature": "2.5", "Humidity": ""},
+                                  {"city": "Oslo", "timestamp": hour(0), "temperature": 1.0},
+                                  {"city": "Lima", "timestamp": hour(2), "temperature": None},
+                                  {"city": "Lima", "timestamp": "not a time", "temperature": 3.0}])
+        self.assertEqual((len(dataset), dataset.cities()), (2, ["Oslo"]))
+        oslo = dataset.city("OSLO")
+        np.testing.assert_array_equal(oslo["temperature"], [2.5, 1.0])
+        self.assertTrue(np.isnan(oslo["humidity"]).all())
+        self.assertEqual(len(dataset.city("Lima")["temperature"]), 0)
+
+    def test_stats_trend_and_grouping(self):
+        dataset = HistoryDataset({"city": "Oslo", "timestamp": hour(h), "temperature": 2.0 * h} for h in range(10))
+        dataset.extend([{"city": "Lima", "timestamp": hour(h), "temperature": 20.0} for h in range(3)])
+        self.assertEqual(dataset.stats("Oslo", limit=3)["mean"], 16.0)
+        self.assertAlmostEqual(dataset.trend("Oslo"), 2.0)
+        self.assertIsNone(dataset.trend("Lima", column="humidity"))
+        columns, slices = dataset.grouped()
+        self.assertEqual(list(slices), ["Lima", "Oslo"])
+        np.testing.assert_array_equal(columns["temperature"][slices["Lima"]], [20.0] * 3)
+        np.testing.assert_array_equal(dataset.recent(2)["temperature"], [16.0, 18.0])
+
+    def test_views_survive_growth(self):
+        dataset = HistoryDataset([{"city": "Oslo", "timestamp": hour(0), "temperature": 1.0}])
+        view = dataset.city("Oslo")["temperature"]
+        dataset.extend({"city": "Oslo", "timestamp": hour(h), "temperature": float(h)} for h in range(1, 600))
+        np.testing.assert_array_equal(view, [1.0])
+        self.assertEqual(len(dataset.city("Oslo")["temperature"]), 600)
+
+    def test_reads_while_another_thread_extends(self):
+        dataset = HistoryDataset()
+        errors = []
+
+        def writer():
+            for h in range(2000):
+                dataset.extend([{"city": f"City {h % 7}", "timestamp": hour(h), "temperature": float(h)}])
+
+        def reader():
+            try:
+                while thread.is_alive():
+                    columns, slices = dataset.grouped()
+                    for city, rows in slices.items():
+                        data = dataset.city(city)
+                        self.assertEqual(len(data["timestamp"]), len(data["temperature"]))
+                        self.assertLessEqual(rows.stop - rows.start, len(data["temperature"]))
+                    dataset.recent(5)
+            except Exception as e:  # reported on the main thread
+                errors.append(e)
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        reader()
+        thread.join()
+        self.assertEqual(errors, [])
+        self.assertEqual(len(dataset), 2000)
+
+
+if __name__ == "__main__":
+    unittest.main()
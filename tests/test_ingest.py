@@ -0,0 +1,118 @@
+"""
+Tests for core.ingest log normalization and legacy logs behind CsvBackend
+"""
+import contextlib
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from core.ingest import (CANONICAL_HEADER, canonical_city, is_normalized, iter_legacy_rows,
+                         normalize_log_file, to_metric, validate_observation)
+from core.migrate import main as migrate
+from core.repository import CsvBackend, ObservationRepository
+
+LEGACY_LOG = """DateTime           , City     , Temperature, Description
+2025-07-14 21:38:45, baltimore,       73.99, Overcast clouds
+2025-07-14 21:39:54, new   york ,     55.08, Light rain
+not a timestamp    , miami    ,       74.39, Overcast clouds
+2025-07-17 20:02:29,chicago,18.5,Overcast clouds,metric,76,1.34
+"""
+
+
+class LegacyLogTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.log_file = os.path.join(self.tmp, "weather_log.csv")
+        with open(self.log_file, "w", newline="") as f:
+            f.write(LEGACY_LOG)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+
+class IngestTest(LegacyLogTestCase):
+
+    def test_canonical_city(self):
+        self.assertEqual(canonical_city(" new   york "), "New York")
+        self.assertEqual(canonical_city("st. john's"), "St. John's")
+        self.assertIs(canonical_city("oslo"), canonical_city("OSLO"))
+
+    def test_validate_observation(self):
+        row = validate_observation({"DateTime": "2025-01-01 00:00:00", "City": "rome",
+                                    "Temperature": " 12.5 ", "Humidity": "n/a", "WindSpeed": "None"})
+        self.assertEqual((row["City"], row["Temperature"], row["Humidity"], row["WindSpeed"]),
+                         ("Rome", "12.5", "", ""))
+        with self.assertRaises(ValueError):
+            validate_observation({"DateTime": "2025-01-01 00:00:00", "City": "rome", "Temperature": "warm"})
+
+    def test_to_metric(self):
+        record = to_metric({"unit": "imperial", "temperature": "50", "feels_like": 41.0, "wind_speed": 10})
+        self.assertEqual((record["unit"], record["temperature"], record["feels_like"], record["wind_speed"]),
+                         ("metric", 10.0, 5.0, 4.47))
+        self.assertEqual(to_metric({"temperature": 50}, default_unit="imperial")["temperature"], 10.0)
+        self.assertEqual(to_metric({"temperature": 10})["unit"], "metric")
+        self.assertEqual(to_metric({"unit": "standard", "temperature": 283.15})["temperature"], 283.15)
+
+    def test_legacy_rows_map_surplus_values(self):
+        rows = list(iter_legacy_rows(self.log_file))
+        self.assertEqual(rows[0]["City"], " baltimore")
+        self.assertEqual((rows[3]["Unit"], rows[3]["WindSpeed"]), ("metric", "1.34"))
+
+    def test_normalize_once(self):
+        report = normalize_log_file(self.log_file)
+        self.assertEqual((report["rows"], report["dropped"], report["cities"]), (3, 1, 3))
+        self.assertTrue(is_normalized(self.log_file))
+        self.assertTrue(os.path.exists(self.log_file + ".legacy"))
+        self.assertEqual(CsvBackend(self.log_file).latest("Baltimore", 1)[0]["Unit"], "metric")
+        with open(self.log_file, newline="") as f:
+            self.assertEqual(next(csv.reader(f)), CANONICAL_HEADER)
+        self.assertFalse(normalize_log_file(self.log_file)["migrated"])
+
+    def test_migrate_cli(self):
+        with contextlib.redirect_stdout(io.StringIO()):
+            migrate([self.log_file, "--no-backup"])
+        self.assertTrue(is_normalized(self.log_file))
+        self.assertFalse(os.path.exists(self.log_file + ".legacy"))
+
+    def test_missing_log_is_created(self):
+        path = os.path.join(self.tmp, "new", "log.csv")
+        backend = CsvBackend(path)
+        self.assertFalse(backend.legacy)
+        self.assertTrue(is_normalized(path))
+
+
+class LegacyCsvBackendTest(LegacyLogTestCase):
+
+    def test_legacy_log_is_read_in_place(self):
+        with open(self.log_file, "rb") as f:
+            original = f.read()
+        backend = CsvBackend(self.log_file)
+        self.assertTrue(backend.legacy)
+        self.assertEqual([row["City"] for row in backend.range()], ["Baltimore", "New York", "Chicago"])
+        # Rows without a unit were logged in °F; reads are metric
+        self.assertEqual(backend.latest("NEW YORK", 5)[0]["Temperature"], "12.82")
+        self.assertEqual(backend.latest("chicago", 1)[0]["Temperature"], "18.5")
+        self.assertEqual(len(backend.range(start="2025-07-15 00:00:00")), 1)
+        with open(self.log_file, "rb") as f:
+            self.assertEqual(f.read(), original)
+        self.assertFalse(is_normalized(self.log_file))
+
+    def test_writes_append_to_legacy_log(self):
+        repository = ObservationRepository(CsvBackend(self.log_file))
+        repository.write({"city": "oslo", "temperature": 3.5, "description": "Snow",
+                          "unit": "metric", "humidity": 80, "wind_speed": 4.0}, "2025-07-18 08:00:00")
+        self.assertTrue(repository.flush(5))
+        rows = repository.latest(limit=2)
+        self.assertEqual([row["City"] for row in rows], ["Chicago", "Oslo"])
+        repository.close()
+        # The appended row survives a later migration
+        normalize_log_file(self.log_file)
+        self.assertEqual(CsvBackend(self.log_file).latest(limit=1)[0]["Unit"], "metric")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,88 @@
+"""
+Tests for models.ml_models sequence windows and batched feature extraction
+"""
+import unittest
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from models.ml_models import MLDataPreprocessor, MLEnhancedWeatherData
+
+
+def weather(when, temperature=12.5, **fields):
+    values = dict(city="Oslo", temperature=temperature, description="clear", humidity=55, wind_speed=4.2,
+                  pressure=1008.0, visibility=10.0, cloudiness=20, unit_system="metric", datetime=when)
+    values.update(fields)
+    return MLEnhancedWeatherData(**values)
+
+
+def reference_features(record):
+    """One row built with normalize_features, the per-record original"""
+    normalized = MLDataPreprocessor.normalize_features(record)
+    row = [normalized.get(name, 0.0) for name in MLDataPreprocessor.FEATURE_NAMES]
+    row[-1] = record["season"] / 3 if "season" in record else 0.0
+    return row
+
+
+class CreateSequencesTest(unittest.TestCase):
+
+    def setUp(self):
+        self.temperatures = np.arange(20, dtype=np.float32)
+
+    def test_windows_and_targets_match_a_loop(self):
+        windows, targets = MLDataPreprocessor.create_sequences(self.temperatures, sequence_length=4,
+                                                               horizons=[1, 3], stride=2)
+        starts = range(0, 20 - 4 - 3 + 1, 2)
+        np.testing.assert_array_equal(windows[:, :, 0], [self.temperatures[i:i + 4] for i in starts])
+        np.testing.assert_array_equal(targets, [[self.temperatures[i + 4], self.temperatures[i + 6]]
+                                                for i in starts])
+        self.assertTrue(np.shares_memory(windows, windows[0]))  # views, not copies
+
+    def test_single_horizon_and_record_input(self):
+        records = [{"temperature": float(t), "humidity": 50 + t} for t in range(10)]
+        windows, targets = MLDataPreprocessor.create_sequences(records, sequence_length=3, horizons=2,
+                                                               columns=["temperature", "humidity"])
+        self.assertEqual((windows.shape, targets.shape), ((6, 3, 2), (6,)))
+        np.testing.assert_array_equal(windows[1], [[1, 51], [2, 52], [3, 53]])
+        np.testing.assert_array_equal(targets[:2], [4, 5])
+        columns = {"temperature": self.temperatures[:10]}
+        np.testing.assert_array_equal(MLDataPreprocessor.create_sequences(columns, 3, 2)[1], targets)
+
+    def test_short_and_invalid_input(self):
+        windows, targets = MLDataPreprocessor.create_sequences(self.temperatures[:4], sequence_length=4,
+                                                               horizons=[1, 2])
+        self.assertEqual((windows.shape, targets.shape), ((0, 4, 1), (0, 2)))
+        for kwargs in ({"sequence_length": 0}, {"stride": 0}, {"horizons": [1, 0]}):
+            with self.assertRaises(ValueError):
+                MLDataPreprocessor.create_sequences(self.temperatures, **kwargs)
+
+
+class ExtractFeatureMatrixTest(unittest.TestCase):
+
+    def test_matches_per_record_features(self):
+        start = datetime(2024, 1, 1, 5)
+        data = [weather(start + timedelta(hours=37 * i), temperature=-10.0 + 3 * i) for i in range(12)]
+        matrix = MLDataPreprocessor.extract_feature_matrix(data, dtype=np.float64)
+        self.assertEqual(matrix.shape, (12, len(MLDataPreprocessor.FEATURE_NAMES)))
+        np.testing.assert_allclose(matrix, [reference_features(record.to_dict()) for record in data])
+        np.testing.assert_allclose(MLDataPreprocessor.extract_features(data[3]), matrix[3])
+
+    def test_column_arrays_with_epoch_timestamps(self):
+        # Hourly across the March DST change (where the local zone has one)
+        start = datetime(2024, 3, 30, 22).timestamp()
+        data = [weather(datetime.fromtimestamp(start + 3600 * h)) for h in range(30)]
+        columns = {name: np.array([getattr(record, name) for record in data], dtype=np.float64)
+                   for name in ("temperature", "humidity", "wind_speed", "pressure", "visibility", "cloudiness")}
+        columns["timestamp"] = np.array([record.datetime.timestamp() for record in data])
+        matrix = MLDataPreprocessor.extract_feature_matrix(columns, dtype=np.float64)
+        np.testing.assert_allclose(matrix, [reference_features(record.to_dict()) for record in data], atol=1e-12)
+
+    def test_absent_inputs_give_zero_features(self):
+        records = [{"temperature": 10.0, "hour": 6}, {"humidity": 50}]
+        matrix = MLDataPreprocessor.extract_feature_matrix(records, dtype=np.float64)
+        np.testing.assert_allclose(matrix, [reference_features(record) for record in records])
+        self.assertEqual(MLDataPreprocessor.extract_feature_matrix([]).shape, (0, len(MLDataPreprocessor.FEATURE_NAMES)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,155 @@
+"""
+Tests for core.observation_store: schema migrations, rollups and units
+"""
+import os
+import sqlite3
+import tempfile
+import unittest
+
+from core.observation_store import STORE_SCHEMA_VERSION, ObservationStore
+
+# The observations table as written before rollups existed (schema v0-v2)
+_OLD_SCHEMA = """
+CREATE TABLE cities (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE COLLATE NOCASE);
+CREATE TABLE observations (
+    id INTEGER PRIMARY KEY, city_id INTEGER NOT NULL, timestamp TEXT NOT NULL,
+    temperature REAL NOT NULL, description TEXT, unit TEXT, humidity REAL, wind_speed REAL,
+    visibility INTEGER, cloudiness INTEGER, pressure REAL, wind_direction INTEGER, feels_like REAL,
+    sunrise INTEGER, sunset INTEGER, rain_1h REAL, rain_3h REAL, snow_1h REAL, snow_3h REAL
+);
+"""
+
+
+def reading(city, timestamp, temperature, **fields):
+    return dict(fields, city=city, timestamp=timestamp, temperature=temperature)
+
+
+class ObservationStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "observations.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self):
+        store = ObservationStore(self.db_path)
+        self.addCleanup(store.close)
+        return store
+
+    def old_database(self, version, cities, rows):
+        conn = sqlite3.connect(self.db_path)
+        conn.executescript(_OLD_SCHEMA)
+        conn.executemany("INSERT INTO cities VALUES (?, ?)", cities)
+        conn.executemany("INSERT INTO observations (city_id, timestamp, temperature, unit, wind_speed) "
+                         "VALUES (?, ?, ?, ?, ?)", rows)
+        conn.execute(f"PRAGMA user_version = {version}")
+        conn.commit()
+        conn.close()
+
+    def test_round_trip(self):
+        store = self.open()
+        self.assertEqual(store.add_many([reading("new york", "2024-01-01 10:00:00", 5.0, humidity=80),
+                                         reading("", "2024-01-01 10:00:00", 5.0),
+                                         reading("Oslo", "2024-01-01 10:00:00", None)]), 1)
+        [row] = store.range("NEW YORK")
+        self.assertEqual((row["City"], row["Temperature"], row["Humidity"], row["Unit"]),
+                         ("New York", 5.0, 80.0, "metric"))
+        self.assertEqual(store.migrated_from, 0)  # a new database counts as migrated from version 0
+        self.assertIsNone(self.open().migrated_from)
+
+    def test_migration_from_v0(self):
+        self.old_database(0, [(1, "new york "), (2, "New York"), (3, "oslo")], [
+            (1, "2024-01-01 10:00:00", 50.0, None, None),      # legacy log row, °F
+            (2, "2024-01-01 11:00:00", 68.0, "imperial", 10.0),
+            (3, "2024-01-01 10:30:00", 3.0, "metric", 2.0),
+        ])
+        store = self.open()
+        self.assertEqual(store.migrated_from, 0)
+        self.assertEqual(store.cities(), ["New York", "Oslo"])
+        rows = store.range("new york")
+        self.assertEqual([(row["Temperature"], row["Unit"]) for row in rows], [(10.0, "metric"), (20.0, "metric")])
+        self.assertAlmostEqual(rows[1]["WindSpeed"], 4.47)
+        self.assertEqual(store.range("oslo")[0]["Temperature"], 3.0)
+        [day] = store.rollups("New York", "day")
+        self.assertEqual((day["count"], day["mean"], day["min"], day["max"]), (2, 15.0, 10.0, 20.0))
+        self.assertEqual(len(store.rollups("New York", "hour")), 2)
+        with sqlite3.connect(self.db_path) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version").fetchone()[0], STORE_SCHEMA_VERSION)
+
+    def test_migration_keeps_rollups_of_pruned_rows(self):
+        store = self.open()
+        store.add_many([reading("Oslo", f"2024-01-0{day} 12:00:00", float(day)) for day in (1, 2, 3)] +
+                       [reading("Oslo", "2024-01-03 18:00:00", 9.0)])
+        store.prune("2024-01-03 13:00:00")
+        store.close()
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("PRAGMA user_version = 5")
+        store = self.open()
+        self.assertEqual(store.migrated_from, 5)
+        self.assertEqual([(day["bucket"], day["count"]) for day in store.rollups("Oslo", "day")],
+                         [("2024-01-01", 1), ("2024-01-02", 1), ("2024-01-03", 2)])
+        self.assertEqual(store.rollup_summary("Oslo")["count"], 4)
+
+    def test_imperial_writes_are_stored_metric(self):
+        store = self.open()
+        store.add_many([reading("Baltimore", "2024-07-01 12:00:00", 86.0, unit="imperial", feels_like=95.0),
+                        reading("Baltimore", "2024-07-01 13:00:00", 28.0, unit="metric")])
+        [day] = store.rollups("Baltimore")
+        self.assertEqual((day["min"], day["max"]), (28.0, 30.0))
+        self.assertEqual(store.range()[0]["FeelsLike"], 35.0)
+
+    def test_rollups_count_precipitation_once_per_hour(self):
+        store = self.open()
+        store.add_many([reading("Rome", "2024-02-01 10:05:00", 10.0, rain_1h=1.0),
+                        reading("Rome", "2024-02-01 10:35:00", 11.0, rain_1h=1.5)])
+        store.add_many([reading("Rome", "2024-02-01 10:50:00", 11.0, rain_1h=1.2),
+                        reading("Rome", "2024-02-01 11:10:00", 11.0, rain_1h=0.5, snow_1h=0.5)])
+        self.assertEqual([hour["precipitation"] for hour in store.rollups("Rome", "hour")], [1.5, 1.0])
+        self.assertEqual(store.rollups("Rome", "day")[0]["precipitation"], 2.5)
+
+    def test_rollup_summary_and_window(self):
+        store = self.open()
+        store.add_many([reading("Lima", f"2024-03-0{day} 0{hour}:00:00", day + hour, wind_direction=90)
+                        for day in (1, 2) for hour in (1, 2)])
+        summary = store.rollup_summary("lima", start="2024-03-02 00:00:00")
+        self.assertEqual((summary["days"], summary["count"], summary["mean"]), (1, 2, 3.5))
+        self.assertEqual(store.rollups("lima", "hour")[0]["wind_direction"], 90.0)
+        self.assertIsNone(store.rollup_summary("Nowhere"))
+        with self.assertRaises(ValueError):
+            store.rollups("lima", "week")
+
+    def test_as_of_and_chunks(self):
+        store = self.open()
+        store.add_many([reading("Oslo", f"2024-01-01 0{hour}:00:00", hour) for hour in range(6)])
+        window = store.as_of("oslo", "2024-01-01 03:30:00", before=1, after=2)
+        self.assertEqual(window["observation"]["Temperature"], 3.0)
+        self.assertEqual([row["Temperature"] for row in window["previous"] + window["next"]], [2.0, 4.0, 5.0])
+        self.assertEqual([len(chunk) for chunk in store.iter_chunks(chunk_size=4)], [4, 2])
+
+    def test_import_csv_treats_unitless_rows_as_fahrenheit(self):
+        log_file = os.path.join(self.tmp.name, "weather_log.csv")
+        with open(log_file, "w") as f:
+            f.write("DateTime           , City     , Temperature, Description\n"
+                    "2025-07-14 21:38:45, baltimore,       73.4, Overcast clouds\n"
+                    "2025-07-17 20:02:29,chicago,18.5,Overcast clouds,metric,76,1.34\n")
+        store = self.open()
+        self.assertEqual(store.import_csv(log_file), 2)
+        self.assertEqual([(row["City"], row["Temperature"]) for row in store.range()],
+                         [("Baltimore", 23.0), ("Chicago", 18.5)])
+
+    def test_prune_archives_and_clear(self):
+        store = self.open()
+        store.add_many([reading("Oslo", f"2024-01-0{day} 12:00:00", day) for day in (1, 2, 3)])
+        archived = []
+        self.assertEqual(store.prune("2024-01-03 00:00:00", archive=archived.extend), 2)
+        self.assertEqual([row["DateTime"] for row in archived], ["2024-01-01 12:00:00", "2024-01-02 12:00:00"])
+        self.assertEqual(store.oldest(), {"Oslo": "2024-01-03 12:00:00"})
+        self.assertEqual(len(store.rollups("Oslo")), 3)
+        self.assertEqual(store.clear(), 1)
+        self.assertEqual(store.rollups("Oslo"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
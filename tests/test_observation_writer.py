@@ -0,0 +1,80 @@
+"""
+Tests for core.observation_writer batching and failure reporting
+"""
+import contextlib
+import csv
+import io
+import os
+import tempfile
+import threading
+import unittest
+
+from core.observation_writer import BufferedWriter, csv_append_sink
+
+
+class BufferedWriterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.batches = []
+        self.writer = BufferedWriter(self.batches.append, name="test-writer",
+                                     max_batch=3, flush_interval=60.0)
+
+    def tearDown(self):
+        self.writer.close()
+
+    def test_flush_writes_everything_submitted(self):
+        for value in range(5):
+            self.writer.submit(value)
+        self.assertTrue(self.writer.flush(5))
+        self.assertEqual([value for batch in self.batches for value in batch], list(range(5)))
+        self.assertEqual(self.writer.stats()["records_written"], 5)
+        self.assertEqual(self.writer.queue_depth, 0)
+
+    def test_full_batch_is_written_without_flush(self):
+        written = threading.Event()
+        writer = BufferedWriter(lambda batch: written.set(), max_batch=2, flush_interval=60.0)
+        writer.submit(1)
+        writer.submit(2)
+        self.assertTrue(written.wait(5))
+        writer.close()
+
+    def test_close_drains_and_rejects_new_records(self):
+        self.writer.submit("a")
+        self.writer.close()
+        self.assertEqual(self.batches, [["a"]])
+        with self.assertRaises(RuntimeError):
+            self.writer.submit("b")
+
+    def test_failed_batch_is_reported_once(self):
+        fail = [True]
+
+        def sink(batch):
+            if fail[0]:
+                raise OSError("disk full")
+
+        writer = BufferedWriter(sink, max_batch=10, flush_interval=60.0)
+        writer.submit(1)
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.assertFalse(writer.flush(5))
+        fail[0] = False
+        writer.submit(2)
+        self.assertTrue(writer.flush(5))
+        stats = writer.stats()
+        self.assertEqual((stats["errors"], stats["records_dropped"], stats["records_written"]), (1, 1, 1))
+        writer.close()
+
+
+class CsvAppendSinkTest(unittest.TestCase):
+
+    def test_header_written_once(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "log.csv")
+            sink = csv_append_sink(path, header=["City", "Temperature"])
+            sink([{"City": "Oslo", "Temperature": 1}])
+            sink([["Rome", 20]])
+            with open(path, newline="") as f:
+                self.assertEqual(list(csv.reader(f)), [["City", "Temperature"], ["Oslo", "1"], ["Rome", "20"]])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,128 @@
+"""
+Tests for core.repository: queued reads, mirrors, pruning into the series archive and clearing
+"""
+import csv
+import gzip
+import os
+import tempfile
+import unittest
+
+from core.observation_store import ObservationStore
+from core.repository import ObservationBackend, ObservationRepository, SQLiteBackend
+from core.series_archive import SeriesArchive
+
+
+def reading(city, timestamp, temperature, **fields):
+    return dict(fields, city=city, timestamp=timestamp, temperature=temperature, unit="metric")
+
+
+class RecordingBackend(ObservationBackend):
+    """Mirror that keeps what it was given, or raises when `fail` is set"""
+
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.records = []
+
+    def write_many(self, records):
+        if self.fail:
+            raise OSError("disk full")
+        self.records.extend(records)
+        return len(records)
+
+    def latest(self, city=None, limit=7):
+        return []
+
+    def range(self, city=None, start=None, end=None):
+        return []
+
+
+class ObservationRepositoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ObservationStore(os.path.join(self.tmp.name, "observations.db"))
+        self.archive = SeriesArchive(os.path.join(self.tmp.name, "series"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self, mirrors=(), flush_interval=3600.0):
+        repository = ObservationRepository(SQLiteBackend(self.store, self.archive), mirrors=mirrors)
+        repository.writer.flush_interval = flush_interval  # batches land only on flush()
+        self.addCleanup(repository.close)
+        return repository
+
+    def test_queued_rows_are_read_without_flushing(self):
+        repository = self.open()
+        self.store.add_many([reading("Oslo", "2024-01-01 09:00:00", 1.0)])
+        self.assertEqual(len(repository.latest("Oslo")), 1)  # cached before the writes below
+        repository.write(reading("oslo", "2024-01-01 10:00:00", 2.0))
+        repository.write(reading("Lima", "2024-01-01 11:00:00", 20.0))
+        repository.write({"city": "Lima", "timestamp": "2024-01-01 12:00:00"})  # skipped by the store
+
+        self.assertEqual([row["Temperature"] for row in repository.latest("Oslo")], [1.0, 2.0])
+        self.assertEqual([row["City"] for row in repository.range()], ["Oslo", "Oslo", "Lima"])
+        self.assertEqual(len(repository.range("Oslo", start="2024-01-01 09:30:00")), 1)
+        self.assertEqual(repository.latest_per_city()["Lima"][0]["Temperature"], 20.0)
+        self.assertEqual(repository.cities(), ["Lima", "Oslo"])
+        self.assertEqual(repository.count(), 3)
+        window = repository.as_of("Oslo", "2024-01-01 09:30:00", after=1)
+        self.assertEqual(window["observation"]["Temperature"], 1.0)
+        self.assertEqual(window["next"][0]["Temperature"], 2.0)
+        self.assertEqual(repository.writer.stats()["batches"], 0)
+
+        # Once written, each row is read exactly once, and cached results were not modified
+        self.assertTrue(repository.flush())
+        self.assertEqual(len(repository.latest("Oslo")), 2)
+        self.assertEqual(repository.count(), 3)
+        self.assertEqual(self.store.count(), 3)
+
+    def test_iter_chunks_flushes_when_iterated(self):
+        repository = self.open()
+        repository.write(reading("Oslo", "2024-01-01 10:00:00", 2.0))
+        chunks = repository.iter_chunks(chunk_size=10)
+        self.assertEqual(repository.writer.stats()["batches"], 0)
+        self.assertEqual([len(chunk) for chunk in chunks], [1])
+
+    def test_failing_mirror_does_not_stop_the_others(self):
+        broken, healthy = RecordingBackend(fail=True), RecordingBackend()
+        repository = self.open(mirrors=[broken, healthy])
+        repository.write(reading("Oslo", "2024-01-01 10:00:00", 2.0))
+        self.assertTrue(repository.flush())
+        self.assertEqual(len(healthy.records), 1)
+        self.assertEqual(self.store.count(), 1)
+
+    def test_failed_batch_is_reported_and_not_shown(self):
+        repository = self.open()
+        self.store.close()  # the primary backend now raises
+        repository.write(reading("Oslo", "2024-01-01 10:00:00", 2.0))
+        self.assertFalse(repository.flush())
+        self.assertEqual(repository._pending, [])
+
+    def test_pruned_rows_are_read_from_the_archive(self):
+        repository = self.open()
+        repository.write_many([reading("Oslo", f"2024-01-0{day} 10:00:00", float(day)) for day in (1, 2, 3)])
+        self.assertEqual(repository.prune("2024-01-03 00:00:00"), 2)
+        self.assertEqual(self.store.count(), 1)
+        self.assertEqual([row["Temperature"] for row in repository.range("Oslo")], [1.0, 2.0, 3.0])
+        self.assertEqual(repository.count("Oslo"), 3)
+        self.assertEqual(repository.as_of("Oslo", "2024-01-02 12:00:00")["observation"]["Temperature"], 2.0)
+        self.assertEqual(len(repository.rollups("Oslo", "day")), 3)  # rollups outlive pruning
+
+    def test_clear_exports_stored_and_archived_rows(self):
+        repository = self.open()
+        repository.write_many([reading("Oslo", f"2024-01-0{day} 10:00:00", float(day)) for day in (1, 2)])
+        repository.prune("2024-01-02 00:00:00")
+        export = os.path.join(self.tmp.name, "history.csv.gz")
+
+        self.assertEqual(repository.clear(export), 2)
+        with gzip.open(export, "rt", newline="") as f:
+            self.assertEqual([row["DateTime"] for row in csv.DictReader(f)],
+                             ["2024-01-01 10:00:00", "2024-01-02 10:00:00"])
+        self.assertEqual((repository.range(), repository.cities(), self.archive.cities()), ([], [], []))
+        # The duplicate filter was reset, so the same reading can be recorded again
+        self.assertTrue(repository.write(reading("Oslo", "2024-01-02 10:00:00", 2.0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""
+Tests for core.running_stats moments, anomaly flags and throttled persistence
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from core import running_stats
+from core.running_stats import RunningMoments, RunningStats
+
+
+def readings(city, temperatures, start=0):
+    return [{"city": city, "timestamp": f"2024-03-01 {start + h:02d}:00:00",
+             "temperature": temperature} for h, temperature in enumerate(temperatures)]
+
+
+class RunningMomentsTest(unittest.TestCase):
+
+    def test_matches_numpy(self):
+        values = np.random.default_rng(7).normal(15, 4, 500)
+        moments = RunningMoments()
+        for value in values:
+            moments.update(float(value))
+        self.assertEqual(moments.count, 500)
+        self.assertAlmostEqual(moments.mean, values.mean())
+        self.assertAlmostEqual(moments.std, values.std(ddof=1))
+        self.assertEqual((moments.min, moments.max), (values.min(), values.max()))
+        self.assertEqual(RunningMoments.from_dict(moments.to_dict()).to_dict(), moments.to_dict())
+
+
+class RunningStatsTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "running_stats.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_flags_a_reading_far_from_the_recent_mean(self):
+        stats = RunningStats(self.path)
+        self.assertEqual(stats.update_many(readings("oslo", [10.0, 10.5, 9.5, 10.0, 10.2])), [])
+        [flag] = stats.update_many(readings("Oslo", [25.0, 10.1], start=5))
+        self.assertEqual((flag["city"], flag["metric"], flag["value"], flag["reading"]),
+                         ("Oslo", "temperature", 25.0, 6))
+        self.assertGreater(flag["z_score"], stats.threshold)
+        self.assertEqual(len(stats.anomalies("OSLO", "temperature", last=2)), 1)
+        self.assertEqual(stats.anomalies("Oslo", last=1), [])
+        self.assertIsNone(stats.zscore("Lima", "temperature", 20.0))
+        self.assertEqual(stats.summary("Oslo")["count"], 7)
+
+    def test_round_trip(self):
+        stats = RunningStats(self.path)
+        stats.update_many(readings("Oslo", [1.0, 2.0, 3.0]) + [{"City": "Lima", "DateTime": "bad", "Temperature": 1}])
+        stats.save()
+        loaded = RunningStats(self.path)
+        self.assertTrue(loaded.loaded)
+        self.assertEqual(loaded.observations, 3)
+        self.assertEqual(loaded.summary("Oslo"), stats.summary("Oslo"))
+        self.assertFalse(RunningStats(self.path, alpha=0.5).loaded)
+
+    def test_listener_saves_every_so_many_rows(self):
+        stats = RunningStats(self.path)
+        with mock.patch.object(running_stats, "SAVE_EVERY_ROWS", 4):
+            stats.on_written(readings("Oslo", [1.0, 2.0, 3.0]))
+            self.assertFalse(os.path.exists(self.path))
+            stats.on_written(readings("Oslo", [4.0], start=3))
+            self.assertEqual(RunningStats(self.path).observations, 4)
+            stats.on_written(readings("Oslo", [5.0], start=4))
+            stats.on_written(None)  # a wholesale reset is left to the owner
+        self.assertEqual(RunningStats(self.path).observations, 4)
+        stats.save()  # what the owner does at shutdown
+        self.assertEqual(RunningStats(self.path).observations, 5)
+
+    def test_listener_saves_after_the_interval(self):
+        stats = RunningStats(self.path)
+        with mock.patch.object(running_stats, "SAVE_INTERVAL", 0):
+            stats.on_written(readings("Oslo", [1.0]))
+        self.assertEqual(RunningStats(self.path).observations, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
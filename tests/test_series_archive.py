@@ -0,0 +1,121 @@
+"""
+Tests for core.series_archive compressed blocks, file naming and reads through the repository
+"""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from core.ingest import city_slug, legacy_city_slug
+from core.observation_store import ObservationStore
+from core.repository import ObservationRepository, SQLiteBackend
+from core.series_archive import SeriesArchive
+
+
+def hour(h):
+    return f"2024-03-01 {h:02d}:00:00"
+
+
+class SeriesArchiveTest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp.name) / "series"
+        self.archive = SeriesArchive(str(self.root), block_size=4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_across_blocks(self):
+        rows = [{"city": "oslo", "timestamp": hour(h), "temperature": -3.27 + h, "humidity": 80.5,
+                 "pressure": None, "description": "snow" if h % 2 else "fog", "unit": "metric"}
+                for h in range(10)]
+        rows.append({"city": "Oslo", "timestamp": hour(11), "temperature": None})  # nothing to archive
+        self.assertEqual(self.archive.append(rows), 10)
+        self.assertEqual(self.archive.stats()["blocks"], 3)
+
+        # A fresh instance indexes the file from disk
+        archived = SeriesArchive(str(self.root)).rows("OSLO")
+        self.assertEqual([row["DateTime"] for row in archived], [hour(h) for h in range(10)])
+        self.assertEqual([row["Temperature"] for row in archived], [round(-3.27 + h, 2) for h in range(10)])
+        self.assertEqual((archived[1]["City"], archived[1]["Humidity"], archived[1]["Pressure"],
+                          archived[1]["Description"]), ("Oslo", 80.5, None, "snow"))
+
+    def test_scan_filters_and_restores_time_order(self):
+        self.archive.append([{"city": "Oslo", "timestamp": hour(h), "temperature": h} for h in range(5, 9)])
+        self.archive.append([{"City": "Oslo", "DateTime": hour(h), "Temperature": h} for h in range(5)])  # backfill
+        np.testing.assert_array_equal(self.archive.scan("Oslo", columns=["temperature"])["temperature"],
+                                      np.arange(9))
+        warm = self.archive.scan("Oslo", start=hour(2), columns=["temperature"], temperature=(6, None))
+        np.testing.assert_array_equal(warm["temperature"], [6, 7, 8])
+        with self.assertRaises(ValueError):
+            self.archive.scan("Oslo", columns=["dew_point"])
+
+    def test_names_that_reduce_to_the_same_ascii_get_their_own_files(self):
+        self.archive.append([{"city": "São Paulo", "timestamp": hour(1), "temperature": 25},
+                             {"city": "Sao Paulo", "timestamp": hour(1), "temperature": 5}])
+        self.assertEqual(sorted(path.name for path in self.root.iterdir()),
+                         sorted(f"{city_slug(name)}.wxts" for name in ("São Paulo", "Sao Paulo")))
+        self.assertEqual(self.archive.rows("São Paulo")[0]["Temperature"], 25)
+        self.assertEqual(self.archive.rows("Sao Paulo")[0]["Temperature"], 5)
+
+    def test_legacy_file_is_adopted_only_by_its_city(self):
+        self.archive.append([{"city": "São Paulo", "timestamp": hour(1), "temperature": 25}])
+        legacy = self.root / f"{legacy_city_slug('São Paulo')}.wxts"
+        os.rename(self.root / f"{city_slug('São Paulo')}.wxts", legacy)
+
+        reopened = SeriesArchive(str(self.root))
+        self.assertEqual(len(reopened.rows("Sao Paulo")), 0)  # 's_o_paulo' is not Sao Paulo's file
+        self.assertTrue(legacy.exists())
+        self.assertEqual(reopened.rows("São Paulo")[0]["Temperature"], 25)
+        self.assertFalse(legacy.exists())
+
+    def test_clear(self):
+        self.archive.append([{"city": "Oslo", "timestamp": hour(1), "temperature": 1}])
+        self.archive.clear()
+        self.assertEqual((self.archive.cities(), self.archive.rows("Oslo")), ([], []))
+
+
+class ArchivedHistoryReadBackTest(unittest.TestCase):
+    """Rows pruned into the archive are still read through ObservationRepository"""
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "observations.db")
+        self.series = os.path.join(self.tmp.name, "series")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def open(self):
+        repository = ObservationRepository(SQLiteBackend(ObservationStore(self.db_path),
+                                                         SeriesArchive(self.series)))
+        self.addCleanup(repository.close)
+        return repository
+
+    def test_archived_rows_are_read_after_a_restart(self):
+        repository = self.open()
+        repository.write_many([{"city": "Oslo", "timestamp": hour(h), "temperature": float(h),
+                                "description": "clear", "unit": "metric"} for h in range(6)])
+        repository.write({"city": "Lima", "timestamp": hour(1), "temperature": 20.0, "unit": "metric"})
+        self.assertEqual(repository.prune(hour(4)), 5)
+        repository.close()
+
+        repository = self.open()
+        self.assertEqual(repository.backend.store.count(), 2)
+        self.assertEqual([row["Temperature"] for row in repository.range("Oslo")], [0, 1, 2, 3, 4, 5])
+        self.assertEqual([row["Temperature"] for row in repository.latest("Oslo", 3)], [3, 4, 5])
+        self.assertEqual(repository.range("Oslo", hour(1), hour(1))[0]["Description"], "clear")
+        self.assertEqual(repository.latest_per_city()["Lima"][0]["Temperature"], 20)
+        self.assertEqual(repository.cities(), ["Lima", "Oslo"])
+        self.assertEqual(repository.count(), 7)
+        window = repository.as_of("Oslo", "2024-03-01 03:30:00", before=1, after=1)
+        self.assertEqual((window["previous"][0]["Temperature"], window["observation"]["Temperature"],
+                          window["next"][0]["Temperature"]), (2, 3, 4))
+        self.assertEqual(sum(len(chunk) for chunk in repository.iter_chunks(chunk_size=2)), 7)
+
+
+if __name__ == "__main__":
+    unittest.main()
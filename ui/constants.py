@@ -37,6 +37,18 @@ UI_CONFIG = {
     },
     "entry_widget_config": {
         "width": 30
+    },
+    # Opt-in main-loop latency monitor (see ui/latency_monitor.py)
+    "latency_monitor": {
+        "interval_ms": 50,
+        "threshold_ms": 100,
+        "log_dir": "logs"
+    },
+    # Raw history past the retention window moves to the series archive:
+    # once shortly after startup, then daily while the dashboard stays open
+    "history_archive": {
+        "first_run_ms": 60 * 1000,
+        "interval_ms": 24 * 60 * 60 * 1000
     }
 }
 
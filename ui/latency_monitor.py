@@ -0,0 +1,275 @@
+"""
+Event Loop Latency Monitor - Finds the handlers that block the Tk main loop
+
+The monitor schedules a high-frequency after() heartbeat and measures how late
+each beat fires. Every Tk callback (button commands, bindings, after() jobs) is
+timed through a wrapped tkinter.CallWrapper, so when the loop stalls we know
+which handler was running.
+"""
+import os
+import time
+import tkinter as tk
+from collections import deque
+from datetime import datetime
+from tkinter import ttk
+
+from .components import StyledButton, StyledText
+from .constants import COLOR_PALETTE
+
+
+class EventLoopMonitor:
+    """Measures main-loop lateness and records slow Tk callbacks"""
+
+    # Upper edges (ms) of the latency histogram buckets; last bucket is open-ended
+    BUCKET_EDGES_MS = (5, 10, 25, 50, 100, 250, 500, 1000)
+
+    def __init__(self, root, interval_ms=50, threshold_ms=100,
+                 history_size=2000, log_dir="logs"):
+        self.root = root
+        self.interval_ms = interval_ms
+        self.threshold_ms = threshold_ms
+        self.log_dir = log_dir
+
+        # Rolling window of heartbeat lateness samples (ms)
+        self.lag_samples = deque(maxlen=history_size)
+        # Recent stalls: (timestamp, lag_ms, handler_name, handler_ms)
+        self.slow_events = deque(maxlen=200)
+        # Per-handler stats for callbacks that exceeded the threshold
+        self.handler_stats = {}
+
+        self._original_call_wrapper = None
+        self._after_id = None
+        self._expected = None
+        self._started_at = None
+        self._running = []  # stack of (name, start) for nested callbacks
+        self._worst_since_beat = None  # (name, duration_ms)
+
+    # Installation
+
+    def install(self):
+        """Start timing callbacks and schedule the heartbeat.
+
+        Call this before widgets are created: Tk only routes callbacks through
+        the wrapper for commands registered after installation.
+        """
+        if self._original_call_wrapper is not None:
+            return
+
+        monitor = self
+        original = tk.CallWrapper
+
+        class TimedCallWrapper(original):
+            def __call__(self, *args):
+                name = monitor._describe(self.func)
+                if name is None:
+                    return super().__call__(*args)
+                monitor._enter(name)
+                try:
+                    return super().__call__(*args)
+                finally:
+                    monitor._exit()
+
+        self._original_call_wrapper = original
+        tk.CallWrapper = TimedCallWrapper
+        self._started_at = datetime.now()
+        self._expected = time.perf_counter() + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._heartbeat)
+
+    def uninstall(self):
+        """Stop the heartbeat and restore the stock CallWrapper"""
+        if self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except tk.TclError:
+                pass
+            self._after_id = None
+        if self._original_call_wrapper is not None:
+            tk.CallWrapper = self._original_call_wrapper
+            self._original_call_wrapper = None
+
+    # Measurement
+
+    def _heartbeat(self):
+        """Record how late this beat fired and reschedule"""
+        now = time.perf_counter()
+        lag_ms = max(0.0, (now - self._expected) * 1000)
+        self.lag_samples.append(lag_ms)
+
+        if lag_ms >= self.threshold_ms:
+            name, duration = self._worst_since_beat or ("<idle/redraw>", 0.0)
+            self.slow_events.append((datetime.now(), lag_ms, name, duration))
+
+        self._worst_since_beat = None
+        self._expected = now + self.interval_ms / 1000
+        self._after_id = self.root.after(self.interval_ms, self._heartbeat)
+
+    def _enter(self, name):
+        self._running.append((name, time.perf_counter()))
+
+    def _exit(self):
+        name, start = self._running.pop()
+        duration_ms = (time.perf_counter() - start) * 1000
+
+        if self._worst_since_beat is None or duration_ms > self._worst_since_beat[1]:
+            self._worst_since_beat = (name, duration_ms)
+
+        if duration_ms >= self.threshold_ms:
+            stats = self.handler_stats.setdefault(
+                name, {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+            stats["count"] += 1
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+    def _describe(self, func):
+        """Return a readable handler name, or None for the monitor's own beat"""
+        # after() wraps the real callback in a local 'callit' closure
+        code = getattr(func, "__code__", None)
+        if code is not None and code.co_name == "callit" and "func" in code.co_freevars:
+            func = func.__closure__[code.co_freevars.index("func")].cell_contents
+
+        if func == self._heartbeat:
+            return None
+
+        owner = getattr(func, "__self__", None)
+        qualname = getattr(func, "__qualname__", None)
+        if qualname is None:
+            return type(func).__name__
+        if owner is not None and "." not in qualname:
+            return f"{type(owner).__name__}.{qualname}"
+        return qualname
+
+    # Reporting
+
+    def histogram(self):
+        """Return [(bucket_label, count)] over the rolling lag window"""
+        counts = [0] * (len(self.BUCKET_EDGES_MS) + 1)
+        for lag in self.lag_samples:
+            for i, edge in enumerate(self.BUCKET_EDGES_MS):
+                if lag < edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+
+        labels = []
+        lower = 0
+        for edge in self.BUCKET_EDGES_MS:
+            labels.append(f"{lower}-{edge} ms")
+            lower = edge
+        labels.append(f">= {lower} ms")
+        return list(zip(labels, counts))
+
+    def percentile(self, pct):
+        """Return the given percentile (0-100) of the lag window in ms"""
+        if not self.lag_samples:
+            return 0.0
+        ordered = sorted(self.lag_samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def slowest_handlers(self, limit=10):
+        """Return [(name, stats)] sorted by worst single run"""
+        ranked = sorted(self.handler_stats.items(),
+                        key=lambda item: item[1]["max_ms"], reverse=True)
+        return ranked[:limit]
+
+    def get_report(self):
+        """Build a plain-text diagnostics report"""
+        report = "⏱️ UI EVENT LOOP LATENCY\n"
+        report += "━" * 50 + "\n\n"
+        started = self._started_at.strftime("%Y-%m-%d %H:%M:%S") if self._started_at else "not started"
+        report += f"Monitoring since: {started}\n"
+        report += f"Heartbeat: every {self.interval_ms} ms, stall threshold {self.threshold_ms} ms\n"
+        report += f"Samples in window: {len(self.lag_samples)}\n"
+        report += (f"Lag p50 / p95 / p99 / max: {self.percentile(50):.1f} / "
+                   f"{self.percentile(95):.1f} / {self.percentile(99):.1f} / "
+                   f"{max(self.lag_samples, default=0.0):.1f} ms\n\n")
+
+        report += "📊 LATENCY HISTOGRAM:\n"
+        total = max(1, len(self.lag_samples))
+        for label, count in self.histogram():
+            bar = "█" * int(40 * count / total)
+            report += f"{label:>12} | {count:6d} {bar}\n"
+
+        report += "\n🐢 SLOWEST HANDLERS (over threshold):\n"
+        slowest = self.slowest_handlers()
+        if not slowest:
+            report += "• None recorded\n"
+        for name, stats in slowest:
+            avg = stats["total_ms"] / stats["count"]
+            report += (f"• {name}: {stats['count']}x, max {stats['max_ms']:.0f} ms, "
+                       f"avg {avg:.0f} ms\n")
+
+        report += "\n🚨 RECENT STALLS:\n"
+        if not self.slow_events:
+            report += "• None recorded\n"
+        for when, lag, name, duration in list(self.slow_events)[-20:]:
+            report += (f"• {when.strftime('%H:%M:%S')} lag {lag:.0f} ms "
+                       f"— {name} ({duration:.0f} ms)\n")
+        return report
+
+    def dump(self):
+        """Write the report to logs/ and return the file path"""
+        os.makedirs(self.log_dir, exist_ok=True)
+        filename = f"ui_latency_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+        path = os.path.join(self.log_dir, filename)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write("=== Weather App UI Latency Log ===\n")
+            file.write(f"Date/Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+            file.write("=" * 50 + "\n\n")
+            file.write(self.get_report())
+        return path
+
+
+class LatencyDiagnosticsPanel(tk.Toplevel):
+    """Popup showing the monitor's histogram, stalls and slow handlers"""
+
+    def __init__(self, master, monitor, refresh_ms=1000, extra_report=None):
+        super().__init__(master)
+        self.monitor = monitor
+        # Optional callable returning more diagnostics text (e.g. storage metrics)
+        self.extra_report = extra_report
+        self.refresh_ms = refresh_ms
+        self.title("UI Diagnostics")
+        self.geometry("620x520")
+        self.configure(bg=COLOR_PALETTE["background"])
+
+        text_frame = ttk.Frame(self)
+        text_frame.pack(fill="both", expand=True, padx=10, pady=10)
+
+        self.report_text = StyledText(text_frame, wrap="none", font=("Courier", 10))
+        scrollbar = ttk.Scrollbar(text_frame, orient="vertical", command=self.report_text.yview)
+        self.report_text.configure(yscrollcommand=scrollbar.set)
+        self.report_text.pack(side="left", fill="both", expand=True)
+        scrollbar.pack(side="right", fill="y")
+
+        button_frame = tk.Frame(self, bg=COLOR_PALETTE["background"])
+        button_frame.pack(pady=10)
+        StyledButton(button_frame, "info_black", text="💾 Save to logs/",
+                     command=self._save).pack(side="left", padx=5)
+        StyledButton(button_frame, "primary_black", text="Close",
+                     command=self.destroy).pack(side="left", padx=5)
+
+        self._after_id = None
+        self._refresh()
+
+    def _refresh(self):
+        """Redraw the report; reschedules itself while the panel is open"""
+        self.report_text.config(state="normal")
+        self.report_text.delete("1.0", tk.END)
+        report = self.monitor.get_report()
+        if self.extra_report:
+            report += "\n" + self.extra_report()
+        self.report_text.insert("1.0", report)
+        self.report_text.config(state="disabled")
+        self._after_id = self.after(self.refresh_ms, self._refresh)
+
+    def _save(self):
+        path = self.monitor.dump()
+        self.title(f"UI Diagnostics — saved {os.path.basename(path)}")
+
+    def destroy(self):
+        if self._after_id is not None:
+            self.after_cancel(self._after_id)
+            self._after_id = None
+        super().destroy()
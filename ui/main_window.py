@@ -8,6 +8,7 @@ from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 
 from ui.constants import COLOR_PALETTE, UI_CONFIG
 from ui.components import StyledButton
+from ui.latency_monitor import EventLoopMonitor, LatencyDiagnosticsPanel
 from ui.tabs import (WeatherTab, ForecastTab, FiveDayForecastTab,
                          ActivityTab, PoetryTab, HistoryTab, QuickActionsTab,
                          LiveWeatherTab, SevereWeatherTab, AnalyticsTrendsTab, HealthWellnessTab,
@@ -17,13 +18,17 @@ from ui.tabs import (WeatherTab, ForecastTab, FiveDayForecastTab,
 class MainWindow(tk.Tk):
     """Main application window with clean separation of concerns"""
     
-    def __init__(self, controller):
+    def __init__(self, controller, monitor_latency=False):
         super().__init__()
         self.controller = controller
+        # Must be installed before any widget registers a callback
+        self.latency_monitor = self._create_latency_monitor() if monitor_latency else None
         self._setup_styles()
         self._setup_window()
         self._create_layout()
         self._setup_graph()
+        self._archive_after_id = self.after(UI_CONFIG["history_archive"]["first_run_ms"], self._archive_history)
+        self.protocol("WM_DELETE_WINDOW", self._on_close)
 
     def _setup_window(self):
         """Configure the main window"""
@@ -77,6 +82,51 @@ class MainWindow(tk.Tk):
         )
         self.toggle_btn.pack(pady=10)
 
+        if self.latency_monitor:
+            self.diagnostics_btn = StyledButton(
+                self.top_frame,
+                style_type="info_black",
+                text="🩺 Diagnostics",
+                command=self._show_diagnostics
+            )
+            self.diagnostics_btn.place(relx=1.0, rely=0.5, anchor="e")
+
+    def _create_latency_monitor(self):
+        """Install the opt-in event loop latency monitor"""
+        config = UI_CONFIG["latency_monitor"]
+        monitor = EventLoopMonitor(
+            self,
+            interval_ms=config["interval_ms"],
+            threshold_ms=config["threshold_ms"],
+            log_dir=config["log_dir"]
+        )
+        monitor.install()
+        self.bind_all("<Control-Shift-D>", lambda event: self._show_diagnostics())
+        return monitor
+
+    def _show_diagnostics(self):
+        """Open the UI latency diagnostics panel"""
+        LatencyDiagnosticsPanel(self, self.latency_monitor,
+                                extra_report=self.controller.get_storage_metrics)
+
+    def _archive_history(self):
+        """Archive expired raw history in the background and schedule the next run"""
+        self.controller.start_history_archiving()
+        self._archive_after_id = self.after(UI_CONFIG["history_archive"]["interval_ms"], self._archive_history)
+
+    def _on_close(self):
+        """Flush pending writes and dump latency diagnostics before closing"""
+        self.after_cancel(self._archive_after_id)
+        if self.latency_monitor:
+            try:
+                path = self.latency_monitor.dump()
+                print(f"⏱️ UI latency report saved to {path}")
+            except OSError as e:
+                print(f"Error saving UI latency report: {e}")
+            self.latency_monitor.uninstall()
+        self.controller.shutdown()
+        self.destroy()
+
     def _create_tabs(self):
         """Create all dashboard tabs"""
         # Quick Actions tab as the first tab
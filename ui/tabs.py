@@ -4,7 +4,7 @@ Individual tab components for the weather dashboard
 
 import json
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
+from tkinter import ttk, messagebox, simpledialog, filedialog
 import os
 from PIL import Image, ImageTk, ImageDraw
 import matplotlib
@@ -23,6 +23,7 @@ import random
 from .components import StyledButton, StyledText, StyledLabel, AnimatedLabel
 from .constants import COLOR_PALETTE
 from .tab_helpers import ButtonHelper, ChartHelper
+from core.export import EXPORT_FORMATS
 
 # Matplotlib imports with availability checking
 CHARTS_AVAILABLE = False
@@ -4170,6 +4171,14 @@ class ComparisonTab:
             detailed += f"• {city1}: 8.5/10\n"
             detailed += f"• {city2}: 6.5/10"
             
+            # Both cities' forecasts from one batched prediction
+            grid = self.controller.ml_controller.predict_many([city1, city2], [24, 48])
+            if grid is not None:
+                detailed += "\n\n🔮 FORECAST:\n"
+                for row, city in enumerate(grid.cities):
+                    detailed += (f"• {city}: {grid.temperatures[row, 0]:.1f}°C in 24h, "
+                                 f"{grid.temperatures[row, 1]:.1f}°C in 48h\n")
+            
             self.result_text.delete(1.0, tk.END)
             self.result_text.insert(tk.END, detailed)
         except Exception as e:
@@ -4238,6 +4247,15 @@ class ComparisonTab:
             multi_compare += "2. 🥈 Barcelona: 25°C, ⛅ Partly cloudy, Great sightseeing\n"
             multi_compare += "3. 🥉 Sydney: 23°C, 🌤️ Mostly sunny, Ideal city walks\n"
             
+            # Forecast the entered cities, favorites and every recorded city in one batch
+            ml_controller = self.controller.ml_controller
+            entered = [city for city in (self.city1_entry.get().strip(), self.city2_entry.get().strip()) if city]
+            cities = ml_controller.get_watchlist_cities(entered + list(self.controller.get_favorite_cities()))
+            if cities:
+                grid = ml_controller.predict_many(cities, [6, 12, 24, 48])
+                multi_compare += f"\n🔮 MULTI-CITY FORECAST ({len(cities)} cities):\n\n"
+                multi_compare += ml_controller.format_prediction_grid_for_display(grid)
+            
             self.result_text.delete(1.0, tk.END)
             self.result_text.insert(tk.END, multi_compare)
         except Exception as e:
@@ -4456,38 +4474,7 @@ class ComparisonTab:
     def export_journal(self):
         """Export journal entries"""
         try:
-            export_info = f"📤 JOURNAL EXPORT:\n"
-            export_info += "━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━\n\n"
-            export_info += "🗂️ EXPORT OPTIONS:\n\n"
-            export_info += "📁 Available Formats:\n"
-            export_info += "• ✅ Plain Text (.txt) - Simple, readable format\n"
-            export_info += "• ✅ CSV (.csv) - Spreadsheet compatible\n"
-            export_info += "• ✅ JSON (.json) - Data structure format\n"
-            export_info += "• ✅ PDF (.pdf) - Formatted document\n\n"
-            export_info += "📊 Export Statistics:\n"
-            export_info += "• Total entries to export: 15\n"
-            export_info += "• Date range: July 1-18, 2025\n"
-            export_info += "• Total words: 1,247\n"
-            export_info += "• Mood data included: Yes\n"
-            export_info += "• Weather correlations: Yes\n\n"
-            export_info += "🎯 EXPORT PREVIEW:\n\n"
-            export_info += "=== WEATHER JOURNAL EXPORT ===\n"
-            export_info += "Export Date: July 18, 2025\n"
-            export_info += "Total Entries: 15\n\n"
-            export_info += "Entry 1: July 18, 2025\n"
-            export_info += "Mood: Happy 😊\n"
-            export_info += "Weather: Sunny, 24°C\n"
-            export_info += "Text: Beautiful sunny day! Perfect for outdoor activities...\n"
-            export_info += "---\n\n"
-            export_info += "💾 EXPORT READY:\n"
-            export_info += "• File would be saved to: ~/Documents/weather_journal.txt\n"
-            export_info += "• Backup copy available\n"
-            export_info += "• Privacy: Local storage only\n\n"
-            export_info += "📱 SHARING OPTIONS:\n"
-            export_info += "• Email attachment ready\n"
-            export_info += "• Cloud storage compatible\n"
-            export_info += "• Print-friendly format\n\n"
-            export_info += "✨ Tip: Use 'Search Entries' to find specific content before export!"
+            export_info = self.controller.export_journal()
             
             self.result_text.delete(1.0, tk.END)
             self.result_text.insert(tk.END, export_info)
@@ -5042,6 +5029,8 @@ class HistoryTab:
                     command=self.export_weather_data).grid(row=0, column=2, padx=3)
         StyledButton(history_button_frame, "success_black", text="🔄 Refresh", 
                     command=self.load_history).grid(row=0, column=3, padx=3)
+        StyledButton(history_button_frame, "info_black", text="⏪ Time Travel", 
+                    command=self.toggle_replay).grid(row=0, column=4, padx=3)
         
         # Load and display history
         self.load_history()
@@ -5055,6 +5044,28 @@ class HistoryTab:
         except Exception as e:
             self.history_text.insert(tk.END, f"Error loading history: {e}\n")
 
+    def toggle_replay(self):
+        """Replay the dashboard at a past timestamp, or return to live data"""
+        try:
+            if self.controller.replay_time is not None:
+                self.controller.stop_replay()
+                messagebox.showinfo("Time Travel", "Back to live weather data.")
+            else:
+                when = simpledialog.askstring("Time Travel",
+                                              "Show the dashboard as of (YYYY-MM-DD HH:MM:SS):",
+                                              parent=self.frame)
+                if not when:
+                    return
+                snapshot = self.controller.start_replay(when)
+                self._show_report_popup("Dashboard Replay", snapshot +
+                                        "\n⏪ Views now show stored data only; press Time Travel again to go live.")
+            self.history_text.delete(1.0, tk.END)
+            self.load_history()
+        except ValueError:
+            messagebox.showerror("Error", "Please enter the time as YYYY-MM-DD HH:MM:SS")
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to replay history: {str(e)}")
+
     def generate_weather_report(self):
         """Generate a comprehensive weather report"""
         try:
@@ -5135,32 +5146,62 @@ class HistoryTab:
             messagebox.showerror("Error", f"Failed to analyze trends: {str(e)}")
 
     def export_weather_data(self):
-        """Export weather data to text format"""
+        """Export stored observations to CSV/JSONL/Parquet in the background"""
         try:
-            dates, temps = self.controller.get_weather_history(100)  # Get more data for export
-            
-            if not dates:
-                messagebox.showinfo("No Data", "No weather data available for export.")
+            filetypes = [("CSV", "*.csv"), ("JSON Lines", "*.jsonl")]
+            if "parquet" in EXPORT_FORMATS:
+                filetypes.append(("Parquet", "*.parquet"))
+            path = filedialog.asksaveasfilename(parent=self.frame, title="Export Weather Data",
+                                                defaultextension=".csv", filetypes=filetypes,
+                                                initialdir="data", initialfile="weather_export.csv")
+            if not path:
                 return
             
-            # Create export content
-            export_data = f"Weather Data Export - Generated on {dates[-1] if dates else 'Unknown'}\n"
-            export_data += "=" * 60 + "\n\n"
-            export_data += "Date\t\tTemperature\n"
-            export_data += "-" * 30 + "\n"
-            
-            for dt, temp in zip(dates, temps):
-                export_data += f"{dt}\t{temp}°\n"
-            
-            export_data += f"\nTotal Records: {len(dates)}\n"
-            export_data += f"Average Temperature: {sum(temps)/len(temps):.1f}°\n"
-            
-            # Show export preview
-            self._show_report_popup("Export Preview", export_data + "\n\n💾 This data can be copied for external use.")
+            job = self.controller.start_weather_export(path)
+            self._show_export_progress(job)
             
         except Exception as e:
             messagebox.showerror("Error", f"Failed to export data: {str(e)}")
 
+    def _show_export_progress(self, job):
+        """Poll an ExportJob from the Tk loop, with a Cancel button"""
+        popup = tk.Toplevel(self.frame)
+        popup.title("Exporting Weather Data")
+        popup.geometry("400x140")
+        popup.configure(bg=COLOR_PALETTE["background"])
+        popup.transient(self.frame)
+        
+        status = StyledLabel(popup, text="Starting export...")
+        status.pack(pady=(15, 5))
+        progress = ttk.Progressbar(popup, length=340, mode="determinate" if job.total else "indeterminate")
+        progress.pack(pady=5)
+        if not job.total:
+            progress.start(10)
+        StyledButton(popup, "primary_black", text="Cancel", command=job.cancel).pack(pady=5)
+        
+        def poll():
+            if not popup.winfo_exists():
+                job.cancel()
+                return
+            if not job.done:
+                if job.fraction is not None:
+                    progress["value"] = job.fraction * 100
+                status.config(text=f"{job.rows_written:,} of {job.total:,} records" if job.total
+                              else f"{job.rows_written:,} records")
+                popup.after(100, poll)
+                return
+            popup.destroy()
+            if job.error:
+                messagebox.showerror("Error", f"Failed to export data: {job.error}")
+            elif job.cancelled:
+                messagebox.showinfo("Export Cancelled", "Export cancelled; no file was written.")
+            else:
+                messagebox.showinfo("Export Complete",
+                                    f"Exported {job.rows_written:,} records to {job.path} "
+                                    f"in {job.elapsed:.1f}s")
+        
+        poll()
+
     def _show_report_popup(self, title, content):
         """Show report in a popup window"""
         popup = tk.Toplevel(self.frame)
@@ -5595,6 +5636,21 @@ class MLTab:
                                        command=self._comprehensive_analysis)
         self.analysis_btn.pack(side=tk.LEFT, padx=5)
 
+        # Batch forecast button
+        self.watchlist_btn = StyledButton(button_frame, "info_black", text="🌍 Watchlist Forecast", 
+                                        command=self._forecast_watchlist)
+        self.watchlist_btn.pack(side=tk.LEFT, padx=5)
+
+        # Fleet-wide anomaly button
+        self.unusual_btn = StyledButton(button_frame, "warning_black", text="🚨 Unusual Now", 
+                                      command=self._show_unusual_now)
+        self.unusual_btn.pack(side=tk.LEFT, padx=5)
+
+        # Analog ("similar hours") button
+        self.similar_btn = StyledButton(button_frame, "accent_black", text="🔁 Similar Hours", 
+                                      command=self._show_similar_hours)
+        self.similar_btn.pack(side=tk.LEFT, padx=5)
+
         # Results display area
         result_frame = tk.Frame(self.frame, bg=COLOR_PALETTE["background"])
         result_frame.pack(fill="both", expand=True, padx=20, pady=10)
@@ -5628,12 +5684,27 @@ Welcome to the Machine Learning Weather Analysis tab! Here you can:
    • Identify recurring weather patterns
    • Analyze temperature stability and variations
    • Discover frequent weather conditions
+   • See the current weather regime and how often it occurs
 
 ⚠️ ANOMALY DETECTION
    • Find unusual weather events
    • Detect extreme temperatures
    • Get severity scores for anomalies
 
+🌍 WATCHLIST FORECAST
+   • Forecast many cities at 6/12/24/48 hours in one batch
+   • Enter several cities separated by commas, or leave the field
+     empty to use your favorites and every city with recorded history
+
+🚨 UNUSUAL NOW
+   • Rank what's unusual right now across every recorded city
+   • Temperature, humidity, wind and pressure vs. recent and
+     time-of-day baselines
+
+🔁 SIMILAR HOURS
+   • Find the past hours most like a city's current conditions
+   • See what happened next and an analog-based 24h prediction
+
 🧠 COMPREHENSIVE ANALYSIS
    • Get complete ML insights for a city
    • Weather statistics and trends
@@ -5694,6 +5765,62 @@ Get started by entering a city and clicking an analysis button! 🚀
         except Exception as e:
             self._display_error(f"Failed to predict temperature: {str(e)}")
 
+    def _forecast_watchlist(self):
+        """Predict temperatures for many cities and horizons at once"""
+        try:
+            ml_controller = self.controller.ml_controller
+            cities = [city.strip() for city in self.city_entry.get().split(",") if city.strip()]
+            if not cities:
+                cities = ml_controller.get_watchlist_cities(self.controller.get_favorite_cities())
+            if not cities:
+                messagebox.showwarning("Input Required", "Enter cities separated by commas")
+                return
+
+            grid = ml_controller.predict_many(cities, [6, 12, 24, 48])
+            
+            result = f"🌍 Watchlist Forecast ({len(cities)} cities)\n"
+            result += "=" * 50 + "\n\n"
+            result += ml_controller.format_prediction_grid_for_display(grid)
+            self._display_result(result)
+
+        except Exception as e:
+            self._display_error(f"Failed to forecast watchlist: {str(e)}")
+
+    def _show_similar_hours(self):
+        """Show the past hours most like a city's current conditions and what followed"""
+        city = self._get_city()
+        if not city:
+            return
+
+        try:
+            ml_controller = self.controller.ml_controller
+            matches = ml_controller.get_similar_conditions(city, k=5, hours_ahead=6)
+            prediction = ml_controller.get_analog_prediction(city, 24)
+            
+            result = f"🔁 Similar Past Hours for {city.title()}\n"
+            result += "=" * 50 + "\n\n"
+            result += ml_controller.format_similar_conditions_for_display(matches, 6)
+            result += "\n\n🔮 Analog Prediction (24h)\n"
+            result += ml_controller.format_prediction_for_display(prediction)
+            self._display_result(result)
+
+        except Exception as e:
+            self._display_error(f"Failed to find similar conditions: {str(e)}")
+
+    def _show_unusual_now(self):
+        """Show the most unusual current readings across all cities"""
+        try:
+            ml_controller = self.controller.ml_controller
+            anomalies = ml_controller.get_fleet_anomalies()
+            
+            result = "🚨 What's Unusual Right Now\n"
+            result += "=" * 50 + "\n\n"
+            result += ml_controller.format_fleet_anomalies_for_display(anomalies)
+            self._display_result(result)
+
+        except Exception as e:
+            self._display_error(f"Failed to scan for anomalies: {str(e)}")
+
     def _detect_patterns(self):
         """Detect weather patterns for the specified city"""
         city = self._get_city()
@@ -5723,6 +5850,10 @@ Get started by entering a city and clicking an analysis button! 🚀
             else:
                 result += "No patterns found for the specified city.\n"
             
+            regimes = ml_controller.get_regime_summary(city)
+            if regimes:
+                result += "\n" + ml_controller.format_regime_summary_for_display(regimes) + "\n"
+            
             self._display_result(result)
         except Exception as e:
             self._display_error(f"Failed to detect patterns: {str(e)}")
@@ -7036,6 +7167,10 @@ class SevereWeatherTab:
         StyledButton(left_panel, "primary", text="🔄 Refresh Alerts", 
                     command=self.fetch_alerts).pack(pady=10)
         
+        # Fleet-wide anomalies from recorded observations
+        StyledButton(left_panel, "warning_black", text="🚨 What's Unusual Now", 
+                    command=self.show_unusual_now).pack(pady=(0, 10))
+        
         # Details panel (top of right panel)
         details_frame = ttk.LabelFrame(right_panel, text="Alert Details")
         right_panel.add(details_frame, weight=1)
@@ -7195,6 +7330,33 @@ class SevereWeatherTab:
             self.alerts_tree.selection_set(first_item)
             self.display_alert_details(None)
     
+    def show_unusual_now(self):
+        """List the most unusual current readings across every recorded city"""
+        for item in self.alerts_tree.get_children():
+            self.alerts_tree.delete(item)
+        
+        anomalies = self.controller.ml_controller.get_fleet_anomalies()
+        self._unusual = {f"unusual-{rank}": anomaly for rank, anomaly in enumerate(anomalies)}
+        for iid, anomaly in self._unusual.items():
+            severity = ("High" if anomaly.severity_score >= 0.75 else
+                        "Moderate" if anomaly.severity_score >= 0.5 else "Low")
+            severity_icon = "🔴" if severity == "High" else "🟠" if severity == "Moderate" else "🟡"
+            self.alerts_tree.insert("", "end", iid=iid, values=(
+                f"{severity_icon} {severity}",
+                anomaly.anomaly_type.replace("_", " ").title(),
+                anomaly.city,
+                anomaly.datetime.strftime("%H:%M")
+            ), tags=(severity.lower(),))
+        
+        self.details_text.config(state="normal")
+        self.details_text.delete(1.0, tk.END)
+        if anomalies:
+            self.alerts_tree.selection_set(self.alerts_tree.get_children()[0])
+            self.display_alert_details(None)
+        else:
+            self.details_text.insert(tk.END, "✅ Nothing unusual right now across recorded cities")
+            self.details_text.config(state="disabled")
+    
     def display_alert_details(self, event):
         """Display details for selected alert"""
         selected_items = self.alerts_tree.selection()
@@ -7203,6 +7365,18 @@ class SevereWeatherTab:
             
         selected_id = selected_items[0]
         
+        anomaly = getattr(self, "_unusual", {}).get(selected_id)
+        if anomaly is not None:
+            self.details_text.config(state="normal")
+            self.details_text.delete(1.0, tk.END)
+            self.details_text.insert(tk.END, f"Unusual reading - {anomaly.city}\n", "severity")
+            self.details_text.insert(tk.END, f"Time: {anomaly.datetime.strftime('%Y-%m-%d %H:%M')}\n")
+            self.details_text.insert(tk.END, f"Severity: {int(anomaly.severity_score * 100)}%\n\n")
+            self.details_text.insert(tk.END, anomaly.description)
+            self.details_text.tag_configure("severity", foreground="#FF8800", font=("Arial", 12, "bold"))
+            self.details_text.config(state="disabled")
+            return
+        
         # Mock data - in a real app, this would be retrieved from a database or API
         alerts = {
             "1": {"severity": "High", "type": "Tornado Warning", 